@@ -0,0 +1,174 @@
+"""
+Índices do lado do servidor no Cassandra (--cassandra-index dos prepare_tables.py).
+
+As colunas que os queries.py filtram com scan (status, marca, followers...) podem ganhar:
+
+    sai   Storage-Attached Index (Cassandra 5): igualdade e faixa (>, <=...) sem ALLOW FILTERING
+    2i    índice secundário antigo: só igualdade (faixa continua no scan)
+    mv    view materializada com a coluna como chave de partição: só igualdade; precisa de
+          materialized_views_enabled no cassandra.yaml, senão o CREATE falha e fica no scan
+    none  nada, só o scan em faixas de token (benchmark/cassandra_scan.py)
+
+O prepare_tables.py cria conforme o modo e os queries.py descobrem o que existe lendo o
+system_schema no connect, então não precisam do mesmo parâmetro. select_eq/select_range
+devolvem None quando não há índice que sirva, e quem chama cai no scan:
+
+    found = detect(session, "produtos", "marca")
+    rows = select_eq(session, found, "produtos", "marca", marca, limit=100)
+    if rows is None:
+        rows = scan_filter(...)
+"""
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+MODES = ["none", "sai", "mv", "2i"]
+DEFAULT_MODE = "none"
+
+KEYSPACE = "trabalho_bd"
+
+# (tabela, coluna, colunas da chave primária da tabela, "eq" ou "range")
+IndexSpec = Tuple[str, str, Sequence[str], str]
+# (modo, nome do índice ou da view) como achado no system_schema
+Found = Tuple[str, Optional[str]]
+
+NOT_FOUND: Found = ("none", None)
+
+
+def index_name(table: str, column: str) -> str:
+    return f"idx_{table}_{column}"
+
+
+def view_name(table: str, column: str) -> str:
+    return f"{table}_por_{column}"
+
+
+def add_argument(parser, default: str = DEFAULT_MODE):
+    parser.add_argument("--cassandra-index", choices=MODES, default=default,
+                        help=f"Índices do Cassandra nas colunas filtradas pelos scans (padrão: {default})")
+
+
+def drop_views(session, tables: Sequence[str], keyspace: str = KEYSPACE):
+    """O DROP TABLE falha com view materializada em cima: apaga as views das tabelas antes."""
+    rows = session.execute("SELECT view_name, base_table_name FROM system_schema.views WHERE keyspace_name = %s",
+                           (keyspace,))
+    for row in rows:
+        if row.base_table_name in tables:
+            session.execute(f"DROP MATERIALIZED VIEW IF EXISTS {keyspace}.{row.view_name}")
+
+
+def _create_statement(table: str, column: str, key: Sequence[str], mode: str) -> str:
+    if mode == "sai":
+        return f"CREATE CUSTOM INDEX IF NOT EXISTS {index_name(table, column)} ON {table} ({column}) USING 'StorageAttachedIndex'"
+    if mode == "2i":
+        return f"CREATE INDEX IF NOT EXISTS {index_name(table, column)} ON {table} ({column})"
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in [column, *key])
+    return (f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view_name(table, column)} AS SELECT * FROM {table} "
+            f"WHERE {not_null} PRIMARY KEY ({column}, {', '.join(key)})")
+
+
+def create_indexes(session, specs: Sequence[IndexSpec], mode: str) -> int:
+    """Cria o índice/view de cada coluna no modo pedido; um que falha é só avisado."""
+    created = 0
+    if mode == "none":
+        return created
+    for table, column, key, kind in specs:
+        if mode == "mv" and kind == "range":
+            print(f"cassandra-> {table}.{column}: view materializada não serve pra faixa, fica no scan")
+            continue
+        start = time.perf_counter()
+        try:
+            session.execute(_create_statement(table, column, key, mode))
+        except Exception as e:
+            print(f"erro --> Cassandra índice {mode} em {table}.{column}: {e}")
+            continue
+        created += 1
+        print(f"cassandra-> {mode} em {table}.{column} ({time.perf_counter() - start:.2f}s)")
+    print(f"cassandra-> modo de índice '{mode}': {created} índices/views")
+    return created
+
+
+def detect(session, table: str, column: str, keyspace: str = KEYSPACE) -> Found:
+    """Índice (sai/2i) ou view (mv) que existe pra coluna, pelo system_schema."""
+    rows = session.execute("SELECT index_name, kind, options FROM system_schema.indexes "
+                           "WHERE keyspace_name = %s AND table_name = %s", (keyspace, table))
+    for row in rows:
+        options = row.options or {}
+        if options.get("target", "").strip('"') != column:
+            continue
+        class_name = options.get("class_name", "")
+        if row.kind == "CUSTOM" and ("StorageAttachedIndex" in class_name or class_name.lower() == "sai"):
+            return "sai", row.index_name
+        if row.kind in ("COMPOSITES", "KEYS"):
+            return "2i", row.index_name
+
+    views = session.execute("SELECT view_name, base_table_name FROM system_schema.views WHERE keyspace_name = %s",
+                            (keyspace,))
+    for view in views:
+        if view.base_table_name != table:
+            continue
+        partition = [c.column_name for c in session.execute(
+            "SELECT column_name, kind FROM system_schema.columns WHERE keyspace_name = %s AND table_name = %s",
+            (keyspace, view.view_name)) if c.kind == "partition_key"]
+        if partition == [column]:
+            return "mv", view.view_name
+    return NOT_FOUND
+
+
+def detect_all(session, table: str, columns: Sequence[str], keyspace: str = KEYSPACE) -> Dict[str, Found]:
+    found = {column: detect(session, table, column, keyspace) for column in columns}
+    print("cassandra-> índices em " + table + ": " +
+          ", ".join(f"{c}={mode}" + (f" ({name})" if name else "") for c, (mode, name) in found.items()))
+    return found
+
+
+def eq_query(found: Found, table: str, column: str, columns: str = "*", limit: Optional[int] = None) -> Optional[str]:
+    """CQL de column = %s pelo índice ou pela view; None se não tem nenhum."""
+    mode, name = found
+    if mode in ("sai", "2i"):
+        source = table
+    elif mode == "mv":
+        source = name
+    else:
+        return None
+    cql = f"SELECT {columns} FROM {source} WHERE {column} = %s"
+    if limit is not None:
+        cql += f" LIMIT {int(limit)}"
+    return cql
+
+
+def range_query(found: Found, table: str, column: str, lo: Any = None, hi: Any = None,
+                lo_op: str = ">=", hi_op: str = "<", columns: str = "*",
+                limit: Optional[int] = None) -> Optional[Tuple[str, List[Any]]]:
+    """CQL e binds da faixa pelo SAI (o único que faz faixa); None nos outros modos."""
+    if found[0] != "sai":
+        return None
+    where, binds = [], []
+    if lo is not None:
+        where.append(f"{column} {lo_op} %s")
+        binds.append(lo)
+    if hi is not None:
+        where.append(f"{column} {hi_op} %s")
+        binds.append(hi)
+    cql = f"SELECT {columns} FROM {table} WHERE {' AND '.join(where)}"
+    if limit is not None:
+        cql += f" LIMIT {int(limit)}"
+    return cql, binds
+
+
+def select_eq(session, found: Found, table: str, column: str, value: Any, columns: str = "*",
+              limit: Optional[int] = None) -> Optional[List[Any]]:
+    """Linhas com column = value pelo índice ou pela view; None se não tem nenhum."""
+    cql = eq_query(found, table, column, columns, limit)
+    if cql is None:
+        return None
+    return list(session.execute(cql, (value,)))
+
+
+def select_range(session, found: Found, table: str, column: str, lo: Any = None, hi: Any = None,
+                 lo_op: str = ">=", hi_op: str = "<", columns: str = "*",
+                 limit: Optional[int] = None) -> Optional[List[Any]]:
+    """Linhas com a coluna na faixa pelo SAI; None nos outros modos."""
+    query = range_query(found, table, column, lo, hi, lo_op, hi_op, columns, limit)
+    if query is None:
+        return None
+    return list(session.execute(*query))
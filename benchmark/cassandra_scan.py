@@ -0,0 +1,97 @@
+"""
+Scan paralelo de uma tabela inteira do Cassandra por faixas de token, pros queries.py.
+
+Um SELECT sem WHERE é paginado em sequência pelo driver: uma página por vez, de um coordenador
+só. Aqui o anel do Murmur3 é dividido em 'splits' faixas e cada faixa é lida com
+'token(pk) > ? AND token(pk) <= ?' em 'workers' threads. Dentro da faixa a próxima página já é
+pedida (start_fetching_next_page) antes de processar a atual, então a rede e o servidor trabalham
+enquanto o python filtra.
+
+Cada faixa alimenta um callback consume(rows) que filtra/agrega em streaming e devolve um
+resultado parcial; scan() devolve a lista dos parciais pra quem chamou juntar:
+
+    partials = scan(session, "pedidos_por_cliente", "cliente_id",
+                    lambda rows: Counter(r.cliente_id for r in rows), columns="cliente_id")
+    total = sum(partials, Counter())
+
+Como uma partição inteira cai numa faixa só, agregações por chave de partição não se repetem
+entre faixas.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+DEFAULT_WORKERS = 8
+DEFAULT_SPLITS = 64  # mais faixas que threads: faixa lenta (partição grande) não segura as outras
+DEFAULT_FETCH_SIZE = 5000
+
+
+def token_ranges(splits: int = DEFAULT_SPLITS):
+    """Faixas (início, fim] que cobrem o anel do Murmur3Partitioner (que nunca gera MIN_TOKEN)."""
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + i * step for i in range(splits)] + [MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _iter_range(session, stmt, lo: int, hi: int, stop: Optional[threading.Event]) -> Iterator[Any]:
+    """Linhas da faixa, pedindo a próxima página antes de entregar a atual."""
+    future = session.execute_async(stmt, (lo, hi))
+    result = future.result()
+    while True:
+        page = result.current_rows
+        more = future.has_more_pages and not (stop is not None and stop.is_set())
+        if more:
+            future.start_fetching_next_page()
+        yield from page
+        if not more:
+            return
+        result = future.result()
+
+
+def scan(session, table: str, partition_key: Union[str, Sequence[str]], consume: Callable[[Iterable[Any]], Any],
+         columns: str = "*", splits: int = DEFAULT_SPLITS, workers: int = DEFAULT_WORKERS,
+         fetch_size: int = DEFAULT_FETCH_SIZE, stop: Optional[threading.Event] = None) -> List[Any]:
+    """
+    Roda consume(rows) uma vez por faixa de token (em paralelo) e devolve os resultados parciais.
+    Com 'stop' setado (ex: um filtro que já achou o bastante) as faixas param de pedir páginas
+    e as que ainda não começaram nem são lidas.
+    """
+    pk = partition_key if isinstance(partition_key, str) else ", ".join(partition_key)
+    stmt = session.prepare(f"SELECT {columns} FROM {table} WHERE token({pk}) > ? AND token({pk}) <= ?")
+    stmt.fetch_size = fetch_size
+
+    def run(bounds):
+        if stop is not None and stop.is_set():
+            return None
+        return consume(_iter_range(session, stmt, bounds[0], bounds[1], stop))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [p for p in pool.map(run, token_ranges(splits)) if p is not None]
+
+
+def scan_filter(session, table: str, partition_key: Union[str, Sequence[str]], predicate: Callable[[Any], bool],
+                columns: str = "*", limit: Optional[int] = None, **kwargs) -> List[Any]:
+    """
+    Linhas que passam no 'predicate'. Com 'limit' o scan para assim que achar 'limit' linhas
+    (as primeiras que aparecerem, não necessariamente na ordem de token).
+    """
+    found: List[Any] = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def consume(rows):
+        for row in rows:
+            if stop.is_set():
+                return
+            if predicate(row):
+                with lock:
+                    found.append(row)
+                    if limit is not None and len(found) >= limit:
+                        stop.set()
+                        return
+
+    scan(session, table, partition_key, consume, columns=columns, stop=stop, **kwargs)
+    return found[:limit] if limit is not None else found
@@ -0,0 +1,141 @@
+"""
+Escrita concorrente no Cassandra pros populate_tables.py.
+
+session.execute por linha espera uma ida e volta inteira antes da próxima; aqui cada linha vai
+com execute_async e no máximo 'window' ficam em voo ao mesmo tempo (o write() bloqueia quando a
+janela enche). Timeouts/sobrecarga do servidor são reenviados com backoff exponencial; no fim
+flush() espera o que falta e devolve linhas/s (total e por segundo), retries e erros.
+
+    with CassandraWriter(session, label="clientes") as writer:
+        for binds in rows:
+            writer.write(stmt, binds)
+"""
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Sequence
+
+from cassandra import OperationTimedOut, Unavailable, WriteTimeout
+from cassandra.protocol import OverloadedErrorMessage
+
+from benchmark.ingest_telemetry import TELEMETRY
+
+DEFAULT_WINDOW = 256
+
+# erros em que vale tentar de novo (o nó estava ocupado, não é problema no dado)
+RETRYABLE = (WriteTimeout, Unavailable, OperationTimedOut, OverloadedErrorMessage)
+
+# quantas mensagens de erro guardar pro relatório
+MAX_ERROR_SAMPLES = 5
+
+
+class CassandraWriter:
+    def __init__(self, session, window: int = DEFAULT_WINDOW, max_retries: int = 5,
+                 backoff: float = 0.05, max_backoff: float = 2.0, label: str = "cassandra"):
+        self.session = session
+        self.window = window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.label = label
+
+        self._slots = threading.BoundedSemaphore(window)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._start = None
+        self._per_second = Counter()
+
+        self.rows = 0
+        self.errors = 0
+        self.retries = 0
+        self.error_samples = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def write(self, stmt, binds: Sequence[Any]):
+        """Manda uma linha; bloqueia enquanto a janela estiver cheia."""
+        self._slots.acquire()
+        with self._lock:
+            if self._start is None:
+                self._start = time.perf_counter()
+            self._in_flight += 1
+        self._submit(stmt, binds, 0)
+
+    def write_many(self, stmt, rows: Iterable[Sequence[Any]]):
+        for binds in rows:
+            self.write(stmt, binds)
+
+    def _submit(self, stmt, binds, attempt):
+        try:
+            future = self.session.execute_async(stmt, binds)
+        except Exception as exc:
+            self._on_error(exc, stmt, binds, attempt)
+            return
+        future.add_callbacks(self._on_done, self._on_error, errback_args=(stmt, binds, attempt))
+
+    def _on_done(self, _result):
+        with self._lock:
+            self.rows += 1
+            self._per_second[int(time.perf_counter() - self._start)] += 1
+        self._release()
+
+    def _on_error(self, exc, stmt, binds, attempt):
+        # roda na thread de I/O do driver: nada de sleep aqui, o reenvio vai num Timer
+        if isinstance(exc, RETRYABLE) and attempt < self.max_retries:
+            with self._lock:
+                self.retries += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            timer = threading.Timer(delay, self._submit, (stmt, binds, attempt + 1))
+            timer.daemon = True
+            timer.start()
+            return
+
+        with self._lock:
+            self.errors += 1
+            if len(self.error_samples) < MAX_ERROR_SAMPLES:
+                self.error_samples.append(f"{type(exc).__name__}: {exc}")
+        self._release()
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+        self._slots.release()
+
+    def flush(self) -> Dict[str, Any]:
+        """Espera todas as escritas em voo (inclusive retries) e imprime/devolve o relatório."""
+        with self._lock:
+            while self._in_flight:
+                self._idle.wait()
+        report = self.report()
+        TELEMETRY.record("cassandra", self.label, "write", report["seconds"], rows=report["rows"],
+                         retries=report["retries"], errors=report["errors"])
+        print(f"cassandra-> {self.label}: {report['rows']} linhas em {report['seconds']:.2f}s "
+              f"({report['rows_per_sec']:.0f} linhas/s, pico {max(report['per_second'], default=0)}/s), "
+              f"{report['retries']} retries, {report['errors']} erros")
+        for msg in report["error_samples"]:
+            print(f"   {msg}")
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            seconds = time.perf_counter() - self._start if self._start is not None else 0.0
+            last = max(self._per_second, default=-1)
+            return {
+                "label": self.label,
+                "rows": self.rows,
+                "errors": self.errors,
+                "retries": self.retries,
+                "seconds": seconds,
+                "rows_per_sec": self.rows / seconds if seconds > 0 else 0.0,
+                "per_second": [self._per_second.get(s, 0) for s in range(last + 1)],
+                "error_samples": list(self.error_samples),
+            }
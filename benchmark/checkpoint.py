@@ -0,0 +1,70 @@
+"""
+Checkpoint em JSON para cargas longas em streaming (problema 3).
+
+Depois de cada lote confirmado por todos os bancos, o populate grava, por etapa (usuários,
+POST, LIKE...), o arquivo, quantos itens do arquivo já foram consumidos e os contadores. Com
+--resume a carga pula o que já foi gravado. O lote que estava sendo gravado quando a carga caiu
+é reenviado inteiro; as inserções são idempotentes (ON CONFLICT DO NOTHING, chaves fixas no
+Mongo/Cassandra e nos hashes do Redis), menos o LPUSH das timelines do Redis. Por isso 'replaying'
+fica True da retomada até o primeiro lote confirmado, e nesse lote o populate tira o id da
+timeline (LREM) antes de empurrar de novo.
+
+O checkpoint só vale se os parâmetros forem os mesmos e se os bancos pedidos agora estiverem
+entre os que confirmaram a gravação; senão a carga começa do zero.
+"""
+import json
+import os
+from typing import Any, Dict, Optional, Sequence
+
+
+class Checkpoint:
+    def __init__(self, path: str, params: Dict[str, Any], backends: Sequence[str], resume: bool = False):
+        self.path = path
+        self.params = params
+        self.backends = sorted(backends)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        # o primeiro lote depois de --resume pode já ter sido gravado em parte
+        self.replaying = resume
+
+        if resume:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            print(f"checkpoint-> nenhum checkpoint em '{self.path}', começando do zero")
+            return
+
+        if saved.get("params") != self.params:
+            print(f"checkpoint-> parâmetros diferentes ({saved.get('params')}), começando do zero")
+            return
+        if not set(self.backends) <= set(saved.get("backends", [])):
+            print(f"checkpoint-> gravado só para {saved.get('backends')}, começando do zero")
+            return
+
+        self.stages = saved.get("stages", {})
+        resumed = ", ".join(f"{name} ({'completo' if s.get('done') else s.get('offset', 0)})" for name, s in self.stages.items())
+        print(f"checkpoint-> retomando: {resumed or 'nada gravado ainda'}")
+
+    def stage(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.stages.get(name)
+
+    def update(self, name: str, **fields):
+        """Atualiza a etapa e grava o arquivo (escrita atômica: tmp + rename)."""
+        self.replaying = False
+        self.stages.setdefault(name, {}).update(fields)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"params": self.params, "backends": self.backends, "stages": self.stages}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        """Carga terminou: o checkpoint não serve mais."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,299 @@
+import json
+import math
+import os
+import sqlite3
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, "history.sqlite")
+
+# limite de amostras cruas guardadas por medição (o open-loop do problema 4 gera milhares)
+MAX_SAMPLES = 10000
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id      TEXT PRIMARY KEY,
+        created_at  TEXT NOT NULL,
+        git_rev     TEXT,
+        git_dirty   INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS measurements (
+        run_id      TEXT NOT NULL REFERENCES runs(run_id),
+        problem     TEXT NOT NULL,
+        backend     TEXT NOT NULL,
+        operation   TEXT NOT NULL,
+        params      TEXT NOT NULL,
+        seconds     REAL,
+        n           INTEGER,
+        p50         REAL,
+        p95         REAL,
+        p99         REAL,
+        mean        REAL,
+        stdev       REAL,
+        samples     TEXT,
+        recorded_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_measurements_key ON measurements (problem, backend, operation, params)",
+    "CREATE INDEX IF NOT EXISTS idx_measurements_run ON measurements (run_id)",
+    # carga dos populate_tables.py (benchmark/ingest_telemetry.py): uma linha por banco/entidade/fase
+    """
+    CREATE TABLE IF NOT EXISTS ingest (
+        run_id       TEXT NOT NULL REFERENCES runs(run_id),
+        problem      TEXT NOT NULL,
+        backend      TEXT NOT NULL,
+        entity       TEXT NOT NULL,
+        phase        TEXT NOT NULL,
+        params       TEXT NOT NULL,
+        seconds      REAL,
+        rows         INTEGER,
+        bytes        INTEGER,
+        retries      INTEGER,
+        errors       INTEGER,
+        rows_per_sec REAL,
+        recorded_at  TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_ingest_key ON ingest (problem, backend, entity, phase, params)",
+    # leituras grandes lista x iterador (benchmark/streaming.py): tempo até a primeira linha e pico de memória
+    """
+    CREATE TABLE IF NOT EXISTS streaming (
+        run_id            TEXT NOT NULL REFERENCES runs(run_id),
+        problem           TEXT NOT NULL,
+        backend           TEXT NOT NULL,
+        operation         TEXT NOT NULL,
+        params            TEXT NOT NULL,
+        rows              INTEGER,
+        seconds           REAL,
+        first_row_seconds REAL,
+        peak_bytes        INTEGER,
+        recorded_at       TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_streaming_key ON streaming (problem, backend, operation, params)",
+]
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DEFAULT_PATH)
+    conn.row_factory = sqlite3.Row
+    for ddl in _SCHEMA:
+        conn.execute(ddl)
+    return conn
+
+
+def git_revision() -> Dict[str, Any]:
+    """Revisão atual do repositório (None fora de um checkout git)."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip() != ""
+        return {"git_rev": rev, "git_dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"git_rev": None, "git_dirty": None}
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Parâmetros normalizados (chaves ordenadas) pra casar medições comparáveis entre execuções."""
+    return json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True, default=str)
+
+
+def _ensure_run(conn: sqlite3.Connection, run_id: str):
+    exists = conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if not exists:
+        rev = git_revision()
+        conn.execute(
+            "INSERT INTO runs (run_id, created_at, git_rev, git_dirty) VALUES (?, ?, ?, ?)",
+            (run_id, datetime.now().isoformat(), rev["git_rev"], rev["git_dirty"]),
+        )
+
+
+def record(run_id: str, problem: str, backend: str, operation: str, params: Dict[str, Any],
+           seconds: Optional[float], stats: Optional[Dict[str, Any]] = None,
+           samples: Optional[List[float]] = None, path: Optional[str] = None):
+    """Acrescenta uma medição ao histórico (nunca sobrescreve execuções anteriores)."""
+    stats = stats or {}
+    conn = connect(path)
+    try:
+        with conn:
+            _ensure_run(conn, run_id)
+            conn.execute(
+                """
+                INSERT INTO measurements
+                (run_id, problem, backend, operation, params, seconds, n, p50, p95, p99, mean, stdev, samples, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    run_id, problem, backend, operation, params_key(params), seconds,
+                    stats.get("n", 1 if seconds is not None else 0),
+                    stats.get("p50", seconds), stats.get("p95", seconds), stats.get("p99", seconds),
+                    stats.get("mean", seconds), stats.get("stdev"),
+                    json.dumps((samples or ([seconds] if seconds is not None else []))[:MAX_SAMPLES]),
+                    datetime.now().isoformat(),
+                ),
+            )
+    finally:
+        conn.close()
+
+
+def record_results(run_id: str, problem: str, backend: str, results: Dict[str, Any],
+                   params: Dict[str, Any], path: Optional[str] = None):
+    """Grava o retorno de run_all_queries/run_trials: uma linha por operação."""
+    stats = results.get("stats", {})
+    samples = results.get("samples", {})
+    for op, seconds in results.get("timings", {}).items():
+        record(run_id, problem, backend, op, params, seconds, stats.get(op), samples.get(op), path)
+    if results.get("streaming"):
+        record_streaming(run_id, problem, backend, results["streaming"], params, path)
+
+
+def record_streaming(run_id: str, problem: str, backend: str, streaming: Dict[str, Dict[str, Any]],
+                     params: Dict[str, Any], path: Optional[str] = None):
+    """Grava as medições de benchmark.streaming.measure_stream: uma linha por operação."""
+    conn = connect(path)
+    try:
+        with conn:
+            _ensure_run(conn, run_id)
+            now = datetime.now().isoformat()
+            conn.executemany(
+                """
+                INSERT INTO streaming
+                (run_id, problem, backend, operation, params, rows, seconds, first_row_seconds, peak_bytes, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(run_id, problem, backend, op, params_key(params), m["rows"], m["seconds"],
+                  m["first_row_seconds"], m["peak_bytes"], now) for op, m in streaming.items()],
+            )
+    finally:
+        conn.close()
+
+
+def record_ingest(run_id: str, problem: str, records: List[Dict[str, Any]],
+                  params: Dict[str, Any], path: Optional[str] = None):
+    """Grava a telemetria de carga (Telemetry.records()): uma linha por banco/entidade/fase."""
+    conn = connect(path)
+    try:
+        with conn:
+            _ensure_run(conn, run_id)
+            now = datetime.now().isoformat()
+            conn.executemany(
+                """
+                INSERT INTO ingest
+                (run_id, problem, backend, entity, phase, params, seconds, rows, bytes, retries, errors, rows_per_sec, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(run_id, problem, r["backend"], r["entity"], r["phase"], params_key(params), r["seconds"],
+                  r["rows"], r["bytes"], r["retries"], r["errors"], r["rows_per_sec"], now) for r in records],
+            )
+    finally:
+        conn.close()
+
+
+def list_runs(path: Optional[str] = None) -> List[sqlite3.Row]:
+    conn = connect(path)
+    try:
+        return conn.execute(
+            """
+            SELECT r.run_id, r.created_at, r.git_rev, r.git_dirty, COUNT(m.operation) AS measurements,
+                   GROUP_CONCAT(DISTINCT m.problem) AS problems
+            FROM runs r LEFT JOIN measurements m ON m.run_id = r.run_id
+            GROUP BY r.run_id ORDER BY r.created_at
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _load(conn, run_id):
+    rows = conn.execute("SELECT * FROM measurements WHERE run_id = ?", (run_id,)).fetchall()
+    # se a mesma chave aparecer mais de uma vez na execução, junta as amostras
+    out = {}
+    for r in rows:
+        key = (r["problem"], r["backend"], r["operation"], r["params"])
+        entry = out.setdefault(key, {"samples": [], "p50": r["p50"], "p95": r["p95"]})
+        entry["samples"].extend(json.loads(r["samples"] or "[]"))
+    return out
+
+
+def mann_whitney(a: List[float], b: List[float]) -> float:
+    """
+    p-valor bicaudal do teste de Mann-Whitney U (aproximação normal com correção de empates).
+    Não assume normalidade, o que importa pra latência (distribuição com cauda longa).
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return float("nan")
+
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        avg = (i + j) / 2.0 + 1
+        for k in range(i, j + 1):
+            ranks[k] = avg
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+
+    r1 = sum(r for r, (_, g) in zip(ranks, pooled) if g == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    mu = n1 * n2 / 2.0
+    sigma = math.sqrt(n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u1 - mu) - 0.5) / sigma
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def compare(baseline: str, candidate: str, alpha: float = 0.05, min_change: float = 0.05,
+            path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Compara duas execuções medição a medição (mesmo problema, banco, operação e parâmetros).
+
+    Uma diferença só é marcada como regressão/melhora se o Mann-Whitney der p < alpha
+    E a mediana mudar pelo menos 'min_change' (fração). Com uma amostra só de cada lado
+    não tem como testar, e o veredito fica 'n/a'.
+    """
+    conn = connect(path)
+    try:
+        base = _load(conn, baseline)
+        cand = _load(conn, candidate)
+    finally:
+        conn.close()
+
+    out = []
+    for key in sorted(set(base) & set(cand)):
+        b, c = base[key], cand[key]
+        p = mann_whitney(b["samples"], c["samples"])
+        change = (c["p50"] - b["p50"]) / b["p50"] if b["p50"] else float("nan")
+
+        if math.isnan(p):
+            verdict = "n/a"
+        elif p < alpha and change >= min_change:
+            verdict = "regressao"
+        elif p < alpha and change <= -min_change:
+            verdict = "melhora"
+        else:
+            verdict = "igual"
+
+        out.append({
+            "problem": key[0], "backend": key[1], "operation": key[2], "params": key[3],
+            "baseline_p50": b["p50"], "candidate_p50": c["p50"],
+            "baseline_p95": b["p95"], "candidate_p95": c["p95"],
+            "change": change, "p_value": p, "verdict": verdict,
+        })
+    return out
@@ -0,0 +1,77 @@
+"""
+Perfis de índice secundário pros prepare_tables.py (--index-profile).
+
+Cada problema declara os índices do Postgres (o CREATE INDEX inteiro) e do Mongo (coleção,
+chaves, opções) por perfil. Os perfis são cumulativos: 'exhaustive' cria também os de
+'recommended', e 'none' fica só com as chaves primárias/unique que o modelo precisa.
+
+    none         só PK: mede o custo de ler sem índice nenhum
+    recommended  um índice por consulta do queries.py (o padrão)
+    exhaustive   + compostos, parciais, cobrindo (INCLUDE) e trigramas: mede o custo dos índices na carga
+
+Os índices são criados com as tabelas ainda vazias, então o custo deles aparece na telemetria
+do populate_tables.py e não aqui. O run_benchmark.py passa o perfil pro prepare e grava o nome
+nos resultados e no histórico (params.index_profile).
+
+    POSTGRES_INDEXES = {"recommended": ["CREATE INDEX idx_pedido_status ON pedido (status)"]}
+    MONGO_INDEXES = {"recommended": [("pedidos", [("status", 1)], {})]}
+"""
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+PROFILES = ["none", "recommended", "exhaustive"]
+DEFAULT_PROFILE = "recommended"
+
+MongoIndex = Tuple[str, Sequence[Tuple[str, Any]], Dict[str, Any]]
+
+
+def selected(indexes: Dict[str, List[Any]], profile: str) -> List[Any]:
+    """Índices do perfil, somando os dos perfis abaixo dele."""
+    if profile not in PROFILES:
+        raise ValueError(f"perfil de índice desconhecido: {profile}")
+    chosen = []
+    for name in PROFILES[:PROFILES.index(profile) + 1]:
+        chosen.extend(indexes.get(name, []))
+    return chosen
+
+
+def add_argument(parser):
+    parser.add_argument("--index-profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help=f"Índices secundários do Postgres/Mongo (padrão: {DEFAULT_PROFILE})")
+
+
+def create_postgres_indexes(cursor, indexes: Dict[str, List[str]], profile: str) -> int:
+    """
+    Roda os CREATE INDEX do perfil. Um índice que falha (ex: pg_trgm indisponível) é só
+    avisado, com SAVEPOINT pra não abortar a transação dos outros.
+    """
+    created = 0
+    for command in selected(indexes, profile):
+        start = time.perf_counter()
+        cursor.execute("SAVEPOINT idx")
+        try:
+            cursor.execute(command)
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT idx")
+            print(f"erro --> PostgreSQL índice: {e}")
+            continue
+        cursor.execute("RELEASE SAVEPOINT idx")
+        created += command.lstrip().upper().startswith("CREATE INDEX")  # CREATE EXTENSION não conta
+        print(f"postgres-> {command.strip()} ({time.perf_counter() - start:.2f}s)")
+    print(f"postgres-> perfil de índice '{profile}': {created} índices")
+    return created
+
+
+def create_mongo_indexes(db, indexes: Dict[str, List[MongoIndex]], profile: str) -> int:
+    created = 0
+    for collection, keys, options in selected(indexes, profile):
+        start = time.perf_counter()
+        try:
+            name = db[collection].create_index(list(keys), **options)
+        except Exception as e:
+            print(f"erro --> MongoDB índice em {collection}: {e}")
+            continue
+        created += 1
+        print(f"mongo-> {collection}.{name} ({time.perf_counter() - start:.2f}s)")
+    print(f"mongo-> perfil de índice '{profile}': {created} índices")
+    return created
@@ -0,0 +1,78 @@
+"""
+Camada de ingestão colunar usada pelos populate_tables.py.
+
+Em vez de df.iterrows() (que cria uma Series por linha e é o gargalo da carga), cada coluna vira
+uma lista python de uma vez (Series.tolist) e as linhas são montadas com zip. Campos derivados
+são calculados como vetores numpy antes de virar lista.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def column_lists(df: pd.DataFrame, cols: Sequence[str]) -> List[list]:
+    """Uma lista python por coluna (valores já convertidos pra tipos nativos pelo pandas)."""
+    return [df[c].tolist() for c in cols]
+
+
+def to_records(df: pd.DataFrame, cols: Sequence[str]) -> List[tuple]:
+    """Tuplas na ordem de 'cols', prontas pro execute_values / binds do Cassandra."""
+    return list(zip(*column_lists(df, cols)))
+
+
+def to_documents(df: pd.DataFrame, fields: Dict[str, str],
+                 nested: Optional[Dict[str, Dict[str, str]]] = None, drop_none: bool = True) -> List[dict]:
+    """
+    Dicionários {campo: valor} a partir de {campo_no_doc: coluna}.
+    'nested' monta subdocumentos ({"nutrientes": {"energia": "energia", ...}}); com drop_none os
+    valores None do subdocumento não entram (o mesmo que os loaders faziam linha a linha).
+    """
+    keys = list(fields)
+    cols = column_lists(df, [fields[k] for k in keys])
+    docs = [dict(zip(keys, values)) for values in zip(*cols)] if keys else [{} for _ in range(len(df))]
+
+    for name, sub_fields in (nested or {}).items():
+        sub_keys = list(sub_fields)
+        sub_cols = column_lists(df, [sub_fields[k] for k in sub_keys])
+        for doc, values in zip(docs, zip(*sub_cols)):
+            if drop_none:
+                doc[name] = {k: v for k, v in zip(sub_keys, values) if v is not None}
+            else:
+                doc[name] = dict(zip(sub_keys, values))
+    return docs
+
+
+def iter_documents(df: pd.DataFrame, fields: Dict[str, str],
+                   nested: Optional[Dict[str, Dict[str, str]]] = None, drop_none: bool = True,
+                   chunk: int = 10_000) -> Iterator[dict]:
+    """Igual ao to_documents, mas de 'chunk' em 'chunk' linhas: só um pedaço vira dict por vez."""
+    for start in range(0, len(df), chunk):
+        yield from to_documents(df.iloc[start:start + chunk], fields, nested, drop_none)
+
+
+def unit_price(quantity: pd.Series, total: pd.Series) -> np.ndarray:
+    """total / quantidade, com 0 quando algum dos dois não é positivo (regra antiga, agora vetorizada)."""
+    q = quantity.to_numpy(dtype=float)
+    t = total.to_numpy(dtype=float)
+    valid = (q > 0) & (t > 0)
+    out = np.zeros(len(q), dtype=float)
+    np.divide(t, q, out=out, where=valid)
+    return out
+
+
+def isoformat(series: pd.Series) -> List[str]:
+    """datetime.isoformat() de uma coluna de datas (mesmo texto que o loader gerava linha a linha)."""
+    return [d.isoformat() for d in series.tolist()]
+
+
+def epoch_seconds(series: pd.Series) -> List[float]:
+    """Segundos desde 1970 de uma coluna de datas sem fuso (tratadas como UTC), pra score de sorted set."""
+    return ((series - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).tolist()
+
+
+def chunked(seq: Sequence, size: int) -> Iterator[Sequence]:
+    """Fatias de 'size' elementos, pra mandar em lotes sem montar tudo num comando só."""
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
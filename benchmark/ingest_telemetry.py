@@ -0,0 +1,82 @@
+"""
+Telemetria da carga (populate_tables.py): duração, linhas/s, bytes enviados, retries e erros
+por banco, entidade e fase.
+
+Fases:
+    parse      leitura/limpeza dos arquivos de origem (banco "source")
+    transform  montagem das linhas/documentos, quando é separável da escrita (ex: to_records do postgres)
+    write      envio pro banco; nos writers que montam as linhas sob demanda (Mongo/Cassandra/Redis)
+               inclui essa montagem, porque as duas coisas acontecem intercaladas
+    commit     commit do postgres
+    total      carga inteira de cada banco (run_loaders), entidade "(todas)"
+
+Os writers de benchmark/ (pg_copy, CassandraWriter, RedisWriter, MongoBulkWriter) registram a
+fase write sozinhos em TELEMETRY; os scripts registram parse/transform/commit com phase(). Várias
+medições com a mesma chave (lotes do problema 3, pedaços do --stream) são somadas.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+PHASES = ["parse", "transform", "write", "commit", "total"]
+
+
+class Telemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    def record(self, backend: str, entity: str, phase: str, seconds: float, rows: int = 0,
+               nbytes: Optional[int] = None, retries: int = 0, errors: int = 0):
+        with self._lock:
+            entry = self._data.setdefault((backend, entity, phase),
+                                          {"seconds": 0.0, "rows": 0, "bytes": None, "retries": 0, "errors": 0})
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            entry["retries"] += retries
+            entry["errors"] += errors
+            if nbytes is not None:
+                entry["bytes"] = (entry["bytes"] or 0) + nbytes
+
+    @contextmanager
+    def phase(self, backend: str, entity: str, phase: str, rows: int = 0):
+        """Mede o bloco; 'rows' pode ser corrigido depois com o dict devolvido (m["rows"] = n)."""
+        measure = {"rows": rows}
+        start = time.perf_counter()
+        try:
+            yield measure
+        finally:
+            self.record(backend, entity, phase, time.perf_counter() - start, rows=measure["rows"])
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Uma linha por (banco, entidade, fase), com rows_per_sec calculado."""
+        with self._lock:
+            out = []
+            for (backend, entity, phase), entry in self._data.items():
+                rate = entry["rows"] / entry["seconds"] if entry["seconds"] > 0 else 0.0
+                out.append(dict(entry, backend=backend, entity=entity, phase=phase, rows_per_sec=rate))
+            return out
+
+    def merge(self, records: List[Dict[str, Any]]):
+        """Junta registros vindos de outro processo (filhos do --parallel)."""
+        for r in records:
+            self.record(r["backend"], r["entity"], r["phase"], r["seconds"], rows=r["rows"],
+                        nbytes=r["bytes"], retries=r["retries"], errors=r["errors"])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def summary(self) -> str:
+        lines = [f"   {'banco':<10} {'entidade':<28} {'fase':<9} {'linhas':>10} {'segundos':>9} {'linhas/s':>10} {'MiB':>8} {'retries':>7} {'erros':>6}"]
+        order = {p: i for i, p in enumerate(PHASES)}
+        for r in sorted(self.records(), key=lambda r: (r["backend"], r["entity"], order.get(r["phase"], 99))):
+            mib = f"{r['bytes'] / 2**20:.1f}" if r["bytes"] is not None else "-"
+            lines.append(f"   {r['backend']:<10} {r['entity'][:28]:<28} {r['phase']:<9} {r['rows']:>10} "
+                         f"{r['seconds']:>9.2f} {r['rows_per_sec']:>10.0f} {mib:>8} {r['retries']:>7} {r['errors']:>6}")
+        return "\n".join(lines)
+
+
+# coletor do processo (cada filho do --parallel tem o seu e devolve os registros pro pai)
+TELEMETRY = Telemetry()
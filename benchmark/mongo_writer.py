@@ -0,0 +1,148 @@
+"""
+Carga em massa no MongoDB em lotes, com várias threads, pros populate_tables.py.
+
+Em vez de montar a lista inteira de documentos e chamar um insert_many só, as operações vão
+sendo acumuladas em lotes de 'chunk' e cada lote cheio vira um bulk_write(ordered=False) num pool
+de 'workers' threads (todas usando o mesmo MongoClient, que já é thread-safe e tem pool de
+conexões). No máximo 'workers' lotes ficam montados esperando resposta, então a memória do
+cliente depende de chunk * workers e não do tamanho do dataset.
+
+Chave duplicada (código 11000) não interrompe a carga: é contada à parte, como o
+'try: insert_many(...) except: pass' do problema 3 fazia, mas sem esconder os outros erros.
+
+    with MongoBulkWriter(db["clientes"], label="clientes") as writer:
+        for doc in docs:
+            writer.insert(doc)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from benchmark.ingest_telemetry import TELEMETRY
+
+DEFAULT_CHUNK = 1000
+DEFAULT_WORKERS = 4
+
+DUPLICATE_KEY = 11000
+
+# quantas mensagens de erro guardar pro relatório
+MAX_ERROR_SAMPLES = 5
+
+
+class MongoBulkWriter:
+    def __init__(self, collection, chunk: int = DEFAULT_CHUNK, workers: int = DEFAULT_WORKERS, label: str = "mongo"):
+        self.collection = collection
+        self.chunk = chunk
+        self.workers = workers
+        self.label = label
+
+        self._ops = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo-writer")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._futures = []
+        self._lock = threading.Lock()
+        self._start = None
+
+        self.operations = 0
+        self.written = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.batches = 0
+        self.error_samples = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def insert(self, doc: Dict[str, Any]):
+        self.add(InsertOne(doc))
+
+    def add(self, op):
+        """Qualquer operação de bulk_write (InsertOne, UpdateOne, ReplaceOne...)."""
+        if self._start is None:
+            self._start = time.perf_counter()
+        self._ops.append(op)
+        if len(self._ops) >= self.chunk:
+            self._send()
+
+    def _send(self):
+        if not self._ops:
+            return
+        ops, self._ops = self._ops, []
+        self._slots.acquire()
+        future = self._executor.submit(self._run, ops)
+        future.add_done_callback(lambda _f: self._slots.release())
+        # os futures já terminados não precisam ficar guardados
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(future)
+
+    def _run(self, ops):
+        written = duplicates = errors = 0
+        samples = []
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            written = result.inserted_count + result.upserted_count + result.modified_count
+        except BulkWriteError as exc:
+            details = exc.details
+            written = details.get("nInserted", 0) + details.get("nUpserted", 0) + details.get("nModified", 0)
+            for err in details.get("writeErrors", []):
+                if err.get("code") == DUPLICATE_KEY:
+                    duplicates += 1
+                else:
+                    errors += 1
+                    samples.append(f"{err.get('code')}: {err.get('errmsg')}")
+        except Exception as exc:
+            errors = len(ops)
+            samples.append(f"{type(exc).__name__}: {exc}")
+
+        with self._lock:
+            self.operations += len(ops)
+            self.written += written
+            self.duplicates += duplicates
+            self.errors += errors
+            self.batches += 1
+            room = MAX_ERROR_SAMPLES - len(self.error_samples)
+            self.error_samples.extend(samples[:max(room, 0)])
+
+    def flush(self):
+        """Manda o lote pendente e espera todos os que estão em voo."""
+        self._send()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> Dict[str, Any]:
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+        report = self.report()
+        TELEMETRY.record("mongo", self.label, "write", report["seconds"], rows=report["written"], errors=report["errors"])
+        print(f"mongo-> {self.label}: {report['written']} documentos em {report['seconds']:.2f}s "
+              f"({report['docs_per_sec']:.0f} docs/s, {self.workers} threads, {report['batches']} lotes), "
+              f"{report['duplicates']} duplicados, {report['errors']} erros")
+        for msg in report["error_samples"]:
+            print(f"   {msg}")
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self._start if self._start is not None else 0.0
+        with self._lock:
+            return {
+                "label": self.label,
+                "operations": self.operations,
+                "written": self.written,
+                "duplicates": self.duplicates,
+                "errors": self.errors,
+                "batches": self.batches,
+                "seconds": seconds,
+                "docs_per_sec": self.written / seconds if seconds > 0 else 0.0,
+                "error_samples": list(self.error_samples),
+            }
@@ -0,0 +1,94 @@
+"""
+Roda a carga de cada banco em sequência ou em processos paralelos, pros populate_tables.py.
+
+Os dados já lidos e limpos ficam no processo pai. Com o start method 'fork' os filhos enxergam
+os mesmos DataFrames/listas (cópia só na escrita, nada é serializado) e cada um abre a própria
+conexão dentro da função de carga, já que conexões de driver não sobrevivem ao fork.
+
+    run_loaders({"postgres": lambda: load_postgres(args, dfs), ...}, parallel=args.parallel)
+"""
+import multiprocessing
+import queue
+import time
+import traceback
+from typing import Any, Callable, Dict
+
+from benchmark.ingest_telemetry import TELEMETRY
+
+
+def _timed(fn: Callable[[], Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        fn()
+        ok, error = True, None
+    except Exception as exc:
+        traceback.print_exc()
+        ok, error = False, f"{type(exc).__name__}: {exc}"
+    return {"ok": ok, "seconds": time.perf_counter() - start, "error": error}
+
+
+def _child(name: str, fn: Callable[[], Any], results) -> None:
+    # o filho herda o TELEMETRY do pai no fork: zera e devolve só o que mediu
+    TELEMETRY.clear()
+    result = _timed(fn)
+    result["telemetry"] = TELEMETRY.records()
+    results.put((name, result))
+
+
+def _run_parallel(loaders: Dict[str, Callable[[], Any]]) -> Dict[str, Dict[str, Any]]:
+    ctx = multiprocessing.get_context("fork")
+    results_queue = ctx.Queue()
+    procs = {name: ctx.Process(target=_child, args=(name, fn, results_queue), name=f"load-{name}")
+             for name, fn in loaders.items()}
+    started = {}
+    for name, proc in procs.items():
+        started[name] = time.perf_counter()
+        proc.start()
+
+    # lê a fila antes do join (um filho com resultado na fila não termina até alguém ler)
+    results = {}
+    while len(results) < len(procs):
+        try:
+            name, result = results_queue.get(timeout=1.0)
+            TELEMETRY.merge(result.pop("telemetry", []))
+            results[name] = result
+        except queue.Empty:
+            # filho que morreu sem mandar resultado (segfault, OOM killer...)
+            for name, proc in procs.items():
+                if name not in results and not proc.is_alive() and proc.exitcode not in (None, 0):
+                    results[name] = {"ok": False, "seconds": time.perf_counter() - started[name],
+                                     "error": f"processo saiu com código {proc.exitcode}"}
+
+    for proc in procs.values():
+        proc.join()
+    return results
+
+
+def run_loaders(loaders: Dict[str, Callable[[], Any]], parallel: bool = False) -> Dict[str, Any]:
+    """
+    Executa cada função de carga ({banco: função sem argumentos}) e imprime o tempo de cada banco
+    e o tempo total de parede. Erro num banco não interrompe os outros.
+    """
+    start = time.perf_counter()
+    if parallel and len(loaders) > 1:
+        results = _run_parallel(loaders)
+    else:
+        results = {name: _timed(fn) for name, fn in loaders.items()}
+    wall = time.perf_counter() - start
+
+    # tempo de ponta a ponta de cada banco, ao lado das fases (linhas = as da fase write)
+    written = {}
+    for r in TELEMETRY.records():
+        if r["phase"] == "write":
+            written[r["backend"]] = written.get(r["backend"], 0) + r["rows"]
+    for name, r in results.items():
+        TELEMETRY.record(name, "(todas)", "total", r["seconds"], rows=written.get(name, 0), errors=0 if r["ok"] else 1)
+
+    summed = sum(r["seconds"] for r in results.values())
+    print(f"\ntempos de carga ({'paralelo' if parallel else 'sequencial'}):")
+    for name in loaders:
+        r = results[name]
+        status = "ok" if r["ok"] else f"ERRO ({r['error']})"
+        print(f"   {name:<10} {r['seconds']:8.2f}s  {status}")
+    print(f"   {'total':<10} {wall:8.2f}s de parede (soma dos bancos: {summed:.2f}s)")
+    return {"parallel": parallel, "backends": results, "wall_seconds": wall, "sum_seconds": summed}
@@ -0,0 +1,122 @@
+"""
+Carga no Postgres via COPY ... FROM STDIN, com a mesma interface pra comparar com execute_values.
+
+O COPY lê de um "arquivo" que gera as linhas sob demanda (o buffer é preenchido aos poucos
+enquanto o driver consome), então a memória fica limitada mesmo com milhões de linhas.
+Quando a tabela pode receber duplicatas ('conflict'), as linhas vão primeiro pra uma tabela
+UNLOGGED de staging (sem chave nem WAL) e são mescladas com INSERT ... SELECT ... ON CONFLICT.
+
+    load_rows(cursor, "pedido", ["id", "cliente_id", "data", "status"], rows,
+              conflict="(id) DO NOTHING", method="copy")
+"""
+import io
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import psycopg2.extras
+
+from benchmark.ingest_telemetry import TELEMETRY
+
+LOADERS = ["copy", "values"]
+
+# tamanho de cada leitura do COPY (o psycopg2 chama read(size) até vir vazio)
+COPY_READ_SIZE = 1 << 20
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _format_value(v: Any) -> str:
+    """Um valor no formato texto do COPY (NULL = \\N)."""
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, float):
+        return "\\N" if v != v else repr(v)
+    return str(v).translate(_ESCAPES)
+
+
+class _RowStream(io.RawIOBase):
+    """Arquivo só-leitura que formata as linhas conforme o COPY pede mais bytes."""
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows = iter(rows)
+        self._buf = bytearray()
+        self.count = 0
+        self.bytes = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buf) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self._buf += ("\t".join(_format_value(v) for v in row) + "\n").encode("utf-8")
+            self.count += 1
+        if size < 0:
+            size = len(self._buf)
+        chunk = bytes(self._buf[:size])
+        del self._buf[:size]
+        self.bytes += len(chunk)
+        return chunk
+
+
+def _report(table: str, method: str, rows: int, seconds: float, nbytes: Optional[int] = None) -> Dict[str, Any]:
+    rate = rows / seconds if seconds > 0 else 0.0
+    print(f"postgres-> {table}: {rows} linhas em {seconds:.2f}s ({rate:.0f} linhas/s) via {method}")
+    TELEMETRY.record("postgres", table, "write", seconds, rows=rows, nbytes=nbytes)
+    return {"table": table, "method": method, "rows": rows, "seconds": seconds, "rows_per_sec": rate, "bytes": nbytes}
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+              conflict: Optional[str] = None) -> Dict[str, Any]:
+    """
+    COPY das linhas pra 'table'. Com 'conflict' (ex: "(id) DO NOTHING") passa pela staging
+    UNLOGGED e faz o merge com ON CONFLICT; sem, copia direto na tabela final.
+    Não faz commit (igual ao execute_values): quem chama decide quando commitar.
+    """
+    cols = ", ".join(columns)
+    stream = _RowStream(rows)
+    start = time.perf_counter()
+
+    if conflict is None:
+        cursor.copy_expert(f"COPY {table} ({cols}) FROM STDIN", stream, size=COPY_READ_SIZE)
+    else:
+        stage = f"_stage_{table}"
+        cursor.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(f"TRUNCATE {stage}")
+        cursor.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", stream, size=COPY_READ_SIZE)
+        cursor.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} ON CONFLICT {conflict}")
+        cursor.execute(f"DROP TABLE {stage}")
+
+    return _report(table, "copy", stream.count, time.perf_counter() - start, stream.bytes)
+
+
+def insert_values(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                  conflict: Optional[str] = None, page_size: int = 1000) -> Dict[str, Any]:
+    """O caminho antigo (execute_values em páginas), com a mesma medição de linhas/s."""
+    rows = list(rows)
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+    if conflict is not None:
+        query += f" ON CONFLICT {conflict}"
+    start = time.perf_counter()
+    psycopg2.extras.execute_values(cursor, query, rows, page_size=page_size)
+    return _report(table, "execute_values", len(rows), time.perf_counter() - start)
+
+
+def load_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+              conflict: Optional[str] = None, method: str = "copy") -> Dict[str, Any]:
+    """Escolhe o caminho de carga pelo --pg-loader dos populate_tables.py."""
+    if method == "copy":
+        return copy_rows(cursor, table, columns, rows, conflict)
+    if method == "values":
+        return insert_values(cursor, table, columns, rows, conflict)
+    raise ValueError(f"loader desconhecido: {method}")
@@ -0,0 +1,182 @@
+"""
+Profiler por amostragem pros runners: uma thread lê a pilha da thread do benchmark a cada
+'interval' segundos (sys._current_frames), bem mais barato que o cProfile, que instrumenta
+toda chamada e distorce justamente os loops em python que a gente quer medir.
+
+Cada amostra é marcada com a operação em andamento (run_trials atualiza 'current') e
+classificada pelo frame mais interno:
+
+    io_wait      esperando o banco (socket/select/ssl, ou Event.wait das threads do driver)
+    driver       código python do driver (parsing do protocolo, decodificação de respostas)
+    driver_c     linha nossa chamando driver em C (psycopg2 execute/fetch): I/O + decode juntos
+    decode       nossos helpers de conversão (_decode_redis_hash, _mongo_fix_id, ...)
+    application  o resto do nosso código (filtros, loops, montagem dos resultados)
+    other        stdlib/outros sem dono identificado
+
+Enquanto roda, o switch interval do GIL cai pro 'interval' (1ms no padrão) pra thread do
+sampler conseguir rodar: isso muda o escalonamento das threads do benchmark, então os tempos de
+uma rodada com --profile não são comparáveis com os de uma sem.
+
+A saída em formato "collapsed" (uma pilha por linha + contagem) abre direto no
+flamegraph.pl, no speedscope ou no inferno.
+"""
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DRIVER_PACKAGES = {"psycopg2", "pymongo", "bson", "cassandra", "redis", "asyncpg", "motor"}
+IO_MODULES = {"socket", "ssl", "selectors", "select", "threading", "queue", "asyncio"}
+# chamadas de I/O feitas de dentro de código python (a chamada em si é C e não aparece na pilha)
+IO_LINE = re.compile(r"\.(recv|recv_into|sendall|send|select|poll|wait|read|readline|connect)\(")
+# chamadas do psycopg2 (extensão em C) feitas a partir do nosso código
+C_DRIVER_LINE = re.compile(r"\.(execute|executemany|fetchall|fetchone|fetchmany|copy_expert|copy_from)\(")
+DECODE_FUNC = re.compile(r"^_decode|_fix_id$")
+
+CATEGORIES = ["io_wait", "driver", "driver_c", "decode", "application", "other"]
+
+Frame = Tuple[str, str, str, int]  # (módulo, função, arquivo, linha)
+
+
+def _stack(frame) -> List[Frame]:
+    """Pilha da mais externa pra mais interna."""
+    out = []
+    while frame is not None:
+        code = frame.f_code
+        out.append((frame.f_globals.get("__name__", "?"), code.co_name, code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+
+def _is_repo(filename: str) -> bool:
+    return filename.startswith(ROOT) and "site-packages" not in filename
+
+
+def classify(stack: List[Frame]) -> str:
+    if not stack:
+        return "other"
+    module, func, filename, lineno = stack[-1]
+    top = module.split(".")[0]
+    line = linecache.getline(filename, lineno)
+
+    if top in IO_MODULES or (not _is_repo(filename) and IO_LINE.search(line)):
+        return "io_wait"
+
+    # sobe a partir do frame mais interno até achar quem é "dono" do trabalho
+    for i in range(len(stack) - 1, -1, -1):
+        module, func, filename, lineno = stack[i]
+        top = module.split(".")[0]
+        if top in DRIVER_PACKAGES:
+            return "driver"
+        if _is_repo(filename):
+            # <dictcomp>/<lambda>/<genexpr> contam como a função que os contém
+            j = i
+            while j > 0 and stack[j][1].startswith("<") and _is_repo(stack[j - 1][2]):
+                j -= 1
+            if DECODE_FUNC.search(stack[j][1]):
+                return "decode"
+            if i == len(stack) - 1 and C_DRIVER_LINE.search(linecache.getline(filename, lineno)):
+                return "driver_c"
+            return "application"
+    return "other"
+
+
+def _label(frame: Frame) -> str:
+    module, func, filename, lineno = frame
+    return f"{module}:{func}"
+
+
+class SamplingProfiler:
+    """
+    Amostra a pilha de uma thread (por padrão a que criou o profiler) em background.
+
+        prof = SamplingProfiler().start()
+        db.run_all_queries(..., profiler=prof)
+        prof.stop()
+        prof.save_collapsed("profile_PostgresDb.folded")
+        prof.summary()
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        # operação em andamento; None = fora de uma operação medida (não amostra)
+        self.current: Optional[str] = None
+        self.stacks: Dict[str, Counter] = defaultdict(Counter)
+        self.categories: Dict[str, Counter] = defaultdict(Counter)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._prev_switch = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            op = self.current
+            if op is not None:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    stack = _stack(frame)
+                    category = classify(stack)
+                    self.categories[op][category] += 1
+                    self.stacks[op][tuple([op, category] + [_label(f) for f in stack])] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        # com o intervalo padrão do GIL (5ms) o sampler só rodaria a cada 5ms em código python puro
+        self._prev_switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._prev_switch, self.interval))
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._prev_switch is not None:
+            sys.setswitchinterval(self._prev_switch)
+        return self
+
+    def summary(self, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Por operação: amostras, fração de cada categoria e as funções mais frequentes.
+        Se 'timings' (segundos por operação) vier, também estima os segundos de cada categoria.
+        """
+        out = {}
+        for op, counts in self.categories.items():
+            total = sum(counts.values())
+            fractions = {c: counts.get(c, 0) / total for c in CATEGORIES}
+            leaves = Counter()
+            for stack, n in self.stacks[op].items():
+                leaves[stack[-1]] += n
+            entry = {
+                "samples": total,
+                "fractions": fractions,
+                "top_frames": [{"frame": f, "fraction": n / total} for f, n in leaves.most_common(10)],
+            }
+            if timings and op in timings:
+                entry["seconds"] = {c: f * timings[op] for c, f in fractions.items()}
+            out[op] = entry
+        return out
+
+    def save_collapsed(self, path: str):
+        """Formato collapsed do flamegraph: 'op;categoria;frame;frame... contagem'."""
+        with open(path, "w") as f:
+            for op in self.stacks:
+                for stack, n in self.stacks[op].items():
+                    f.write(";".join(stack) + f" {n}\n")
+
+
+def format_profile(profile: Dict[str, Dict[str, Any]], indent: str = "  ") -> str:
+    """Uma linha por operação pro OUT.txt com a divisão do tempo no cliente."""
+    lines = [f"{indent}(profiler ligado: switch interval do GIL reduzido, tempos desta rodada não comparáveis com rodadas sem --profile)\n"]
+    for op, p in profile.items():
+        parts = " ".join(f"{c}={p['fractions'][c] * 100:.0f}%" for c in CATEGORIES if p["fractions"][c] > 0)
+        lines.append(f"{indent}{op}: {parts} (amostras={p['samples']})\n")
+    return "".join(lines)
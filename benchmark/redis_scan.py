@@ -0,0 +1,98 @@
+"""
+Scan de hashes do Redis com filtro no cliente, pros queries.py.
+
+scan_iter + hget/hgetall/hexists por chave custa duas ou três idas e voltas por chave. Aqui cada
+SCAN traz um lote grande de chaves (COUNT alto, TYPE hash pra pular chaves de outro tipo no
+próprio servidor) e os campos pedidos de todas as chaves do lote vêm num pipeline de HMGET só:
+uma ida e volta pro SCAN e uma pros campos, por lote. O scan para assim que o filtro acha o
+limite de resultados, e no fim imprime chaves varridas por segundo.
+
+    scan = RedisScan(conn, "item:*", ["nome"])
+    found = scan.filter(lambda f: f["nome"] and b"choc" in f["nome"], limit=100, full=True)
+"""
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_COUNT = 5000
+
+
+class RedisScan:
+    def __init__(self, conn, match: str, fields: Sequence[str], count: int = DEFAULT_COUNT,
+                 key_type: Optional[str] = "hash", label: Optional[str] = None):
+        self.conn = conn
+        self.match = match
+        self.fields = list(fields)
+        self.count = count
+        self.key_type = key_type
+        self.label = label or match
+
+        self.keys_scanned = 0
+        self.batches = 0
+        self.matched = 0
+        self.seconds = 0.0
+
+    def batches_iter(self) -> Iterator[List[Tuple[bytes, Dict[str, Optional[bytes]]]]]:
+        """Lotes de (chave, {campo: valor em bytes ou None}), um por SCAN."""
+        start = time.perf_counter()
+        cursor = 0
+        try:
+            while True:
+                cursor, keys = self.conn.scan(cursor, match=self.match, count=self.count, _type=self.key_type)
+                if keys:
+                    pipe = self.conn.pipeline(transaction=False)
+                    for key in keys:
+                        pipe.hmget(key, self.fields)
+                    # chave de outro tipo (sem TYPE no SCAN) volta como erro no lugar do valor: só pula
+                    values = pipe.execute(raise_on_error=False)
+                    self.keys_scanned += len(keys)
+                    self.batches += 1
+                    yield [(key, dict(zip(self.fields, vals))) for key, vals in zip(keys, values)
+                           if not isinstance(vals, Exception)]
+                if cursor == 0:
+                    return
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def __iter__(self) -> Iterator[Tuple[bytes, Dict[str, Optional[bytes]]]]:
+        for batch in self.batches_iter():
+            yield from batch
+
+    def filter(self, predicate: Callable[[Dict[str, Optional[bytes]]], bool], limit: Optional[int] = None,
+               full: bool = False) -> List[Dict[str, Any]]:
+        """
+        Campos das chaves que passam no 'predicate' (dict campo -> bytes). Com full=True os hashes
+        inteiros dos encontrados vêm num HGETALL em pipeline por lote, já decodificados.
+        """
+        found: List[Dict[str, Any]] = []
+        batches = self.batches_iter()
+        try:
+            for batch in batches:
+                hits = [(key, f) for key, f in batch if predicate(f)]
+                if limit is not None:
+                    hits = hits[:limit - len(found)]
+                if full and hits:
+                    pipe = self.conn.pipeline(transaction=False)
+                    for key, _ in hits:
+                        pipe.hgetall(key)
+                    found.extend(_decode(h) for h in pipe.execute() if h)
+                else:
+                    found.extend(_decode(f) for _, f in hits)
+                if limit is not None and len(found) >= limit:
+                    break
+        finally:
+            batches.close()  # fecha o gerador já (mede o tempo) em vez de esperar o gc
+        self.matched += len(found)
+        self.report()
+        return found
+
+    def report(self) -> Dict[str, Any]:
+        rate = self.keys_scanned / self.seconds if self.seconds > 0 else 0.0
+        print(f"redis-scan-> {self.label}: {self.keys_scanned} chaves em {self.seconds:.2f}s "
+              f"({rate:.0f} chaves/s, {self.batches} lotes), {self.matched} encontradas")
+        return {"label": self.label, "keys": self.keys_scanned, "batches": self.batches, "matched": self.matched,
+                "seconds": self.seconds, "keys_per_sec": rate}
+
+
+def _decode(h: Dict[Any, Optional[bytes]]) -> Dict[str, Any]:
+    return {(k.decode("utf-8") if isinstance(k, bytes) else k): (v.decode("utf-8") if isinstance(v, bytes) else v)
+            for k, v in h.items()}
@@ -0,0 +1,136 @@
+"""
+Escrita no Redis em pipelines de tamanho limitado pros populate_tables.py.
+
+Um pipeline só pro dataset inteiro guarda todos os comandos (e todas as respostas) na memória
+do cliente até o execute(). O RedisWriter tem a mesma cara de um pipeline (writer.hset(...),
+writer.sadd(...)), mas manda o pipeline (sem MULTI/EXEC) a cada 'max_commands' comandos ou
+'max_bytes' de argumentos. Com connections > 1 os pipelines cheios vão pra um pool de threads,
+cada um numa conexão do pool do redis-py, com no máximo 'connections' em voo; nesse caso a ordem
+entre pipelines diferentes não é garantida (dentro de um pipeline continua sendo).
+
+    with RedisWriter(conn, label="clientes") as writer:
+        for ...:
+            writer.hset(key, mapping=...)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from benchmark.ingest_telemetry import TELEMETRY
+from benchmark.sampler import process_rss_bytes
+
+DEFAULT_MAX_COMMANDS = 10_000
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _arg_size(arg: Any) -> int:
+    if isinstance(arg, (bytes, str)):
+        return len(arg)
+    return 8  # números: o tamanho exato não importa pra decidir a hora de mandar
+
+
+class RedisWriter:
+    def __init__(self, conn, max_commands: int = DEFAULT_MAX_COMMANDS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 connections: int = 1, label: str = "redis"):
+        self.conn = conn
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        self.connections = connections
+        self.label = label
+
+        self._pipe = conn.pipeline(transaction=False)
+        self._pending_commands = 0
+        self._pending_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix="redis-writer") if connections > 1 else None
+        self._slots = threading.BoundedSemaphore(connections)
+        self._futures = []
+        self._lock = threading.Lock()
+        self._start = None
+
+        self.commands = 0
+        self.bytes = 0
+        self.pipelines = 0
+        self.peak_rss_bytes = process_rss_bytes()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        """Qualquer comando do redis-py: enfileira no pipeline atual e manda se passou do limite."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self._pipe, name)
+
+        def queue(*args, **kwargs):
+            if self._start is None:
+                self._start = time.perf_counter()
+            command(*args, **kwargs)
+            self._pending_commands += 1
+            self._pending_bytes += sum(_arg_size(a) for a in self._pipe.command_stack[-1][0])
+            if self._pending_commands >= self.max_commands or self._pending_bytes >= self.max_bytes:
+                self._send()
+            return self
+
+        return queue
+
+    def _send(self):
+        if not self._pending_commands:
+            return
+        pipe, commands, size = self._pipe, self._pending_commands, self._pending_bytes
+        self._pipe = self.conn.pipeline(transaction=False)
+        self._pending_commands = self._pending_bytes = 0
+        self.peak_rss_bytes = max(self.peak_rss_bytes, process_rss_bytes())
+
+        if self._executor is None:
+            self._run(pipe, commands, size)
+            return
+
+        # no máximo 'connections' pipelines montados esperando resposta
+        self._slots.acquire()
+        future = self._executor.submit(self._run, pipe, commands, size)
+        future.add_done_callback(lambda _f: self._slots.release())
+        self._futures.append(future)
+
+    def _run(self, pipe, commands, size):
+        pipe.execute()
+        with self._lock:
+            self.commands += commands
+            self.bytes += size
+            self.pipelines += 1
+
+    def flush(self):
+        """Manda o que está pendente e espera todos os pipelines em voo (erros sobem aqui)."""
+        self._send()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> Dict[str, Any]:
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+        report = self.report()
+        TELEMETRY.record("redis", self.label, "write", report["seconds"], rows=report["commands"], nbytes=report["bytes"])
+        print(f"redis-> {self.label}: {report['commands']} comandos em {report['seconds']:.2f}s "
+              f"({report['commands_per_sec']:.0f} comandos/s, {report['pipelines']} pipelines, "
+              f"pico RSS {report['peak_rss_bytes'] / 2**20:.0f} MiB)")
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self._start if self._start is not None else 0.0
+        return {
+            "label": self.label,
+            "commands": self.commands,
+            "bytes": self.bytes,
+            "pipelines": self.pipelines,
+            "seconds": seconds,
+            "commands_per_sec": self.commands / seconds if seconds > 0 else 0.0,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
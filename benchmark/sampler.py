@@ -0,0 +1,178 @@
+import http.client
+import json
+import os
+import resource
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# nomes usados no start_databases.sh
+DEFAULT_CONTAINERS = ["dev-postgres", "dev-mongo", "dev-cassandra", "dev-redis"]
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection que fala com a API do docker pelo socket unix (sem depender do SDK do docker)."""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def _container_stats(container: str, socket_path: str) -> Dict[str, Any]:
+    """Contadores crus de um container (one-shot: responde na hora, sem a janela de 1s do 'docker stats')."""
+    conn = _UnixHTTPConnection(socket_path)
+    try:
+        conn.request("GET", f"/containers/{container}/stats?stream=false&one-shot=true")
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"docker api {resp.status}: {body[:200]!r}")
+        return json.loads(body)
+    finally:
+        conn.close()
+
+
+def _sum_blkio(raw: Dict[str, Any]) -> Dict[str, int]:
+    read = write = 0
+    for entry in (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = entry.get("op", "").lower()
+        if op == "read":
+            read += entry.get("value", 0)
+        elif op == "write":
+            write += entry.get("value", 0)
+    return {"blk_read_bytes": read, "blk_write_bytes": write}
+
+
+def _sum_net(raw: Dict[str, Any]) -> Dict[str, int]:
+    rx = tx = 0
+    for iface in (raw.get("networks") or {}).values():
+        rx += iface.get("rx_bytes", 0)
+        tx += iface.get("tx_bytes", 0)
+    return {"net_rx_bytes": rx, "net_tx_bytes": tx}
+
+
+def _mem_bytes(raw: Dict[str, Any]) -> int:
+    mem = raw.get("memory_stats") or {}
+    usage = mem.get("usage", 0)
+    # mesmo cálculo do 'docker stats': desconta o page cache
+    stats = mem.get("stats") or {}
+    cache = stats.get("inactive_file", stats.get("total_inactive_file", 0))
+    return max(usage - cache, 0)
+
+
+def process_rss_bytes() -> int:
+    """RSS atual do processo python (Linux: /proc; senão cai no pico do getrusage)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceSampler:
+    """
+    Amostrador contínuo de recursos, rodando numa thread em background durante o benchmark.
+
+    A cada 'interval' segundos registra CPU, memória, I/O de disco e rede de cada container
+    e CPU/RSS do próprio processo python. Cada amostra tem 't' no mesmo relógio das medições
+    (time.perf_counter), então dá pra alinhar um pico de latência com o que o servidor fazia.
+    """
+
+    def __init__(self, containers: Optional[List[str]] = None, interval: float = 0.5,
+                 socket_path: str = DOCKER_SOCKET):
+        self.containers = containers if containers is not None else DEFAULT_CONTAINERS
+        self.interval = interval
+        self.socket_path = socket_path
+        self.samples: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._prev_cpu: Dict[str, Any] = {}
+        self._docker_ok = os.path.exists(socket_path)
+        if not self._docker_ok:
+            print(f"sampler -> {socket_path} não encontrado, só o processo python será amostrado")
+
+        # referência pra converter 't' (perf_counter) em horário de parede
+        self.clock = {"perf_counter": time.perf_counter(), "epoch": time.time()}
+
+    def _sample_container(self, name: str) -> Dict[str, Any]:
+        raw = _container_stats(name, self.socket_path)
+        cpu = raw.get("cpu_stats") or {}
+        total = (cpu.get("cpu_usage") or {}).get("total_usage", 0)
+        system = cpu.get("system_cpu_usage", 0)
+        online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+
+        # CPU% = delta do container / delta do sistema, igual ao docker stats
+        cpu_percent = None
+        prev = self._prev_cpu.get(name)
+        if prev and system > prev[1]:
+            cpu_percent = (total - prev[0]) / (system - prev[1]) * online * 100.0
+        self._prev_cpu[name] = (total, system)
+
+        sample = {"cpu_percent": cpu_percent, "mem_bytes": _mem_bytes(raw)}
+        sample.update(_sum_blkio(raw))
+        sample.update(_sum_net(raw))
+        return sample
+
+    def _sample_process(self, prev_cpu_time, prev_t, t):
+        times = os.times()
+        cpu_time = times.user + times.system
+        cpu_percent = None
+        if prev_cpu_time is not None and t > prev_t:
+            cpu_percent = (cpu_time - prev_cpu_time) / (t - prev_t) * 100.0
+        return cpu_time, {"cpu_percent": cpu_percent, "rss_bytes": process_rss_bytes()}
+
+    def _run(self):
+        prev_cpu_time = None
+        prev_t = time.perf_counter()
+        while not self._stop.is_set():
+            t = time.perf_counter()
+            sample = {"t": t, "epoch": time.time(), "containers": {}}
+
+            if self._docker_ok:
+                for name in self.containers:
+                    try:
+                        sample["containers"][name] = self._sample_container(name)
+                    except Exception as e:
+                        sample["containers"][name] = {"error": str(e)}
+
+            prev_cpu_time, sample["client"] = self._sample_process(prev_cpu_time, prev_t, t)
+            prev_t = t
+            self.samples.append(sample)
+
+            # desconta o tempo gasto coletando pra manter o intervalo fixo
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter() - t)))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> List[Dict[str, Any]]:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.samples
+
+    def save(self, path: str):
+        """Salva em JSONL: primeira linha com a referência do relógio, depois uma amostra por linha."""
+        with open(path, "w") as f:
+            f.write(json.dumps({"clock": self.clock, "interval": self.interval, "containers": self.containers}) + "\n")
+            for s in self.samples:
+                f.write(json.dumps(s) + "\n")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
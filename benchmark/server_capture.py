@@ -0,0 +1,323 @@
+"""
+Captura da visão do servidor durante uma operação: plano de execução, linhas/documentos
+examinados e tempo gasto dentro do banco, pra comparar com o tempo medido no cliente.
+
+Cada classe é um context manager: tudo o que o banco executar dentro do 'with' é capturado
+e o resumo fica em '.result'. Erros na captura (ex: falta de permissão) não derrubam a
+operação, só aparecem em result["error"].
+
+    with PostgresCapture(conn) as cap:
+        db.find_pedidos_por_status("Pago")
+    cap.result  # {"server_ms": ..., "statements": [...]}
+"""
+import json
+from collections import deque
+from typing import Any, Dict, List
+
+# limites pra não explodir o JSON de resultados em operações com milhares de comandos
+MAX_ENTRIES = 200
+MAX_COMMAND_CHARS = 300
+
+
+class _Capture:
+    def __init__(self):
+        self.result: Dict[str, Any] = {}
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        try:
+            self._start()
+            self._active = True
+        except Exception as e:
+            self._active = False
+            self.result = {"error": f"captura não iniciada: {e}"}
+        return self
+
+    def __exit__(self, *exc):
+        if self._active:
+            try:
+                self._finish()
+            except Exception as e:
+                self.result = {"error": f"captura falhou: {e}"}
+        return False
+
+
+def _walk_plan(node: Dict[str, Any], out: Dict[str, Any]):
+    out["node_types"].append(node.get("Node Type"))
+    if "Index Name" in node:
+        out["indexes"].append(node["Index Name"])
+    if node.get("Node Type") == "Seq Scan":
+        out["seq_scans"].append(node.get("Relation Name"))
+    out["rows_removed_by_filter"] += node.get("Rows Removed by Filter", 0)
+    for child in node.get("Plans", []):
+        _walk_plan(child, out)
+
+
+class PostgresCapture(_Capture):
+    """
+    Usa o auto_explain (vem no contrib da imagem oficial) em vez de reescrever cada consulta com
+    EXPLAIN: com log_min_duration=0 e log_analyze/log_buffers, todo statement executado na sessão
+    gera o equivalente a EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), que chega como NOTICE no psycopg2.
+    Precisa de superusuário (o 'admin' do docker é).
+    """
+
+    SETTINGS = {
+        "auto_explain.log_min_duration": "0",
+        "auto_explain.log_analyze": "on",
+        "auto_explain.log_buffers": "on",
+        "auto_explain.log_timing": "on",
+        "auto_explain.log_nested_statements": "on",
+        "auto_explain.log_format": "json",
+        "auto_explain.log_level": "notice",
+    }
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+
+    def _start(self):
+        self._prev_notices = self.conn.notices
+        # o psycopg2 corta listas em 50 avisos; deque não tem esse limite
+        self.conn.notices = deque()
+        with self.conn.cursor() as cur:
+            cur.execute("LOAD 'auto_explain'")
+            for k, v in self.SETTINGS.items():
+                cur.execute(f"SET {k} = %s", (v,))
+        # SET é transacional: commita pra valer pra sessão inteira, mesmo se a operação der rollback
+        self.conn.commit()
+        self.conn.notices = deque()
+
+    def _finish(self):
+        notices = self.conn.notices
+        with self.conn.cursor() as cur:
+            cur.execute("SET auto_explain.log_min_duration = -1")
+        self.conn.commit()
+        self.conn.notices = self._prev_notices
+
+        statements = []
+        for notice in notices:
+            if "plan:" not in notice:
+                continue
+            try:
+                doc = json.loads(notice.split("plan:", 1)[1])
+            except ValueError:
+                continue
+            plan = doc.get("Plan", {})
+            walked = {"node_types": [], "indexes": [], "seq_scans": [], "rows_removed_by_filter": 0}
+            _walk_plan(plan, walked)
+            statements.append({
+                "query": (doc.get("Query Text") or "")[:MAX_COMMAND_CHARS],
+                "execution_ms": doc.get("Execution Time"),
+                "planning_ms": doc.get("Planning Time"),
+                "rows": plan.get("Actual Rows"),
+                "shared_hit_blocks": plan.get("Shared Hit Blocks"),
+                "shared_read_blocks": plan.get("Shared Read Blocks"),
+                "indexes": walked["indexes"],
+                "seq_scans": walked["seq_scans"],
+                "rows_removed_by_filter": walked["rows_removed_by_filter"],
+                "plan": plan,
+            })
+
+        self.result = {
+            "server_ms": sum((s["execution_ms"] or 0) + (s["planning_ms"] or 0) for s in statements),
+            "statements": statements[:MAX_ENTRIES],
+            "statement_count": len(statements),
+        }
+
+
+class MongoCapture(_Capture):
+    """
+    Usa o profiler do banco (nível 2) durante a operação. Cada comando executado vira uma entrada em
+    system.profile com planSummary (COLLSCAN/IXSCAN {...}), keysExamined, docsExamined, nreturned e
+    millis: os mesmos números do explain("executionStats"), mas sem precisar reescrever as consultas.
+    """
+
+    FIELDS = ["op", "ns", "planSummary", "keysExamined", "docsExamined", "nreturned",
+              "nMatched", "nModified", "ninserted", "ndeleted", "millis"]
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+
+    def _start(self):
+        self._prev_level = self.db.command("profile", -1).get("was", 0)
+        # system.profile só pode ser apagada com o profiler desligado
+        self.db.command("profile", 0)
+        self.db["system.profile"].drop()
+        self.db.command("profile", 2)
+
+    def _finish(self):
+        self.db.command("profile", self._prev_level)
+        entries = []
+        for doc in self.db["system.profile"].find().sort("ts", 1):
+            command = doc.get("command", {})
+            if "profile" in command:
+                continue
+            entry = {k: doc[k] for k in self.FIELDS if k in doc}
+            entry["command"] = json.dumps(command, default=str)[:MAX_COMMAND_CHARS]
+            entries.append(entry)
+
+        self.result = {
+            "server_ms": sum(e.get("millis", 0) for e in entries),
+            "keys_examined": sum(e.get("keysExamined", 0) for e in entries),
+            "docs_examined": sum(e.get("docsExamined", 0) for e in entries),
+            "collscans": sum(1 for e in entries if e.get("planSummary") == "COLLSCAN"),
+            "operations": entries[:MAX_ENTRIES],
+            "operation_count": len(entries),
+        }
+
+
+class _TracingSession:
+    """
+    Repassa tudo pra sessão original, mas liga trace=True em cada execute e execute_async. O
+    execute_async pega também o execute_concurrent_with_args e os scans por faixa de token
+    (benchmark/cassandra_scan.py), que recebem a sessão e chamam execute_async nela.
+    """
+
+    def __init__(self, session, traced: List[Any]):
+        self._session = session
+        self._traced = traced
+
+    def execute(self, query, parameters=None, *args, **kwargs):
+        kwargs["trace"] = True
+        rs = self._session.execute(query, parameters, *args, **kwargs)
+        self._traced.append(rs)
+        return rs
+
+    def execute_async(self, query, parameters=None, *args, **kwargs):
+        kwargs["trace"] = True
+        future = self._session.execute_async(query, parameters, *args, **kwargs)
+        self._traced.append(future)
+        return future
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class CassandraCapture(_Capture):
+    """
+    Liga o tracing do Cassandra em todas as consultas da operação trocando temporariamente
+    'owner.session' por um proxy. Os traces (system_traces) são lidos só no fim, fora da operação.
+    """
+
+    def __init__(self, owner, attr: str = "session"):
+        super().__init__()
+        self.owner = owner
+        self.attr = attr
+
+    def _start(self):
+        self._session = getattr(self.owner, self.attr)
+        self._traced: List[Any] = []
+        setattr(self.owner, self.attr, _TracingSession(self._session, self._traced))
+
+    def _finish(self):
+        setattr(self.owner, self.attr, self._session)
+        traces = []
+        for rs in self._traced[:MAX_ENTRIES]:
+            try:
+                # posicional: ResultSet chama de max_wait_sec, ResponseFuture de max_wait
+                trace = rs.get_query_trace(5.0)
+            except Exception as e:
+                traces.append({"error": str(e)})
+                continue
+            traces.append({
+                "query": str((trace.parameters or {}).get("query", ""))[:MAX_COMMAND_CHARS],
+                "coordinator": str(trace.coordinator),
+                "duration_us": trace.duration.total_seconds() * 1e6 if trace.duration else None,
+                "events": [
+                    {"activity": ev.description, "source": str(ev.source),
+                     "elapsed_us": ev.source_elapsed.total_seconds() * 1e6 if ev.source_elapsed else None}
+                    for ev in trace.events
+                ],
+            })
+
+        self.result = {
+            "server_ms": sum((t.get("duration_us") or 0) for t in traces) / 1000.0,
+            "queries": traces,
+            "query_count": len(self._traced),
+        }
+
+
+class RedisCapture(_Capture):
+    """
+    Zera o SLOWLOG com limite 0 (todo comando entra) e o LATENCY monitor antes da operação
+    e lê os dois no fim. As configurações anteriores do servidor são restauradas.
+    """
+
+    CONFIG = {"slowlog-log-slower-than": "0", "slowlog-max-len": "100000", "latency-monitor-threshold": "1"}
+    IGNORED = (b"SLOWLOG", b"CONFIG", b"LATENCY")
+
+    def __init__(self, r):
+        super().__init__()
+        self.r = r
+
+    def _start(self):
+        self._prev = {}
+        for k, v in self.CONFIG.items():
+            self._prev.update(self.r.config_get(k))
+            self.r.config_set(k, v)
+        self.r.slowlog_reset()
+        self.r.execute_command("LATENCY", "RESET")
+
+    def _finish(self):
+        entries = self.r.slowlog_get(int(self.CONFIG["slowlog-max-len"]))
+        latest = self.r.execute_command("LATENCY", "LATEST")
+        for k, v in self._prev.items():
+            self.r.config_set(k, v)
+
+        commands = []
+        for e in reversed(entries):
+            cmd = e.get("command", b"")
+            if isinstance(cmd, str):
+                cmd = cmd.encode()
+            if cmd.split(b" ", 1)[0].upper() in self.IGNORED:
+                continue
+            commands.append({"command": cmd.decode("utf-8", "replace")[:MAX_COMMAND_CHARS], "duration_us": e.get("duration")})
+
+        by_name: Dict[str, Dict[str, float]] = {}
+        for c in commands:
+            name = c["command"].split(" ", 1)[0].upper()
+            agg = by_name.setdefault(name, {"calls": 0, "duration_us": 0})
+            agg["calls"] += 1
+            agg["duration_us"] += c["duration_us"] or 0
+
+        self.result = {
+            "server_ms": sum(c["duration_us"] or 0 for c in commands) / 1000.0,
+            "command_count": len(commands),
+            "by_command": by_name,
+            "slowest": sorted(commands, key=lambda c: c["duration_us"] or 0, reverse=True)[:20],
+            "latency_latest": [
+                {"event": (ev[0].decode() if isinstance(ev[0], bytes) else ev[0]), "timestamp": ev[1], "latest_ms": ev[2], "max_ms": ev[3]}
+                for ev in latest or []
+            ],
+        }
+
+
+def format_server(server: Dict[str, Dict[str, Any]], indent: str = "  ") -> str:
+    """Uma linha por operação pro OUT.txt: tempo no cliente x tempo no servidor e o que foi examinado."""
+    lines = []
+    for name, s in server.items():
+        client_ms = s.get("client_seconds", 0) * 1000
+        if "error" in s:
+            lines.append(f"{indent}{name}: cliente={client_ms:.2f}ms servidor=? ({s['error']})\n")
+            continue
+
+        detail = ""
+        if "statements" in s:
+            indexes = sorted({i for st in s["statements"] for i in st["indexes"]})
+            seq = sorted({t for st in s["statements"] for t in st["seq_scans"] if t})
+            detail = f"statements={s['statement_count']} indices={indexes or '-'} seq_scans={seq or '-'}"
+        elif "docs_examined" in s:
+            detail = f"comandos={s['operation_count']} keys_examined={s['keys_examined']} docs_examined={s['docs_examined']} collscans={s['collscans']}"
+        elif "queries" in s:
+            detail = f"consultas={s['query_count']}"
+        elif "command_count" in s:
+            detail = f"comandos={s['command_count']}"
+
+        lines.append(f"{indent}{name}: cliente={client_ms:.2f}ms servidor={s.get('server_ms', 0):.2f}ms {detail}\n")
+    return "".join(lines)
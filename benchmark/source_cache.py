@@ -0,0 +1,121 @@
+"""
+Cache em Parquet dos DataFrames já limpos pelos populate_tables.py.
+
+A chave junta o hash do conteúdo dos arquivos de origem, os parâmetros da leitura (--limit-rows)
+e o código-fonte das funções de limpeza (e dos módulos de helpers que elas chamam, como o
+benchmark/ingest.py): mudar o dataset, o limite ou a limpeza gera outra chave
+e o cache antigo simplesmente deixa de ser usado. O hash de cada arquivo (blake2b do conteúdo
+inteiro) é guardado por (caminho, tamanho, mtime), então um arquivo de vários GB só é lido
+inteiro de novo quando muda.
+
+Precisa do pyarrow; sem ele o cache fica desligado e os dados são lidos/limpos normalmente.
+
+    df_customers, df_products = cached_frames("problema1", [csv1, csv2], {"limit_rows": 1000},
+                                              [load_customers, load_products], build)
+"""
+import glob
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (só pra saber se o to_parquet/read_parquet vai funcionar)
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+HASH_BLOCK = 8 * 1024 * 1024
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def file_hash(path: str, cache_dir: str) -> str:
+    """blake2b do conteúdo do arquivo, reaproveitado enquanto tamanho e mtime não mudarem."""
+    st = os.stat(path)
+    index_path = os.path.join(cache_dir, "hashes.json")
+    index = _load_json(index_path)
+    entry = index.get(os.path.abspath(path))
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["hash"]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    index[os.path.abspath(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    return digest
+
+
+def code_hash(funcs: Sequence[Any]) -> str:
+    """Hash do código-fonte das funções de limpeza; um módulo na lista entra com o arquivo inteiro."""
+    h = hashlib.blake2b(digest_size=16)
+    for fn in funcs:
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    return h.hexdigest()
+
+
+def cache_key(sources: Sequence[str], params: Dict[str, Any], code: Sequence[Any], cache_dir: str) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for path in sources:
+        h.update(file_hash(path, cache_dir).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    h.update(code_hash(code).encode())
+    return h.hexdigest()
+
+
+def cached_frames(name: str, sources: Sequence[str], params: Dict[str, Any], code: Sequence[Any],
+                  build: Callable[[], Tuple[pd.DataFrame, ...]], cache_dir: str, enabled: bool = True) -> Tuple[pd.DataFrame, ...]:
+    """
+    Devolve os DataFrames de build() (uma tupla), lendo do Parquet se já existir um cache com a
+    mesma chave. Caches antigos do mesmo 'name' são apagados quando um novo é gravado.
+    """
+    if not enabled:
+        return build()
+    if not HAVE_PYARROW:
+        print("cache-> pyarrow não instalado, lendo os arquivos de origem")
+        return build()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    key = cache_key(sources, params, code, cache_dir)
+    manifest_path = os.path.join(cache_dir, f"{name}-{key}.json")
+    manifest = _load_json(manifest_path)
+
+    if manifest:
+        frames = tuple(pd.read_parquet(os.path.join(cache_dir, f)) for f in manifest["files"])
+        print(f"cache-> {name}: {sum(len(df) for df in frames)} linhas lidas do cache em {time.perf_counter() - start:.2f}s ({key})")
+        return frames
+
+    frames = build()
+    for old in glob.glob(os.path.join(cache_dir, f"{name}-*")):
+        os.remove(old)
+    files: List[str] = []
+    try:
+        for i, df in enumerate(frames):
+            filename = f"{name}-{key}-{i}.parquet"
+            df.to_parquet(os.path.join(cache_dir, filename), index=False)
+            files.append(filename)
+    except Exception as exc:
+        # coluna object com tipos misturados etc.: segue sem cache, os dados já estão prontos
+        print(f"cache-> {name}: não deu pra gravar o cache ({type(exc).__name__}: {exc})")
+        return frames
+    # o manifesto por último: se a gravação cair no meio, o cache não é usado pela metade
+    with open(manifest_path, "w") as f:
+        json.dump({"name": name, "key": key, "sources": list(sources), "params": params, "files": files}, f, indent=2)
+    print(f"cache-> {name}: gravado em '{cache_dir}' ({key})")
+    return frames
@@ -0,0 +1,171 @@
+import math
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmark.streaming import drain, measure_stream
+
+# valores críticos da t de student (bicaudal, 95%) pra amostras pequenas.
+# acima de 30 graus de liberdade uso a aproximação normal (1.96)
+_T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145,
+    15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080,
+    22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048,
+    29: 2.045, 30: 2.042,
+}
+
+
+def percentile(sorted_samples: List[float], p: float) -> float:
+    """Percentil com interpolação linear (mesmo método padrão do numpy)."""
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * (p / 100.0)
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return sorted_samples[int(k)]
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """
+    Resume uma lista de tempos (em segundos): min/p50/p95/p99/max, média, desvio padrão
+    e intervalo de confiança de 95% da média.
+    """
+    if not samples:
+        return {"n": 0}
+
+    ordered = sorted(samples)
+    n = len(ordered)
+    mean = statistics.fmean(ordered)
+    stdev = statistics.stdev(ordered) if n > 1 else 0.0
+
+    if n > 1:
+        t = _T_95.get(n - 1, 1.96)
+        margin = t * stdev / math.sqrt(n)
+    else:
+        margin = 0.0
+
+    return {
+        "n": n,
+        "min": ordered[0],
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1],
+        "mean": mean,
+        "stdev": stdev,
+        "ci95_low": mean - margin,
+        "ci95_high": mean + margin,
+    }
+
+
+def run_trials(operations_for_trial: Callable[[int], List[Tuple]],
+               warmup: int = 0, iterations: int = 1,
+               capture: Optional[Callable[[], Any]] = None,
+               profiler: Optional[Any] = None,
+               stream_ops: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Roda a sequência de operações de um banco 'warmup + iterations' vezes.
+
+    'operations_for_trial(trial)' devolve a lista ordenada de (nome, função) da rodada;
+    recebe o número da rodada pra poder variar ids de operações de escrita.
+    Opcionalmente a tupla tem um terceiro item com a chave usada em 'results'
+    (None = resultado não é guardado).
+    As rodadas de aquecimento são executadas mas não entram nas estatísticas.
+
+    Com warmup=0 e iterations=1 o resultado é o mesmo do modo antigo (uma medição só).
+    Com mais iterações, 'timings' guarda a mediana (p50) de cada operação e 'stats' o resumo completo.
+    'timeline' guarda início/fim de cada execução em time.perf_counter, o mesmo relógio do
+    ResourceSampler, pra alinhar as operações com as amostras de CPU/memória dos containers.
+
+    Se 'capture' for passado (uma fábrica de context managers de benchmark.server_capture),
+    roda uma rodada extra, fora das estatísticas, com cada operação dentro da captura do servidor.
+    'server' guarda, por operação, o tempo no cliente dessa rodada e o que o banco reportou
+    (plano, linhas examinadas, tempo no servidor). Fica separado pra que o custo do
+    profiling/tracing não contamine as medições.
+
+    Com 'profiler' (benchmark.profiler.SamplingProfiler já iniciado), cada operação medida é
+    marcada no profiler e 'profile' traz a divisão do tempo no cliente por operação.
+
+    Operação que devolve iterador (os iter_*) é consumida dentro da medição e o resultado vira
+    a contagem de linhas. Com 'stream_ops' (nomes de operações de leitura), uma rodada extra mede
+    cada uma com benchmark.streaming.measure_stream: 'streaming' guarda linhas, tempo total,
+    tempo até a primeira linha e pico de memória no cliente.
+    """
+    samples: Dict[str, List[float]] = {}
+    results: Dict[str, Any] = {}
+    timeline: List[Dict[str, Any]] = []
+
+    for trial in range(warmup + iterations):
+        measured = trial >= warmup
+        for op in operations_for_trial(trial):
+            name, fn = op[0], op[1]
+            result_key = op[2] if len(op) > 2 else name
+
+            if profiler is not None and measured:
+                profiler.current = name
+            start = time.perf_counter()
+            res = drain(fn())
+            end = time.perf_counter()
+            elapsed = end - start
+            if profiler is not None:
+                profiler.current = None
+            timeline.append({"op": name, "trial": trial, "warmup": not measured, "start": start, "end": end})
+            if measured:
+                samples.setdefault(name, []).append(elapsed)
+                if result_key is not None:
+                    results[result_key] = res
+
+    stats = {name: summarize(s) for name, s in samples.items()}
+    timings = {name: s["p50"] for name, s in stats.items()}
+
+    out = {
+        "results": results,
+        "timings": timings,
+        "total_time": sum(timings.values()),
+        "timeline": timeline,
+    }
+    if warmup or iterations > 1:
+        out["warmup"] = warmup
+        out["iterations"] = iterations
+        out["stats"] = stats
+        # amostras cruas, pro teste de significância do histórico (benchmark/history.py)
+        out["samples"] = samples
+    if profiler is not None:
+        out["profile"] = profiler.summary({name: sum(s) for name, s in samples.items()})
+
+    if capture is not None:
+        server = {}
+        for op in operations_for_trial(warmup + iterations):
+            name, fn = op[0], op[1]
+            with capture() as cap:
+                start = time.perf_counter()
+                drain(fn())
+                elapsed = time.perf_counter() - start
+            server[name] = dict(cap.result, client_seconds=elapsed)
+        out["server"] = server
+
+    if stream_ops:
+        streaming = {}
+        for op in operations_for_trial(warmup + iterations + 1):
+            name, fn = op[0], op[1]
+            if name in stream_ops:
+                measured = measure_stream(fn)
+                if measured is not None:
+                    streaming[name] = measured
+        out["streaming"] = streaming
+    return out
+
+
+def format_stats(stats: Dict[str, Dict[str, Any]], indent: str = "  ") -> str:
+    """Formata o 'stats' de run_trials em linhas legíveis (ms) pra ir no OUT.txt."""
+    lines = []
+    for name, s in stats.items():
+        lines.append(
+            f"{indent}{name}: min={s['min'] * 1000:.2f}ms p50={s['p50'] * 1000:.2f}ms "
+            f"p95={s['p95'] * 1000:.2f}ms p99={s['p99'] * 1000:.2f}ms max={s['max'] * 1000:.2f}ms "
+            f"std={s['stdev'] * 1000:.2f}ms ic95=[{s['ci95_low'] * 1000:.2f}, {s['ci95_high'] * 1000:.2f}]ms (n={s['n']})\n"
+        )
+    return "".join(lines)
@@ -0,0 +1,120 @@
+"""
+Leitura preguiçosa de resultados grandes e a medição dela (iter_* dos queries.py).
+
+Os find_*/get_* devolvem listas: fetchall() no Postgres, list(cursor) no Mongo, list
+comprehension no Cassandra, então toda linha vira dict na memória antes da primeira ser usada.
+Os iter_* devolvem um iterador que busca em lotes:
+
+    Postgres   cursor nomeado (do lado do servidor), 'itersize' linhas por ida e volta
+    Mongo      cursor com batch_size
+    Cassandra  paginação com fetch_size, já pedindo a próxima página antes de entregar a atual
+
+measure_stream() roda uma consulta (lista ou iterador) e mede linhas, tempo total, tempo até a
+primeira linha e pico de memória no cliente. O pico vem do tracemalloc, que só vê o que o python
+aloca (buffers em C do driver ficam de fora) e deixa tudo mais lento; por isso a consulta roda
+duas vezes, uma sem tracemalloc pros tempos e outra com, só pro pico.
+
+    metricas = measure_stream(lambda: db.iter_pedidos_por_data(inicio, fim))
+"""
+import itertools
+import time
+import tracemalloc
+from collections.abc import Iterator
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+DEFAULT_BATCH = 2000
+
+_cursor_ids = itertools.count()
+
+
+def pg_stream(conn, query: str, params: Sequence[Any] = (), itersize: int = DEFAULT_BATCH) -> Iterator:
+    """SELECT por cursor nomeado: o servidor guarda o resultado e manda 'itersize' linhas por vez."""
+    cursor = conn.cursor(name=f"stream_{next(_cursor_ids)}")  # mesmo cursor_factory da conexão
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def cassandra_stream(session, query: Any, params: Sequence[Any] = (), fetch_size: int = DEFAULT_BATCH) -> Iterator:
+    """
+    Linhas página a página, pedindo a próxima (start_fetching_next_page) antes de entregar a atual.
+    'query' é CQL com %s ou um statement preparado.
+    """
+    from cassandra.query import SimpleStatement  # só quem usa Cassandra precisa do driver
+
+    if hasattr(query, "bind"):
+        stmt, params = query.bind(params), None
+    else:
+        stmt = SimpleStatement(query)
+    stmt.fetch_size = fetch_size
+    future = session.execute_async(stmt, params)
+    result = future.result()
+    while True:
+        page = result.current_rows
+        more = future.has_more_pages
+        if more:
+            future.start_fetching_next_page()
+        yield from page
+        if not more:
+            return
+        result = future.result()
+
+
+def drain(res: Any) -> Any:
+    """Consome um iterador (devolvendo quantas linhas veio); lista/valor passa direto."""
+    if isinstance(res, Iterator):
+        return sum(1 for _ in res)
+    return res
+
+
+def _consume(make_rows: Callable[[], Iterable[Any]]) -> Optional[Dict[str, Any]]:
+    start = time.perf_counter()
+    res = make_rows()
+    if not isinstance(res, (list, Iterator)):
+        return None
+    rows = 0
+    first_row = None
+    for _ in res:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        rows += 1
+    seconds = time.perf_counter() - start
+    # lista: a primeira linha só fica disponível quando a lista inteira chega
+    return {"rows": rows, "seconds": seconds, "first_row_seconds": first_row if first_row is not None else seconds}
+
+
+def measure_stream(make_rows: Callable[[], Iterable[Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Linhas, tempo total, tempo até a primeira linha e pico de memória (bytes acima do que já
+    estava alocado) de uma consulta. None se ela não devolve lista nem iterador.
+    """
+    timed = _consume(make_rows)
+    if timed is None:
+        return None
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        _consume(make_rows)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+    return dict(timed, peak_bytes=max(peak, 0))
+
+
+def format_streaming(streaming: Dict[str, Dict[str, Any]], indent: str = "  ") -> str:
+    """Formata as medições de measure_stream em linhas legíveis pra ir no OUT.txt."""
+    lines = []
+    for name, m in streaming.items():
+        lines.append(
+            f"{indent}{name}: {m['rows']} linhas, total={m['seconds'] * 1000:.2f}ms "
+            f"primeira linha={m['first_row_seconds'] * 1000:.2f}ms pico={m['peak_bytes'] / 1024 / 1024:.2f}MB\n"
+        )
+    return "".join(lines)
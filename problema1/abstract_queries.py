@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Dict, Any
-import time
+from typing import List, Dict, Any, Iterator
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark.stats import run_trials
+from benchmark.streaming import DEFAULT_BATCH
 
 class ProductData:
     def __init__(self, id: str, nome: str, valor: float):
@@ -18,6 +23,8 @@ class AbstractDb(ABC):
     
     def __init__(self):
         self.conn = None
+        # linhas por ida e volta nos iter_* (itersize / batch_size / fetch_size)
+        self.stream_batch = DEFAULT_BATCH
 
     @abstractmethod
     def connect(self):
@@ -27,6 +34,25 @@ class AbstractDb(ABC):
     def close(self):
         pass
 
+    @abstractmethod
+    def server_capture(self):
+        """
+        Context manager que captura a visão do servidor durante uma operação: plano, linhas
+        examinadas e tempo dentro do banco (ver benchmark.server_capture). Usado com capture_server=True.
+        """
+        pass
+
+    def snapshot_pedido(self, order_id: str) -> Any:
+        """
+        Cópia do pedido (e dos itens/índices dele) pra restore_pedido recolocar depois do
+        delete_pedido. None se o pedido não existe (ou o banco não implementa).
+        """
+        return None
+
+    def restore_pedido(self, snapshot: Any):
+        """Regrava o que o snapshot_pedido copiou; idempotente, pode rodar com o pedido já lá."""
+        pass
+
     @abstractmethod
     def read_cliente(self, cliente_id: str) -> Dict[str, Any]:
         """
@@ -73,6 +99,20 @@ class AbstractDb(ABC):
         """
         pass
 
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        """
+        Mesmo resultado do find_pedidos_por_status, mas como iterador que busca em lotes de
+        'stream_batch' linhas (ver benchmark/streaming.py). Sem cursor do lado do servidor no
+        banco, é só um iterador sobre a lista.
+        """
+        return iter(self.find_pedidos_por_status(status))
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        """
+        Mesmo resultado do find_pedidos_por_data, como iterador em lotes (igual ao iter_pedidos_por_status).
+        """
+        return iter(self.find_pedidos_por_data(data_inicio, data_fim))
+
     @abstractmethod
     def find_pedidos_por_cliente(self, cliente_id: str) -> List[Dict[str, Any]]:
         """
@@ -101,55 +141,53 @@ class AbstractDb(ABC):
         """
         pass
 
-    def run_all_queries(self, cliente_id: str, product_data: ProductData, order_id: str, status: str, data_inicio: datetime, data_fim: datetime):
+    def run_all_queries(self, cliente_id: str, product_data: ProductData, order_id: str, status: str, data_inicio: datetime, data_fim: datetime, warmup: int = 0, iterations: int = 1, capture_server: bool = False, profiler=None, stream_metrics: bool = False):
         """
         Método pra rodar todas as queries, coletar resultado e medir tempo.
-        """
-        timings = {}
-        results = {}
-        
-        start = time.perf_counter()
-        results["read_cliente"] = self.read_cliente(cliente_id)
-        timings["read_cliente"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["create_produto"] = self.create_produto(product_data)
-        timings["create_produto"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["update_produto_preco"] = self.update_produto_preco(product_data.id, product_data.valor + 10.0)
-        timings["update_produto_preco"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_pedidos_por_status"] = self.find_pedidos_por_status(status)
-        timings["find_pedidos_por_status"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_pedidos_por_data"] = self.find_pedidos_por_data(data_inicio, data_fim)
-        timings["find_pedidos_por_data"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_pedidos_por_cliente"] = self.find_pedidos_por_cliente(cliente_id)
-        timings["find_pedidos_por_cliente"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_itens_por_pedido"] = self.find_itens_por_pedido(order_id)
-        timings["find_itens_por_pedido"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_cliente_por_pedido"] = self.find_cliente_por_pedido(order_id)
-        timings["find_cliente_por_pedido"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["delete_pedido"] = self.delete_pedido(order_id)
-        timings["delete_pedido"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["get_top_10_clientes_por_pedidos"] = self.get_top_10_clientes_por_pedidos()
-        timings["get_top_10_clientes_por_pedidos"] = time.perf_counter() - start
-
-        return {
-            "results": results,
-            "timings": timings,
-            "total_time": sum(timings.values())
-        }
\ No newline at end of file
+
+        Com stream_metrics=True entram também os iter_* e as buscas por status/data ganham
+        tempo até a primeira linha e pico de memória no cliente, lista x iterador ('streaming').
+
+        'warmup' rodadas de aquecimento são descartadas e cada operação é medida 'iterations' vezes
+        (ver benchmark.stats.run_trials). A partir da segunda rodada o produto criado ganha um sufixo
+        no id pra não violar a chave primária, e o pedido apagado pelo delete_pedido da rodada anterior
+        é regravado (restore_pedido) antes das operações, fora da medição: toda rodada busca e apaga
+        o mesmo pedido existente. No fim o pedido é regravado de novo, então o banco termina como começou.
+        """
+        pedido = self.snapshot_pedido(order_id)
+        if pedido is None:
+            print(f"aviso --> pedido {order_id} não existe: find/delete do pedido vão medir busca sem resultado")
+
+        def operations(trial):
+            if trial > 0:
+                self.restore_pedido(pedido)
+            produto = product_data
+            if trial > 0:
+                produto = ProductData(id=f"{product_data.id}-{trial}", nome=product_data.nome, valor=product_data.valor)
+
+            return [
+                ("read_cliente", lambda: self.read_cliente(cliente_id)),
+                ("create_produto", lambda: self.create_produto(produto)),
+                ("update_produto_preco", lambda: self.update_produto_preco(produto.id, produto.valor + 10.0)),
+                ("find_pedidos_por_status", lambda: self.find_pedidos_por_status(status)),
+                ("find_pedidos_por_data", lambda: self.find_pedidos_por_data(data_inicio, data_fim)),
+                ("find_pedidos_por_cliente", lambda: self.find_pedidos_por_cliente(cliente_id)),
+                ("find_itens_por_pedido", lambda: self.find_itens_por_pedido(order_id)),
+                ("find_cliente_por_pedido", lambda: self.find_cliente_por_pedido(order_id)),
+                ("delete_pedido", lambda: self.delete_pedido(order_id)),
+                ("get_top_10_clientes_por_pedidos", lambda: self.get_top_10_clientes_por_pedidos()),
+            ] + ([
+                ("iter_pedidos_por_status", lambda: self.iter_pedidos_por_status(status), None),
+                ("iter_pedidos_por_data", lambda: self.iter_pedidos_por_data(data_inicio, data_fim), None),
+            ] if stream_metrics else [])
+
+        stream_ops = ["find_pedidos_por_status", "iter_pedidos_por_status",
+                      "find_pedidos_por_data", "iter_pedidos_por_data"] if stream_metrics else None
+        try:
+            return run_trials(operations, warmup=warmup, iterations=iterations,
+                              capture=self.server_capture if capture_server else None, profiler=profiler,
+                              stream_ops=stream_ops)
+        finally:
+            # deixa o pedido como estava: os três modelos do cassandra dividem o keyspace, e o
+            # próximo precisa achar e apagar o mesmo pedido pro comparativo medir o mesmo trabalho
+            self.restore_pedido(pedido)
@@ -0,0 +1,35 @@
+"""
+Tabelas de consulta do Cassandra (query-first) compartilhadas entre prepare, populate e queries.
+
+Status, data e pedido->cliente não são chave de pedidos_por_cliente, então antes essas consultas
+faziam SELECT * na tabela inteira e filtravam no python. Agora cada uma tem a própria tabela,
+gravada junto na carga:
+
+    pedidos_por_status  ((status, bucket), data_pedido, pedido_id)  status tem poucos valores, então
+                                                                     cada um é espalhado em STATUS_BUCKETS
+                                                                     partições pra não virar partição gigante
+    pedidos_por_dia     (dia, data_pedido, pedido_id)                 intervalo de datas = uma leitura por dia
+    cliente_por_pedido  (pedido_id)                                   pedido -> cliente direto pela chave
+"""
+import zlib
+from datetime import date, datetime, timedelta
+from typing import List
+
+STATUS_BUCKETS = 16
+
+
+def status_bucket(pedido_id: str) -> int:
+    """Bucket fixo do pedido (crc32, igual em qualquer processo, ao contrário do hash() do python)."""
+    return zlib.crc32(str(pedido_id).encode("utf-8")) % STATUS_BUCKETS
+
+
+def dias_no_intervalo(data_inicio: datetime, data_fim: datetime) -> List[date]:
+    """Dias (partições de pedidos_por_dia) que cobrem [data_inicio, data_fim)."""
+    dia, fim = data_inicio.date(), data_fim.date()
+    if data_fim > datetime.combine(fim, datetime.min.time()):
+        fim += timedelta(days=1)  # data_fim no meio do dia: o último dia também entra
+    dias = []
+    while dia < fim:
+        dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
@@ -1,7 +1,7 @@
 import pandas as pd
 import psycopg2
 import psycopg2.extras
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from cassandra.cluster import Cluster
 from cassandra.policies import DCAwareRoundRobinPolicy
 import redis
@@ -9,10 +9,27 @@ import sys
 import os
 import json
 import argparse
+import time
+from functools import partial
 from tqdm import tqdm
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark import history, ingest
+from benchmark.ingest import to_records, to_documents, iter_documents, column_lists, unit_price, isoformat, epoch_seconds
+from benchmark.pg_copy import load_rows, LOADERS
+from benchmark.cassandra_writer import CassandraWriter, DEFAULT_WINDOW
+from benchmark.redis_writer import RedisWriter, DEFAULT_MAX_COMMANDS
+from benchmark.mongo_writer import MongoBulkWriter, DEFAULT_CHUNK, DEFAULT_WORKERS
+from benchmark.parallel_load import run_loaders
+from benchmark.ingest_telemetry import TELEMETRY
+from benchmark.source_cache import cached_frames
+from cassandra_tables import status_bucket
+
 DATA_DIR = './data'
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+BACKENDS = ['postgres', 'mongo', 'cassandra', 'redis']
+DEFAULT_CHUNK_ROWS = 100_000
 
 def connect_postgres():
     print("conectando postgres")
@@ -37,39 +54,30 @@ def connect_redis():
     r.ping()
     return r
 
-def load_source_data(limit_rows=None):
-    """
-    Função pra carregar todos os CSVs, limpar  e retornar os arquivos prontos.
-    """
-    print(f"lendo de '{DATA_DIR}'")
-    
+ORDER_ITEM_REQUIRED = ['order_id', 'customer_id', 'product_id', 'order_date', 'order_status', 'quantity', 'total_price']
+
+def load_customers():
     df_customers = pd.read_csv(os.path.join(DATA_DIR, 'customers.csv'))
     df_customers = df_customers.dropna(subset=['customer_id'])
     df_customers['name'] = df_customers['name'].fillna('Nome Indisponível')
     df_customers['email'] = df_customers['email'].fillna('email@indisponivel.com')
     df_customers['registration_date'] = pd.to_datetime(df_customers['registration_date'], errors='coerce').fillna(datetime.now())
     df_customers['customer_id'] = df_customers['customer_id'].astype(int).astype(str)
-    
-    # precisei fazer isso pois tinha clientes inválidos nos pedidos
-    valid_customer_ids = set(df_customers['customer_id'])
-    print(f"clientes: {len(df_customers)}, clientes válidos: ({len(valid_customer_ids)}).")
-    
+    return df_customers
+
+def load_products():
     df_products = pd.read_csv(os.path.join(DATA_DIR, 'products.csv')).dropna(subset=['product_id'])
     df_products['price'] = pd.to_numeric(df_products['price'], errors='coerce').fillna(0)
     df_products['product_name'] = df_products['product_name'].fillna('Nome Indisponível').astype(str)
     df_products['product_id'] = df_products['product_id'].astype(str)
-    valid_product_ids = set(df_products['product_id'])
-    print(f"produtos: {len(df_products)}, produtos válidos: ({len(valid_product_ids)}).")
-
-    df_orders = pd.read_csv(os.path.join(DATA_DIR, 'orders.csv'))
-    df_order_items = pd.read_csv(os.path.join(DATA_DIR, 'order_items.csv'), nrows=limit_rows)
+    return df_products
 
-    df_full_order = pd.merge(df_order_items, df_orders, on='order_id')
-    
-    df_full_order = df_full_order.dropna(subset=[
-        'order_id', 'customer_id', 'product_id', 
-        'order_date', 'order_status', 'quantity', 'total_price'
-    ])
+def clean_full_order(df_full_order, valid_product_ids, valid_customer_ids):
+    """
+    Limpa o merge itens x pedidos (serve tanto pro arquivo inteiro quanto pra um pedaço dele).
+    Retorna o DataFrame e quantos itens saíram por produto e por cliente inválido.
+    """
+    df_full_order = df_full_order.dropna(subset=ORDER_ITEM_REQUIRED)
     
     df_full_order['order_date'] = pd.to_datetime(df_full_order['order_date'])
     df_full_order['order_status'] = df_full_order['order_status'].astype(str)
@@ -80,121 +88,216 @@ def load_source_data(limit_rows=None):
     initial_count = len(df_full_order)
     df_full_order = df_full_order[df_full_order['product_id'].isin(valid_product_ids)]
     removed_count = initial_count - len(df_full_order)
-    
-    print(f"pedidos: {len(df_full_order)} itens de pedido lidos.")
-    if removed_count > 0:
-        print(f"removidos: {removed_count} itens invalidos")
         
     initial_count_cust = len(df_full_order)
     df_full_order = df_full_order[df_full_order['customer_id'].isin(valid_customer_ids)]
     removed_count_cust = initial_count_cust - len(df_full_order)
+
+    # campos derivados calculados uma vez, como vetores, em vez de linha a linha em cada loader
+    df_full_order = df_full_order.assign(
+        quantity=lambda d: d['quantity'].astype(int),
+        preco_unit=lambda d: unit_price(d['quantity'], d['total_price']),
+    )
+    return df_full_order, removed_count, removed_count_cust
+
+def read_source_data(limit_rows=None):
+    """
+    Função pra carregar todos os CSVs, limpar  e retornar os arquivos prontos.
+    """
+    print(f"lendo de '{DATA_DIR}'")
+    
+    df_customers = load_customers()
+    
+    # precisei fazer isso pois tinha clientes inválidos nos pedidos
+    valid_customer_ids = set(df_customers['customer_id'])
+    print(f"clientes: {len(df_customers)}, clientes válidos: ({len(valid_customer_ids)}).")
+    
+    df_products = load_products()
+    valid_product_ids = set(df_products['product_id'])
+    print(f"produtos: {len(df_products)}, produtos válidos: ({len(valid_product_ids)}).")
+
+    df_orders = pd.read_csv(os.path.join(DATA_DIR, 'orders.csv'))
+    df_order_items = pd.read_csv(os.path.join(DATA_DIR, 'order_items.csv'), nrows=limit_rows)
+
+    df_full_order = pd.merge(df_order_items, df_orders, on='order_id')
+    df_full_order, removed_count, removed_count_cust = clean_full_order(df_full_order, valid_product_ids, valid_customer_ids)
     
+    print(f"pedidos: {len(df_full_order)} itens de pedido lidos.")
+    if removed_count > 0:
+        print(f"removidos: {removed_count} itens invalidos")
     if removed_count_cust > 0:
         print(f"removidos: {removed_count_cust} itens invalidos")
             
     return df_customers, df_products, df_full_order
 
-def load_into_postgres(cursor, df_customers, df_products, df_full_order):
+def load_source_data(limit_rows=None, use_cache=True):
+    """
+    Os DataFrames limpos do read_source_data, vindos do cache em Parquet quando os CSVs, o
+    --limit-rows e o código de limpeza são os mesmos da última leitura.
+    """
+    sources = [os.path.join(DATA_DIR, f) for f in ('customers.csv', 'products.csv', 'orders.csv', 'order_items.csv')]
+    df_customers, df_products, df_full_order = cached_frames(
+        "problema1", sources, {"limit_rows": limit_rows},
+        # o módulo ingest entra inteiro: clean_full_order usa o unit_price de lá
+        [load_customers, load_products, clean_full_order, read_source_data, ingest],
+        lambda: read_source_data(limit_rows), CACHE_DIR, enabled=use_cache)
+    return df_customers, df_products, lambda backend=None: [df_full_order]
+
+def load_source_stream(limit_rows=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Modo streaming: clientes, produtos e um índice compacto dos pedidos (só as colunas usadas,
+    indexado por order_id) ficam em memória; o order_items.csv é lido de 'chunk_rows' em
+    'chunk_rows' linhas e cada pedaço é juntado com o índice e limpo na hora, sem nunca ter o
+    merge inteiro em memória.
+
+    Retorna a mesma tupla do load_source_data; o terceiro elemento é uma função que abre uma
+    leitura nova do arquivo pro banco passado (cada banco lê o seu, e a leitura entra na
+    telemetria com o nome dele em vez de "source", senão as quatro leituras se somariam).
     """
-    Insiro dados no postgres. Faço load em massa pois banco trabalha com isso
+    print(f"lendo de '{DATA_DIR}' (streaming, {chunk_rows} itens por vez)")
+
+    df_customers = load_customers()
+    valid_customer_ids = set(df_customers['customer_id'])
+    print(f"clientes: {len(df_customers)}, clientes válidos: ({len(valid_customer_ids)}).")
+
+    df_products = load_products()
+    valid_product_ids = set(df_products['product_id'])
+    print(f"produtos: {len(df_products)}, produtos válidos: ({len(valid_product_ids)}).")
+
+    # order_id como texto dos dois lados: o tipo inferido pode mudar de um pedaço pro outro
+    orders_index = pd.read_csv(os.path.join(DATA_DIR, 'orders.csv'),
+                               usecols=['order_id', 'customer_id', 'order_date', 'order_status'],
+                               dtype={'order_id': str}).set_index('order_id')
+    print(f"pedidos: índice com {len(orders_index)} pedidos.")
+
+    def order_chunks(backend):
+        read = removed = 0
+        reader = pd.read_csv(os.path.join(DATA_DIR, 'order_items.csv'), nrows=limit_rows,
+                             chunksize=chunk_rows, dtype={'order_id': str})
+        start = time.perf_counter()
+        for df_items in reader:
+            df_chunk = df_items.join(orders_index, on='order_id', how='inner')
+            df_chunk, removed_count, removed_count_cust = clean_full_order(df_chunk, valid_product_ids, valid_customer_ids)
+            read += len(df_chunk)
+            removed += removed_count + removed_count_cust
+            # só o tempo de ler/limpar o pedaço, sem o tempo que o banco leva pra consumir
+            TELEMETRY.record(backend, "order_items (pedaços)", "parse", time.perf_counter() - start, rows=len(df_chunk))
+            yield df_chunk
+            start = time.perf_counter()
+        print(f"pedidos: {read} itens de pedido lidos, {removed} itens invalidos removidos.")
+
+    return df_customers, df_products, order_chunks
+
+def load_into_postgres(cursor, df_customers, df_products, order_chunks, loader="copy"):
+    """
+    Insiro dados no postgres. Faço load em massa pois banco trabalha com isso.
+    Com loader="copy" as linhas vão por COPY numa staging e o ON CONFLICT é feito no merge.
+    'order_chunks' são os itens de pedido já juntados com os pedidos, em um ou mais pedaços;
+    um pedido que aparece em dois pedaços só entra uma vez por causa do ON CONFLICT.
     """
     print("\ncarregando dados postgres")
     
-    pg_data = [
-        (row['customer_id'], row['name'], row['email'], row['registration_date']) 
-        for _, row in df_customers.iterrows()
-    ]
-    psycopg2.extras.execute_values(cursor,
-        "INSERT INTO cliente (id, nome, email, data) VALUES %s ON CONFLICT (id) DO NOTHING", pg_data)
-    print(f"postgres-> {len(pg_data)} clientes carregados.")
-
-    pg_data = [
-        (row['product_id'], row['product_name'], row['price']) 
-        for _, row in df_products.iterrows()
-    ]
-    psycopg2.extras.execute_values(cursor,
-        "INSERT INTO item (id, nome, valor) VALUES %s ON CONFLICT (id) DO NOTHING", pg_data)
-    print(f"postgres-> {len(pg_data)} itens carregados.")
-
-    pg_pedidos_data = [
-        (row['order_id'], row['customer_id'], row['order_date'], row['order_status'])
-        for _, row in df_full_order.iterrows()
-    ]
-    psycopg2.extras.execute_values(cursor,
-        "INSERT INTO pedido (id, cliente_id, data, status) VALUES %s ON CONFLICT (id) DO NOTHING", 
-        list(set(pg_pedidos_data))) # 'set' remove duplicatas de pedidos
-    
-    pg_pedido_items_data = []
-    for _, row in df_full_order.iterrows():
-        quantidade = int(row['quantity'])
-        total_preco = float(row['total_price'])
-        preco_unit = (total_preco / quantidade) if (quantidade > 0 and total_preco > 0) else 0
-        pg_pedido_items_data.append((row['order_id'], row['product_id'], quantidade, preco_unit))
+    with TELEMETRY.phase("postgres", "cliente", "transform", rows=len(df_customers)):
+        cliente_rows = to_records(df_customers, ['customer_id', 'name', 'email', 'registration_date'])
+    load_rows(cursor, "cliente", ["id", "nome", "email", "data"], cliente_rows,
+              conflict="(id) DO NOTHING", method=loader)
+
+    with TELEMETRY.phase("postgres", "item", "transform", rows=len(df_products)):
+        item_rows = to_records(df_products, ['product_id', 'product_name', 'price'])
+    load_rows(cursor, "item", ["id", "nome", "valor"], item_rows,
+              conflict="(id) DO NOTHING", method=loader)
+
+    with TELEMETRY.phase("postgres", "cliente, item", "commit"):
+        cursor.connection.commit()
+
+    pedido_cols = ['order_id', 'customer_id', 'order_date', 'order_status']
+    for df_full_order in order_chunks:
+        with TELEMETRY.phase("postgres", "pedido", "transform") as m:
+            pedido_rows = to_records(df_full_order[pedido_cols].drop_duplicates(), pedido_cols) # remove duplicatas de pedidos
+            m["rows"] = len(pedido_rows)
+        load_rows(cursor, "pedido", ["id", "cliente_id", "data", "status"], pedido_rows,
+                  conflict="(id) DO NOTHING", method=loader)
         
-    psycopg2.extras.execute_values(cursor,
-        "INSERT INTO pedido_item (pedido_id, item_id, quantidade, preco_unit) VALUES %s ON CONFLICT (pedido_id, item_id) DO NOTHING", 
-        pg_pedido_items_data)
-    print(f"postgres-> {len(pg_pedido_items_data)} itens de pedido carregados.")
+        with TELEMETRY.phase("postgres", "pedido_item", "transform", rows=len(df_full_order)):
+            pedido_item_rows = to_records(df_full_order, ['order_id', 'product_id', 'quantity', 'preco_unit'])
+        load_rows(cursor, "pedido_item", ["pedido_id", "item_id", "quantidade", "preco_unit"], pedido_item_rows,
+                  conflict="(pedido_id, item_id) DO NOTHING", method=loader)
 
-    cursor.connection.commit()
+        with TELEMETRY.phase("postgres", "pedido, pedido_item", "commit"):
+            cursor.connection.commit()
 
-def load_into_mongo(db, df_customers, df_products, df_full_order):
+def _iter_pedidos(df_full_order, chunk=10_000):
+    """
+    Um documento por pedido, com os itens embutidos, sem montar o mapa de todos os pedidos:
+    ordeno por order_id (estável, mantém a ordem dos itens) e fecho o pedido quando o id muda.
     """
-    insiro dados mongo. Faço insert em massa para eficiência.
+    df = df_full_order.sort_values('order_id', kind='stable')
+    pedido = None
+    for start in range(0, len(df), chunk):
+        part = df.iloc[start:start + chunk]
+        order_ids, customer_ids, order_dates, statuses = column_lists(part, ['order_id', 'customer_id', 'order_date', 'order_status'])
+        item_docs = to_documents(part, {"item_id": 'product_id', "quantidade": 'quantity', "preco_unit": 'preco_unit'})
+        for order_id, customer_id, order_date, status, item_doc in zip(order_ids, customer_ids, order_dates, statuses, item_docs):
+            if pedido is not None and pedido["_id"] == order_id:
+                pedido["itens"].append(item_doc)
+                continue
+            if pedido is not None:
+                yield pedido
+            pedido = {
+                "_id": order_id,
+                "cliente_id": customer_id,
+                "data_pedido": order_date,
+                "status": status,
+                "itens": [item_doc]
+            }
+    if pedido is not None:
+        yield pedido
+
+def load_into_mongo(db, df_customers, df_products, order_chunks, workers=DEFAULT_WORKERS, chunk=DEFAULT_CHUNK, upsert=False):
+    """
+    insiro dados mongo. Faço insert em massa para eficiência: lotes de 'chunk' documentos com
+    bulk_write(ordered=False) em 'workers' threads (MongoBulkWriter), gerando os documentos aos poucos.
+
+    Com upsert=True (modo streaming) os itens de um pedido podem vir em pedaços diferentes: cada
+    pedaço faz upsert do pedido e $push dos itens, em vez de inserir o documento pronto.
     """
     print("carregando dados mongo")
 
-    cliente_docs = [
-        {"_id": row['customer_id'], "nome": row['name'], "email": row['email'], "data_cadastro": row['registration_date']}
-        for _, row in df_customers.iterrows()
-    ]
-    if cliente_docs:
-        db["clientes"].delete_many({}) # Limpa antes de inserir
-        db["clientes"].insert_many(cliente_docs)
-        print(f"mongo-> {len(cliente_docs)} clientes carregados.")
+    db["clientes"].delete_many({}) # Limpa antes de inserir
+    with MongoBulkWriter(db["clientes"], chunk=chunk, workers=workers, label="clientes") as writer:
+        for doc in iter_documents(df_customers, {"_id": 'customer_id', "nome": 'name', "email": 'email', "data_cadastro": 'registration_date'}):
+            writer.insert(doc)
 
     # Itens (Bulk)
-    item_docs = [
-        {"_id": row['product_id'], "nome": row['product_name'], "valor": row['price']}
-        for _, row in df_products.iterrows()
-    ]
-    if item_docs:
-        db["itens"].delete_many({}) 
-        db["itens"].insert_many(item_docs)
-        print(f"mongo-> {len(item_docs)} itens carregados.")
+    db["itens"].delete_many({}) 
+    with MongoBulkWriter(db["itens"], chunk=chunk, workers=workers, label="itens") as writer:
+        for doc in iter_documents(df_products, {"_id": 'product_id', "nome": 'product_name', "valor": 'price'}):
+            writer.insert(doc)
         
-    mongo_pedidos_map = {}
-    for _, row in df_full_order.iterrows():
-        quantidade = int(row['quantity'])
-        total_preco = float(row['total_price'])
-        preco_unit = (total_preco / quantidade) if (quantidade > 0 and total_preco > 0) else 0
-        
-        item_doc = { "item_id": row['product_id'], "quantidade": quantidade, "preco_unit": preco_unit }
-        
-        if row['order_id'] not in mongo_pedidos_map:
-            mongo_pedidos_map[row['order_id']] = {
-                "_id": row['order_id'],
-                "cliente_id": row['customer_id'],
-                "data_pedido": row['order_date'],
-                "status": row['order_status'],
-                "itens": [item_doc]
-            }
-        else:
-            mongo_pedidos_map[row['order_id']]["itens"].append(item_doc)
-            
-    if mongo_pedidos_map:
-        db["pedidos"].delete_many({}) # Limpa antes de inserir
-        db["pedidos"].insert_many(mongo_pedidos_map.values())
-        print(f"mongo-> {len(mongo_pedidos_map)} pedidos (com itens embutidos) carregados.")
+    # pedidos com itens embutidos
+    db["pedidos"].delete_many({}) # Limpa antes de inserir
+    with MongoBulkWriter(db["pedidos"], chunk=chunk, workers=workers, label="pedidos (com itens embutidos)") as writer:
+        for df_full_order in order_chunks:
+            for doc in _iter_pedidos(df_full_order):
+                if not upsert:
+                    writer.insert(doc)
+                    continue
+                pedido_id, itens = doc.pop("_id"), doc.pop("itens")
+                writer.add(UpdateOne({"_id": pedido_id},
+                                     {"$setOnInsert": doc, "$push": {"itens": {"$each": itens}}},
+                                     upsert=True))
         
 
-def load_into_cassandra(session, df_customers, df_full_order):
+def load_into_cassandra(session, df_customers, order_chunks, window=DEFAULT_WINDOW):
     """
     Insiro dados no Cassandra. Não faço em batch pois no Cassandra, isso não é recomendado. -> gera sobrecarga no nó coordenador.
     conferir: https://github.com/thingsboard/thingsboard/issues/8512
 
     Não precisa de 'df_products' pois o modelo de dados é denormalizado  e focado nas queries. Não temos uma tabela 'produtos' separada; 
     todos os dados necessários (como 'item_id', 'quantidade' e 'preco_unit') já vêm do 'df_full_order' (o merge de pedidos e itens).
+
+    Em vez de batch, as linhas vão com execute_async e até 'window' escritas em voo (CassandraWriter).
+    Os pedidos também vão pras tabelas de consulta por status, por dia e pedido->cliente (cassandra_tables.py).
     """
     print("carregando dados cassandra")
     
@@ -202,114 +305,199 @@ def load_into_cassandra(session, df_customers, df_full_order):
     pedido_stmt = session.prepare("INSERT INTO pedidos_por_cliente (cliente_id, pedido_id, data_pedido, status) VALUES (?, ?, ?, ?)")
     item_stmt = session.prepare("INSERT INTO itens_por_pedido (pedido_id, item_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)")
 
-    for _, row in tqdm(df_customers.iterrows(), total=len(df_customers), desc="Cassandra Clientes"):
-        session.execute(customer_stmt, (row['customer_id'], row['name'], row['email'], row['registration_date']))
+    with CassandraWriter(session, window=window, label="clientes") as writer:
+        for binds in tqdm(to_records(df_customers, ['customer_id', 'name', 'email', 'registration_date']), desc="Cassandra Clientes"):
+            writer.write(customer_stmt, binds)
         
-    for _, row in tqdm(df_full_order.iterrows(), total=len(df_full_order), desc="Cassandra Pedidos"):
-        quantidade = int(row['quantity'])
-        total_preco = float(row['total_price'])
-        preco_unit = (total_preco / quantidade) if (quantidade > 0 and total_preco > 0) else 0
-        
-        session.execute(pedido_stmt, (row['customer_id'], row['order_id'], row['order_date'], row['order_status']))
-        session.execute(item_stmt, (row['order_id'], row['product_id'], quantidade, preco_unit))
+    status_stmt = session.prepare("INSERT INTO pedidos_por_status (status, bucket, data_pedido, pedido_id, cliente_id) VALUES (?, ?, ?, ?, ?)")
+    dia_stmt = session.prepare("INSERT INTO pedidos_por_dia (dia, data_pedido, pedido_id, cliente_id, status) VALUES (?, ?, ?, ?, ?)")
+    cliente_stmt = session.prepare("INSERT INTO cliente_por_pedido (pedido_id, cliente_id, data_pedido, status) VALUES (?, ?, ?, ?)")
+
+    pedido_cols = ['order_id', 'customer_id', 'order_date', 'order_status']
+    with CassandraWriter(session, window=window, label="pedidos e itens") as writer, \
+         CassandraWriter(session, window=window, label="tabelas de consulta") as query_writer:
+        for df_full_order in order_chunks:
+            pedido_binds = to_records(df_full_order, ['customer_id', 'order_id', 'order_date', 'order_status'])
+            item_binds = to_records(df_full_order, ['order_id', 'product_id', 'quantity', 'preco_unit'])
+            for pedido, item in tqdm(zip(pedido_binds, item_binds), total=len(item_binds), desc="Cassandra Pedidos"):
+                writer.write(pedido_stmt, pedido)
+                writer.write(item_stmt, item)
+
+            # uma linha por pedido (não por item) nas tabelas de status, dia e pedido->cliente
+            df_pedidos = df_full_order[pedido_cols].drop_duplicates()
+            order_ids, customer_ids, order_dates, statuses = column_lists(df_pedidos, pedido_cols)
+            dias = df_pedidos['order_date'].dt.date.tolist()
+            for order_id, customer_id, order_date, status, dia in tqdm(zip(order_ids, customer_ids, order_dates, statuses, dias),
+                                                                       total=len(order_ids), desc="Cassandra Tabelas de consulta"):
+                query_writer.write(status_stmt, (status, status_bucket(order_id), order_date, order_id, customer_id))
+                query_writer.write(dia_stmt, (dia, order_date, order_id, customer_id, status))
+                query_writer.write(cliente_stmt, (order_id, customer_id, order_date, status))
     
-def load_into_redis(conn, df_customers, df_products, df_full_order):
+def load_into_redis(conn, df_customers, df_products, order_chunks, connections=1, chunk=DEFAULT_MAX_COMMANDS):
     """
-    Carrega os DataFrames no Redis usando pipelines para eficiência. Junto varios comandos e mando todos de uma vez só.
+    Carrega os DataFrames no Redis usando pipelines para eficiência. Junto varios comandos e mando de 'chunk' em 'chunk'
+    (RedisWriter), pra memória do cliente não crescer com o dataset.
     cada entidade foi mapeada como hash (mapa chave-valor) para facilitar buscas.
     Relacionamento foi simulado via chaves compostas.
+    Pedidos ganham índices: set por status, sorted set por data (epoch) e set de pedidos por cliente.
 
     """
     print("carregando dados redis")
     
-    pipe = conn.pipeline()
-    for _, row in tqdm(df_customers.iterrows(), total=len(df_customers), desc="Redis Clientes"):
-        key = f"cliente:{row['customer_id']}"
-        pipe.hmset(key, {
-            "nome": row['name'], 
-            "email": row['email'], 
-            "data_cadastro": row['registration_date'].isoformat()
-        })
-    pipe.execute()
+    ids, nomes, emails = column_lists(df_customers, ['customer_id', 'name', 'email'])
+    datas = isoformat(df_customers['registration_date'])
+    with RedisWriter(conn, max_commands=chunk, connections=connections, label="clientes") as pipe:
+        for customer_id, nome, email, data in tqdm(zip(ids, nomes, emails, datas), total=len(ids), desc="Redis Clientes"):
+            pipe.hmset(f"cliente:{customer_id}", {
+                "nome": nome, 
+                "email": email, 
+                "data_cadastro": data
+            })
     
-    pipe = conn.pipeline()
-    for _, row in tqdm(df_products.iterrows(), total=len(df_products), desc="Redis Itens"):
-        key = f"item:{row['product_id']}"
-        pipe.hmset(key, {
-            "nome": row['product_name'], 
-            "valor": row['price']
-        })
-    pipe.execute()
+    with RedisWriter(conn, max_commands=chunk, connections=connections, label="itens") as pipe:
+        for product_id, nome, valor in tqdm(to_records(df_products, ['product_id', 'product_name', 'price']), desc="Redis Itens"):
+            pipe.hmset(f"item:{product_id}", {
+                "nome": nome, 
+                "valor": valor
+            })
     
-    pipe = conn.pipeline()
-    for _, row in tqdm(df_full_order.iterrows(), total=len(df_full_order), desc="Redis Pedidos"):
-        quantidade = int(row['quantity'])
-        total_preco = float(row['total_price'])
-        preco_unit = (total_preco / quantidade) if (quantidade > 0 and total_preco > 0) else 0
-        
-        key_pedido = f"pedido:{row['order_id']}"
-        pipe.hmset(key_pedido, {
-            "cliente_id": row['customer_id'],
-            "data_pedido": row['order_date'].isoformat(),
-            "status": row['order_status']
-        })
-        
-        key_item = f"pedido_item:{row['order_id']}"
-        item_json = json.dumps({"quantidade": quantidade, "preco_unit": preco_unit})
-        pipe.hset(key_item, row['product_id'], item_json)
-    pipe.execute()
+    pedido_cols = ['order_id', 'customer_id', 'order_status', 'order_date']
+    with RedisWriter(conn, max_commands=chunk, connections=connections, label="pedidos") as pipe:
+        for df_full_order in order_chunks:
+            order_ids, product_ids, quantidades, precos = column_lists(
+                df_full_order, ['order_id', 'product_id', 'quantity', 'preco_unit'])
+            for order_id, product_id, quantidade, preco_unit in tqdm(zip(order_ids, product_ids, quantidades, precos), total=len(order_ids), desc="Redis Itens de pedido"):
+                item_json = json.dumps({"quantidade": quantidade, "preco_unit": preco_unit})
+                pipe.hset(f"pedido_item:{order_id}", product_id, item_json)
+
+            # o hash do pedido e os índices uma vez por pedido (não por item)
+            df_pedidos = df_full_order[pedido_cols].drop_duplicates()
+            order_ids, customer_ids, statuses = column_lists(df_pedidos, ['order_id', 'customer_id', 'order_status'])
+            datas = isoformat(df_pedidos['order_date'])
+            scores = epoch_seconds(df_pedidos['order_date'])
+            rows = zip(order_ids, customer_ids, datas, statuses, scores)
+            for order_id, customer_id, data, status, score in tqdm(rows, total=len(order_ids), desc="Redis Pedidos"):
+                pipe.hmset(f"pedido:{order_id}", {
+                    "cliente_id": customer_id,
+                    "data_pedido": data,
+                    "status": status
+                })
+                
+                # índices secundários: sem eles as buscas por status/data/cliente eram scan de pedido:*
+                pipe.sadd(f"idx:pedido_status:{status}", order_id)
+                pipe.zadd("idx:pedido_data", {order_id: score})
+                pipe.sadd(f"idx:cliente_pedidos:{customer_id}", order_id)
     
 
+# 'source' = (clientes, produtos, função que devolve os pedaços de itens de pedido)
+
+def run_postgres(args, source):
+    df_customers, df_products, order_chunks = source
+    pg_conn = connect_postgres()
+    try:
+        load_into_postgres(pg_conn.cursor(), df_customers, df_products, order_chunks("postgres"), loader=args.pg_loader)
+    finally:
+        pg_conn.close()
+        print("fechou postgres.")
+
+def run_mongo(args, source):
+    df_customers, df_products, order_chunks = source
+    mongo_client = connect_mongo()
+    try:
+        load_into_mongo(mongo_client["trabalho_bd"], df_customers, df_products, order_chunks("mongo"),
+                        workers=args.mongo_workers, chunk=args.mongo_chunk, upsert=args.stream)
+    finally:
+        mongo_client.close()
+        print("fechou mongo.")
+
+def run_cassandra(args, source):
+    df_customers, _, order_chunks = source # Não precisa de produtos
+    cassandra_cluster, cassandra_session = connect_cassandra()
+    try:
+        load_into_cassandra(cassandra_session, df_customers, order_chunks("cassandra"), window=args.cassandra_window)
+    finally:
+        cassandra_cluster.shutdown()
+        print("fechou cassandra.")
+
+def run_redis(args, source):
+    df_customers, df_products, order_chunks = source
+    redis_conn = connect_redis()
+    try:
+        load_into_redis(redis_conn, df_customers, df_products, order_chunks("redis"),
+                        connections=args.redis_connections, chunk=args.redis_chunk)
+    finally:
+        redis_conn.close()
+        print("fechou redis.")
+
+LOAD_FUNCS = {'postgres': run_postgres, 'mongo': run_mongo, 'cassandra': run_cassandra, 'redis': run_redis}
+
 def main(args):
     if not os.path.exists(DATA_DIR):
         print(f"Erro: Pasta '{DATA_DIR}' não encontrada.")
         sys.exit(1)
-        
-    pg_conn = None
-    mongo_client = None
-    cassandra_cluster = None
-    redis_conn = None
+
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), limit_rows=args.limit_rows, pg_loader=args.pg_loader,
+                  parallel=args.parallel, stream=args.stream)
 
     try:
-        pg_conn = connect_postgres()
-        mongo_client = connect_mongo()
-        mongo_db = mongo_client["trabalho_bd"]
-        cassandra_cluster, cassandra_session = connect_cassandra()
-        redis_conn = connect_redis()
-        
-        dfs = load_source_data(limit_rows=args.limit_rows)
-        df_customers, df_products, df_full_order = dfs
+        # no --stream o order_items.csv é lido depois, pedaço a pedaço, uma vez por banco
+        # (medido no order_chunks, na linha "parse" de cada banco)
+        with TELEMETRY.phase("source", "arquivos de origem", "parse") as m:
+            if args.stream:
+                source = load_source_stream(limit_rows=args.limit_rows, chunk_rows=args.chunk_rows)
+            else:
+                source = load_source_data(limit_rows=args.limit_rows, use_cache=not args.no_cache)
+            m["rows"] = len(source[0]) + len(source[1]) + (0 if args.stream else len(source[2]()[0]))
         
-        load_into_postgres(pg_conn.cursor(), df_customers, df_products, df_full_order)
-        load_into_mongo(mongo_db, df_customers, df_products, df_full_order)
-        load_into_cassandra(cassandra_session, df_customers, df_full_order) # Não precisa de produtos
-        load_into_redis(redis_conn, df_customers, df_products, df_full_order)
+        # cada banco abre e fecha a própria conexão (em processos separados com --parallel,
+        # que enxergam os mesmos DataFrames via fork)
+        run_loaders({name: partial(LOAD_FUNCS[name], args, source) for name in BACKENDS if name in args.backends},
+                    parallel=args.parallel)
+
+        print("\ntelemetria da carga:")
+        print(TELEMETRY.summary())
+        if not args.no_history:
+            history.record_ingest(run_id, "problema1", TELEMETRY.records(), params)
         
     except Exception as e:
         print(f"Erro: {e}")
         import traceback
         traceback.print_exc()
-            
-    finally:
-        print("fechando conexoes")
-        if pg_conn:
-            pg_conn.close()
-            print("fechou postgres.")
-        if mongo_client:
-            mongo_client.close()
-            print("fechou mongo.")
-        if cassandra_cluster:
-            cassandra_cluster.shutdown()
-            print("fechou cassandra.")
-        if redis_conn:
-            redis_conn.close()
-            print("fechou redis.")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Carrega dados CSV em 4 bancos de dados (SQL vs NoSQL)")
     parser.add_argument("--limit-rows", type=int, default=None,
                         help="Limita o número de linhas lidas do arquivo 'order_items.csv'")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS,
+                        help="Bancos que serão populados")
+    parser.add_argument("--pg-loader", choices=LOADERS, default="copy",
+                        help="Carga do postgres: COPY via staging (copy) ou execute_values (values)")
+    parser.add_argument("--cassandra-window", type=int, default=DEFAULT_WINDOW,
+                        help="Máximo de escritas assíncronas em voo no cassandra")
+    parser.add_argument("--redis-chunk", type=int, default=DEFAULT_MAX_COMMANDS,
+                        help="Comandos por pipeline do redis")
+    parser.add_argument("--redis-connections", type=int, default=1,
+                        help="Pipelines do redis mandados em paralelo (conexões)")
+    parser.add_argument("--mongo-chunk", type=int, default=DEFAULT_CHUNK,
+                        help="Documentos por bulk_write no mongo")
+    parser.add_argument("--mongo-workers", type=int, default=DEFAULT_WORKERS,
+                        help="Threads mandando lotes pro mongo em paralelo")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Carrega os bancos ao mesmo tempo, um processo por banco")
+    parser.add_argument("--stream", action="store_true",
+                        help="Lê o 'order_items.csv' em pedaços e manda cada pedaço direto pros bancos")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Itens de pedido por pedaço no --stream")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignora o cache em Parquet dos dados limpos (data/.cache) e lê os CSVs")
+    parser.add_argument("--run-id", default=None,
+                        help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}",
+                        help="Parâmetros extras da execução (JSON), guardados no histórico junto com a telemetria da carga")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Não grava a telemetria da carga no history.sqlite")
     args = parser.parse_args()
     
     main(args)
\ No newline at end of file
@@ -2,19 +2,36 @@ import psycopg2
 import psycopg2.extras
 from pymongo import MongoClient
 from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType
 import redis
 import json
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterator
 from collections import Counter
 import traceback
+import argparse
 
 from abstract_queries import AbstractDb, ProductData
+from cassandra_tables import STATUS_BUCKETS, status_bucket, dias_no_intervalo
+from benchmark.stats import format_stats
+from benchmark.sampler import ResourceSampler
+from benchmark import history
+from benchmark.profiler import SamplingProfiler, format_profile
+from benchmark.cassandra_scan import scan, scan_filter
+from benchmark.cassandra_index import detect_all, select_eq, select_range, eq_query, range_query
+from benchmark.streaming import pg_stream, cassandra_stream, format_streaming, DEFAULT_BATCH
+from benchmark.redis_scan import RedisScan
+from benchmark.server_capture import PostgresCapture, MongoCapture, CassandraCapture, RedisCapture, format_server
 
 def _decode_redis_hash(s: Dict[bytes, bytes]) -> Dict[str, Any]:
     """Converte um hash do Redis (bytes) para um dict (str)."""
     return {k.decode('utf-8'): v.decode('utf-8') for k, v in s.items()}
 
+def _epoch(d: datetime) -> float:
+    """Mesmo score do idx:pedido_data (datas sem fuso tratadas como UTC, igual ao loader)."""
+    return d.replace(tzinfo=timezone.utc).timestamp() if d.tzinfo is None else d.timestamp()
+
 def _mongo_fix_id(doc: Dict[str, Any]) -> Dict[str, Any]:
     """Muda a chave '_id' do MongoDB para 'id'."""
     if doc and '_id' in doc:
@@ -44,6 +61,31 @@ class PostgresDb(AbstractDb):
             self.conn.close()
             print("postgres desconectado")
 
+    def server_capture(self):
+        return PostgresCapture(self.conn)
+
+    def snapshot_pedido(self, order_id: str) -> Any:
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM pedido WHERE id = %s", (order_id,))
+            pedido = cursor.fetchone()
+            if pedido is None:
+                return None
+            cursor.execute("SELECT * FROM pedido_item WHERE pedido_id = %s", (order_id,))
+            return pedido, cursor.fetchall()
+
+    def restore_pedido(self, snapshot: Any):
+        if snapshot is None:
+            return
+        pedido, itens = snapshot
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO pedido (id, cliente_id, data, status) VALUES (%(id)s, %(cliente_id)s, %(data)s, %(status)s) "
+                "ON CONFLICT (id) DO NOTHING", pedido)
+            cursor.executemany(
+                "INSERT INTO pedido_item (pedido_id, item_id, quantidade, preco_unit) "
+                "VALUES (%(pedido_id)s, %(item_id)s, %(quantidade)s, %(preco_unit)s) ON CONFLICT DO NOTHING", itens)
+        self.conn.commit()
+
     def read_cliente(self, cliente_id: str) -> Optional[Dict[str, Any]]:
         with self.conn.cursor() as cursor:
             cursor.execute("SELECT * FROM cliente WHERE id = %s", (cliente_id,))
@@ -83,6 +125,14 @@ class PostgresDb(AbstractDb):
             cursor.execute("SELECT * FROM pedido WHERE data BETWEEN %s AND %s", (data_inicio, data_fim))
             return cursor.fetchall()
 
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        # cursor nomeado: o resultado fica no servidor e vem em lotes de stream_batch linhas
+        return pg_stream(self.conn, "SELECT * FROM pedido WHERE status = %s", (status,), self.stream_batch)
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        return pg_stream(self.conn, "SELECT * FROM pedido WHERE data BETWEEN %s AND %s", (data_inicio, data_fim),
+                         self.stream_batch)
+
     def find_pedidos_por_cliente(self, cliente_id: str) -> List[Dict[str, Any]]:
         with self.conn.cursor() as cursor:
             cursor.execute("SELECT * FROM pedido WHERE cliente_id = %s", (cliente_id,))
@@ -135,6 +185,17 @@ class MongoDb(AbstractDb):
             self.conn.close()
             print("mongodb desconectado")
 
+    def server_capture(self):
+        return MongoCapture(self.db)
+
+    def snapshot_pedido(self, order_id: str) -> Any:
+        # o documento já traz os itens embutidos
+        return self.db.pedidos.find_one({"_id": order_id})
+
+    def restore_pedido(self, snapshot: Any):
+        if snapshot is not None:
+            self.db.pedidos.replace_one({"_id": snapshot["_id"]}, snapshot, upsert=True)
+
     def read_cliente(self, cliente_id: str) -> Dict[str, Any]:
         doc = self.db.clientes.find_one({"_id": cliente_id})
         return _mongo_fix_id(doc)
@@ -170,6 +231,17 @@ class MongoDb(AbstractDb):
         })
         return [_mongo_fix_id(doc) for doc in cursor]
 
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        # o cursor do mongo já é preguiçoso; batch_size controla quantos documentos vêm por getMore
+        cursor = self.db.pedidos.find({"status": status}).batch_size(self.stream_batch)
+        return (_mongo_fix_id(doc) for doc in cursor)
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        cursor = self.db.pedidos.find({
+            "data_pedido": {"$gte": data_inicio, "$lt": data_fim}
+        }).batch_size(self.stream_batch)
+        return (_mongo_fix_id(doc) for doc in cursor)
+
     def find_pedidos_por_cliente(self, cliente_id: str) -> List[Dict[str, Any]]:
         cursor = self.db.pedidos.find({"cliente_id": cliente_id})
         return [_mongo_fix_id(doc) for doc in cursor]
@@ -182,7 +254,7 @@ class MongoDb(AbstractDb):
         )
         return doc.get('itens', []) if doc else []
 
-    def find_cliente_por_pedido(self, order_id: str) -> Dict[str, Any]:
+    def find_cliente_por_pedido(self, order_id: str) -> Optional[Dict[str, Any]]:
         # implementação de "JOIN" 
         pipeline = [
             {"$match": {"_id": order_id}},
@@ -196,7 +268,7 @@ class MongoDb(AbstractDb):
             {"$replaceRoot": {"newRoot": "$cliente_info"}} # retorna só o cliente
         ]
         result = list(self.db.pedidos.aggregate(pipeline))
-        return _mongo_fix_id(result[0])
+        return _mongo_fix_id(result[0]) if result else None
 
     def get_top_10_clientes_por_pedidos(self) -> List[Dict[str, Any]]:
         # implementando "GROUP BY"
@@ -217,12 +289,22 @@ class MongoDb(AbstractDb):
     
 
 class CassandraDb(AbstractDb):
-    """Implementação do Cassandra. Otimizado para buscas diretas por chaves, mas dificil lidar com queries maiores"""
+    """
+    Implementação do Cassandra. Otimizado para buscas diretas por chaves, mas dificil lidar com queries maiores.
+    Status, data e pedido->cliente usam as tabelas de consulta de cassandra_tables.py (leitura por partição).
+    """
 
     def connect(self):
         try:
             self.conn = Cluster(['localhost'], port=9042)
             self.session = self.conn.connect('trabalho_bd')
+            self.status_stmt = self.session.prepare(
+                "SELECT cliente_id, pedido_id, data_pedido, status FROM pedidos_por_status WHERE status = ? AND bucket = ?"
+            )
+            self.dia_stmt = self.session.prepare(
+                "SELECT cliente_id, pedido_id, data_pedido, status FROM pedidos_por_dia "
+                "WHERE dia = ? AND data_pedido >= ? AND data_pedido < ?"
+            )
             print("cassandra conectado.")
         except Exception as e:
             print(f"erro ao conectar ao cassandra: {e}")
@@ -233,10 +315,45 @@ class CassandraDb(AbstractDb):
             self.conn.shutdown()
             print("cassandra desconectado.")
 
-    def read_cliente(self, cliente_id: str) -> Dict[str, Any]:
+    def server_capture(self):
+        return CassandraCapture(self)
+
+    def snapshot_pedido(self, order_id: str) -> Any:
+        # as mesmas colunas que o populate_tables.py grava, de todas as tabelas do pedido
+        row = self.session.execute(
+            "SELECT cliente_id, data_pedido, status FROM cliente_por_pedido WHERE pedido_id = %s", (order_id,)
+        ).one()
+        if row is None:
+            return None
+        itens = list(self.session.execute(
+            "SELECT item_id, quantidade, preco_unitario FROM itens_por_pedido WHERE pedido_id = %s", (order_id,)
+        ))
+        return order_id, row, itens
+
+    def restore_pedido(self, snapshot: Any):
+        if snapshot is None:
+            return
+        order_id, row, itens = snapshot
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        batch.add("INSERT INTO pedidos_por_cliente (cliente_id, pedido_id, data_pedido, status) VALUES (%s, %s, %s, %s)",
+                  (row.cliente_id, order_id, row.data_pedido, row.status))
+        batch.add("INSERT INTO pedidos_por_status (status, bucket, data_pedido, pedido_id, cliente_id) VALUES (%s, %s, %s, %s, %s)",
+                  (row.status, status_bucket(order_id), row.data_pedido, order_id, row.cliente_id))
+        batch.add("INSERT INTO pedidos_por_dia (dia, data_pedido, pedido_id, cliente_id, status) VALUES (%s, %s, %s, %s, %s)",
+                  (row.data_pedido.date(), row.data_pedido, order_id, row.cliente_id, row.status))
+        batch.add("INSERT INTO cliente_por_pedido (pedido_id, cliente_id, data_pedido, status) VALUES (%s, %s, %s, %s)",
+                  (order_id, row.cliente_id, row.data_pedido, row.status))
+        for item in itens:
+            batch.add("INSERT INTO itens_por_pedido (pedido_id, item_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
+                      (order_id, item.item_id, item.quantidade, item.preco_unitario))
+        self.session.execute(batch)
+
+    def read_cliente(self, cliente_id: str) -> Optional[Dict[str, Any]]:
         row = self.session.execute(
             "SELECT * FROM clientes WHERE cliente_id = %s", (cliente_id,)
         ).one()
+        if row is None:
+            return None
         return {
             "id": row.cliente_id, 
             "nome": row.nome,
@@ -255,59 +372,70 @@ class CassandraDb(AbstractDb):
         return False
 
     def delete_pedido(self, order_id: str) -> bool:
-        # não é muito comum fazer essa operação com a tabela atual,
-        # deletar um pedido é ruim pois não temos uma tabela separada, mas da pra fazer
-        # acabo precisando trazer os dados para serem processados no python
+        # com a tabela cliente_por_pedido dá pra achar as chaves do pedido em todas as tabelas
+        # sem scan; o batch LOGGED garante que as cópias desnormalizadas somem juntas
         try:
-            self.session.execute(
-                "DELETE FROM itens_por_pedido WHERE pedido_id = %s", (order_id,)
-            )
-            
-            rows = self.session.execute("SELECT cliente_id, pedido_id FROM pedidos_por_cliente")
-            cliente_id_para_deletar = None
-            for row in rows:
-                if row.pedido_id == order_id:
-                    cliente_id_para_deletar = row.cliente_id
-                    break
-            
-            if cliente_id_para_deletar:
-                self.session.execute(
-                    "DELETE FROM pedidos_por_cliente WHERE cliente_id = %s AND pedido_id = %s",
-                    (cliente_id_para_deletar, order_id)
-                )
+            row = self.session.execute(
+                "SELECT cliente_id, data_pedido, status FROM cliente_por_pedido WHERE pedido_id = %s", (order_id,)
+            ).one()
+
+            batch = BatchStatement(batch_type=BatchType.LOGGED)
+            batch.add("DELETE FROM itens_por_pedido WHERE pedido_id = %s", (order_id,))
+            if row:
+                batch.add("DELETE FROM pedidos_por_cliente WHERE cliente_id = %s AND pedido_id = %s",
+                          (row.cliente_id, order_id))
+                batch.add("DELETE FROM pedidos_por_status WHERE status = %s AND bucket = %s AND data_pedido = %s AND pedido_id = %s",
+                          (row.status, status_bucket(order_id), row.data_pedido, order_id))
+                batch.add("DELETE FROM pedidos_por_dia WHERE dia = %s AND data_pedido = %s AND pedido_id = %s",
+                          (row.data_pedido.date(), row.data_pedido, order_id))
+                batch.add("DELETE FROM cliente_por_pedido WHERE pedido_id = %s", (order_id,))
+            self.session.execute(batch)
             return True
         except Exception as e:
             print(f"Erro ao deletar pedido no Cassandra: {e}")
             return False
 
     def find_pedidos_por_status(self, status: str) -> List[Dict[str, Any]]:
-        # novamente preciso lidar com os dados no python
-        rows = self.session.execute("SELECT * FROM pedidos_por_cliente")
-        pedidos_filtrados = []
-        for row in rows:
-            if row.status == status:
-                pedidos_filtrados.append({
-                    "cliente_id": row.cliente_id,
-                    "pedido_id": row.pedido_id,
-                    "data_pedido": row.data_pedido,
-                    "status": row.status
-                })
-        return pedidos_filtrados
+        # uma leitura por bucket do status (em paralelo), cada uma numa partição só
+        results = execute_concurrent_with_args(self.session, self.status_stmt, [(status, b) for b in range(STATUS_BUCKETS)])
+        pedidos = []
+        for success, rows in results:
+            if not success:
+                raise rows
+            pedidos.extend(self._pedido(row) for row in rows)
+        return pedidos
 
     def find_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> List[Dict[str, Any]]:
-        # mesmo caso da query acima
-        rows = self.session.execute("SELECT * FROM pedidos_por_cliente")
-        pedidos_filtrados = []
-        for row in rows:
-            if data_inicio <= row.data_pedido < data_fim:
-                pedidos_filtrados.append({
-                    "cliente_id": row.cliente_id,
-                    "pedido_id": row.pedido_id,
-                    "data_pedido": row.data_pedido,
-                    "status": row.status
-                })
-        print(f"Cassandra: Scan concluído, {len(pedidos_filtrados)} encontrados.")
-        return pedidos_filtrados
+        # uma partição por dia do intervalo; o recorte dentro do dia é pela coluna de clustering
+        dias = dias_no_intervalo(data_inicio, data_fim)
+        results = execute_concurrent_with_args(self.session, self.dia_stmt, [(dia, data_inicio, data_fim) for dia in dias])
+        pedidos = []
+        for success, rows in results:
+            if not success:
+                raise rows
+            pedidos.extend(self._pedido(row) for row in rows)
+        print(f"Cassandra: {len(dias)} dias lidos, {len(pedidos)} encontrados.")
+        return pedidos
+
+    @staticmethod
+    def _pedido(row) -> Dict[str, Any]:
+        return {
+            "cliente_id": row.cliente_id,
+            "pedido_id": row.pedido_id,
+            "data_pedido": row.data_pedido,
+            "status": row.status
+        }
+
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        # um bucket por vez, paginado (o find lê os 16 em paralelo e só devolve no fim)
+        for bucket in range(STATUS_BUCKETS):
+            for row in cassandra_stream(self.session, self.status_stmt, (status, bucket), self.stream_batch):
+                yield self._pedido(row)
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        for dia in dias_no_intervalo(data_inicio, data_fim):
+            for row in cassandra_stream(self.session, self.dia_stmt, (dia, data_inicio, data_fim), self.stream_batch):
+                yield self._pedido(row)
 
     def find_pedidos_por_cliente(self, cliente_id: str) -> List[Dict[str, Any]]:
         # ja nessa consulta foi possível executar perfeitamente
@@ -334,32 +462,140 @@ class CassandraDb(AbstractDb):
             "preco_unitario": row.preco_unitario
         } for row in rows]
 
-    def find_cliente_por_pedido(self, order_id: str) -> Dict[str, Any]:
-        # precisei de novo processar no python
-        rows = self.session.execute("SELECT cliente_id, pedido_id FROM pedidos_por_cliente")
-        cliente_id_encontrado = ""
-        for row in rows:
-            if row.pedido_id == order_id:
-                cliente_id_encontrado = row.cliente_id
-                break
-        
-        return self.read_cliente(cliente_id_encontrado)
+    def find_cliente_por_pedido(self, order_id: str) -> Optional[Dict[str, Any]]:
+        # leitura direta pela chave em cliente_por_pedido
+        row = self.session.execute(
+            "SELECT cliente_id FROM cliente_por_pedido WHERE pedido_id = %s", (order_id,)
+        ).one()
+        # None só se o pedido não existe mesmo (o run_all_queries regrava o que o delete_pedido apaga)
+        return self.read_cliente(row.cliente_id) if row else None
 
     def get_top_10_clientes_por_pedidos(self) -> List[Dict[str, Any]]:
-        # mesmo caso acima
-        rows = self.session.execute("SELECT cliente_id FROM pedidos_por_cliente")
-        
-        contagem = Counter()
-        for row in rows:
-            contagem[row.cliente_id] += 1
+        # continua sendo a tabela inteira, mas em faixas de token paralelas (benchmark/cassandra_scan.py);
+        # cada cliente é uma partição, então cai inteiro numa faixa só e os Counter só se somam
+        parciais = scan(self.session, "pedidos_por_cliente", "cliente_id",
+                        lambda rows: Counter(row.cliente_id for row in rows), columns="cliente_id")
+        contagem = sum(parciais, Counter())
         
         return [
             {"cliente_id": cid, "total_pedidos": total}
             for cid, total in contagem.most_common(10)
         ]
 
+class CassandraScanDb(CassandraDb):
+    """
+    Cassandra só com pedidos_por_cliente (o modelo antigo): status, data e pedido->cliente viram
+    scan da tabela inteira com filtro no python. Fica pra comparar com as tabelas de consulta
+    do CassandraDb ('cassandra-scan' no --backends).
+    Os scans são por faixas de token em paralelo (benchmark/cassandra_scan.py).
+    """
+
+    def delete_pedido(self, order_id: str) -> bool:
+        # não é muito comum fazer essa operação com a tabela atual,
+        # deletar um pedido é ruim pois não temos uma tabela separada, mas da pra fazer
+        # acabo precisando trazer os dados para serem processados no python
+        try:
+            self.session.execute(
+                "DELETE FROM itens_por_pedido WHERE pedido_id = %s", (order_id,)
+            )
+            
+            rows = scan_filter(self.session, "pedidos_por_cliente", "cliente_id", lambda row: row.pedido_id == order_id,
+                               columns="cliente_id, pedido_id, data_pedido, status", limit=1)
+            encontrado = rows[0] if rows else None
+            
+            if encontrado:
+                self.session.execute(
+                    "DELETE FROM pedidos_por_cliente WHERE cliente_id = %s AND pedido_id = %s",
+                    (encontrado.cliente_id, order_id)
+                )
+                # as tabelas de consulta também existem no keyspace: apago pra não ficarem órfãs
+                self.session.execute(
+                    "DELETE FROM pedidos_por_status WHERE status = %s AND bucket = %s AND data_pedido = %s AND pedido_id = %s",
+                    (encontrado.status, status_bucket(order_id), encontrado.data_pedido, order_id)
+                )
+                self.session.execute(
+                    "DELETE FROM pedidos_por_dia WHERE dia = %s AND data_pedido = %s AND pedido_id = %s",
+                    (encontrado.data_pedido.date(), encontrado.data_pedido, order_id)
+                )
+                self.session.execute("DELETE FROM cliente_por_pedido WHERE pedido_id = %s", (order_id,))
+            return True
+        except Exception as e:
+            print(f"Erro ao deletar pedido no Cassandra: {e}")
+            return False
+
+    def find_pedidos_por_status(self, status: str) -> List[Dict[str, Any]]:
+        # novamente preciso lidar com os dados no python
+        rows = scan_filter(self.session, "pedidos_por_cliente", "cliente_id", lambda row: row.status == status,
+                           columns="cliente_id, pedido_id, data_pedido, status")
+        return [self._pedido(row) for row in rows]
+
+    def find_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> List[Dict[str, Any]]:
+        # mesmo caso da query acima
+        rows = scan_filter(self.session, "pedidos_por_cliente", "cliente_id",
+                           lambda row: data_inicio <= row.data_pedido < data_fim,
+                           columns="cliente_id, pedido_id, data_pedido, status")
+        print(f"Cassandra: Scan concluído, {len(rows)} encontrados.")
+        return [self._pedido(row) for row in rows]
+
+    def find_cliente_por_pedido(self, order_id: str) -> Optional[Dict[str, Any]]:
+        # precisei de novo processar no python (o scan para no primeiro que achar)
+        rows = scan_filter(self.session, "pedidos_por_cliente", "cliente_id", lambda row: row.pedido_id == order_id,
+                           columns="cliente_id, pedido_id", limit=1)
+        return self.read_cliente(rows[0].cliente_id) if rows else None
+
+    # o scan junta as faixas só no fim: aqui os iter_* são só um iterador sobre a lista
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        return iter(self.find_pedidos_por_status(status))
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        return iter(self.find_pedidos_por_data(data_inicio, data_fim))
+
+class CassandraIndexDb(CassandraScanDb):
+    """
+    Cassandra com o modelo antigo, mas status e data saem de índice do servidor em pedidos_por_cliente
+    (SAI, 2i ou view materializada, criados pelo prepare_tables.py --cassandra-index e achados no
+    system_schema). O que o índice não serve (2i/mv em faixa de data, ou nenhum índice) cai no scan
+    do CassandraScanDb. 'cassandra-index' no --backends, pra comparar com as tabelas de consulta.
+    """
+
+    COLUMNS = "cliente_id, pedido_id, data_pedido, status"
+
+    def connect(self):
+        super().connect()
+        self.indices = detect_all(self.session, "pedidos_por_cliente", ["status", "data_pedido"])
+
+    def find_pedidos_por_status(self, status: str) -> List[Dict[str, Any]]:
+        rows = select_eq(self.session, self.indices["status"], "pedidos_por_cliente", "status", status, columns=self.COLUMNS)
+        if rows is None:
+            return super().find_pedidos_por_status(status)
+        return [self._pedido(row) for row in rows]
+
+    def find_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> List[Dict[str, Any]]:
+        rows = select_range(self.session, self.indices["data_pedido"], "pedidos_por_cliente", "data_pedido",
+                            lo=data_inicio, hi=data_fim, columns=self.COLUMNS)
+        if rows is None:
+            return super().find_pedidos_por_data(data_inicio, data_fim)
+        return [self._pedido(row) for row in rows]
+
+    def iter_pedidos_por_status(self, status: str) -> Iterator[Dict[str, Any]]:
+        cql = eq_query(self.indices["status"], "pedidos_por_cliente", "status", columns=self.COLUMNS)
+        if cql is None:
+            return super().iter_pedidos_por_status(status)
+        return (self._pedido(row) for row in cassandra_stream(self.session, cql, (status,), self.stream_batch))
+
+    def iter_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> Iterator[Dict[str, Any]]:
+        query = range_query(self.indices["data_pedido"], "pedidos_por_cliente", "data_pedido",
+                            lo=data_inicio, hi=data_fim, columns=self.COLUMNS)
+        if query is None:
+            return super().iter_pedidos_por_data(data_inicio, data_fim)
+        return (self._pedido(row) for row in cassandra_stream(self.session, *query, fetch_size=self.stream_batch))
+
 class RedisDb(AbstractDb):
-    """Implementação do Redis. Rápido para chaves, lento para scans."""
+    """
+    Implementação do Redis. Rápido para chaves, lento para scans.
+    Pedidos têm índices mantidos pelo loader e pelo delete_pedido: idx:pedido_status:<status> (set),
+    idx:pedido_data (sorted set, score = epoch) e idx:cliente_pedidos:<cliente> (set).
+    """
 
     def connect(self):
         try:
@@ -375,6 +611,35 @@ class RedisDb(AbstractDb):
             self.conn.close()
             print("redis desconectado.")
 
+    def server_capture(self):
+        return RedisCapture(self.conn)
+
+    def snapshot_pedido(self, order_id: str) -> Any:
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.hgetall(f"pedido:{order_id}")
+        pipe.hgetall(f"pedido_item:{order_id}")
+        pipe.zscore("idx:pedido_data", order_id)
+        pedido, itens, score = pipe.execute()
+        if not pedido:
+            return None
+        return order_id, pedido, itens, score
+
+    def restore_pedido(self, snapshot: Any):
+        if snapshot is None:
+            return
+        order_id, pedido, itens, score = snapshot
+        pipe = self.conn.pipeline(transaction=True)
+        pipe.hmset(f"pedido:{order_id}", pedido)
+        if itens:
+            pipe.hmset(f"pedido_item:{order_id}", itens)
+        if score is not None:
+            pipe.zadd("idx:pedido_data", {order_id: score})
+        if pedido.get(b"status") is not None:
+            pipe.sadd(f"idx:pedido_status:{pedido[b'status'].decode('utf-8')}", order_id)
+        if pedido.get(b"cliente_id") is not None:
+            pipe.sadd(f"idx:cliente_pedidos:{pedido[b'cliente_id'].decode('utf-8')}", order_id)
+        pipe.execute()
+
     def read_cliente(self, cliente_id: str) -> Dict[str, Any]:
         data = self.conn.hgetall(f"cliente:{cliente_id}")
         return _decode_redis_hash(data)
@@ -391,45 +656,43 @@ class RedisDb(AbstractDb):
         key = f"item:{product_id}"
         return self.conn.hset(key, "valor", novo_preco) > 0
 
+    def _hgetall_pedidos(self, order_ids, chunk: int = 10_000) -> List[Dict[str, Any]]:
+        """Os hashes dos pedidos em pipelines de 'chunk' (uma ida e volta por lote em vez de uma por pedido)."""
+        order_ids = list(order_ids)
+        pedidos = []
+        for start in range(0, len(order_ids), chunk):
+            pipe = self.conn.pipeline(transaction=False)
+            for order_id in order_ids[start:start + chunk]:
+                pipe.hgetall(b"pedido:" + order_id)
+            # hash vazio = índice apontando pra pedido que não existe mais
+            pedidos.extend(_decode_redis_hash(data) for data in pipe.execute() if data)
+        return pedidos
+
     def delete_pedido(self, order_id: str) -> bool:
-        # uso pipeline pois executo as duas operaçoes juntas
-        pipe = self.conn.pipeline()
+        # preciso do cliente e do status pra tirar o pedido dos índices; o resto vai num MULTI/EXEC
+        cliente_id, status = self.conn.hmget(f"pedido:{order_id}", "cliente_id", "status")
+        pipe = self.conn.pipeline(transaction=True)
         pipe.delete(f"pedido:{order_id}")
         pipe.delete(f"pedido_item:{order_id}")
+        pipe.zrem("idx:pedido_data", order_id)
+        if status is not None:
+            pipe.srem(f"idx:pedido_status:{status.decode('utf-8')}", order_id)
+        if cliente_id is not None:
+            pipe.srem(f"idx:cliente_pedidos:{cliente_id.decode('utf-8')}", order_id)
         results = pipe.execute()
-        return sum(results) > 0 # retorna true se pelo menos 1 chave foi deletada
+        return sum(results[:2]) > 0 # retorna true se pelo menos 1 chave foi deletada
 
     def find_pedidos_por_status(self, status: str) -> List[Dict[str, Any]]:
-        # aqui ja fica complicado de fazer com o redis
-        # no fim das contas eu trago os dados e lido com eles manualmente no Python
-        # não vi como fazer isso no redis ...
-        pedidos = []
-        for key in self.conn.scan_iter("pedido:*"):
-            data = self.conn.hgetall(key)
-            if data.get(b'status') == status.encode('utf-8'):
-                pedidos.append(_decode_redis_hash(data))
-        return pedidos
+        # antes era scan de pedido:* com um hgetall por pedido; agora o set do status diz quais ler
+        return self._hgetall_pedidos(self.conn.smembers(f"idx:pedido_status:{status}"))
 
     def find_pedidos_por_data(self, data_inicio: datetime, data_fim: datetime) -> List[Dict[str, Any]]:
-        # mesmo caso que ocorreu com a query acima
-        pedidos = []
-        for key in self.conn.scan_iter("pedido:*"):
-            data = self.conn.hgetall(key)
-            data_pedido_str = data.get(b'data_pedido')
-            if data_pedido_str:
-                data_pedido = datetime.fromisoformat(data_pedido_str.decode('utf-8'))
-                if data_inicio <= data_pedido < data_fim:
-                    pedidos.append(_decode_redis_hash(data))
-        return pedidos
+        # intervalo [inicio, fim) direto no sorted set ordenado por data
+        order_ids = self.conn.zrangebyscore("idx:pedido_data", _epoch(data_inicio), f"({_epoch(data_fim)}")
+        return self._hgetall_pedidos(order_ids)
 
     def find_pedidos_por_cliente(self, cliente_id: str) -> List[Dict[str, Any]]:
-        # mesmo caso acima, tive que processar no python
-        pedidos = []
-        for key in self.conn.scan_iter("pedido:*"):
-            data = self.conn.hgetall(key)
-            if data.get(b'cliente_id') == cliente_id.encode('utf-8'):
-                pedidos.append(_decode_redis_hash(data))
-        return pedidos
+        return self._hgetall_pedidos(self.conn.smembers(f"idx:cliente_pedidos:{cliente_id}"))
 
     def find_itens_por_pedido(self, order_id: str) -> List[Dict[str, Any]]:
         key = f"pedido_item:{order_id}"
@@ -444,65 +707,153 @@ class RedisDb(AbstractDb):
             })
         return itens
 
-    def find_cliente_por_pedido(self, order_id: str) -> Dict[str, Any]:
+    def find_cliente_por_pedido(self, order_id: str) -> Optional[Dict[str, Any]]:
         pedido_key = f"pedido:{order_id}"
         cliente_id_b = self.conn.hget(pedido_key, "cliente_id")
-        
+        if cliente_id_b is None:
+            return None
+
         cliente_id = cliente_id_b.decode('utf-8')
         return self.read_cliente(cliente_id)
 
     def get_top_10_clientes_por_pedidos(self) -> List[Dict[str, Any]]:
-        # tive que novamente processar no python
+        # tive que novamente processar no python (SCAN em lotes + HMGET em pipeline, benchmark/redis_scan.py)
         contagem = Counter()
-        for key in self.conn.scan_iter("pedido:*"):
-            cliente_id_b = self.conn.hget(key, "cliente_id")
-            if cliente_id_b:
-                contagem[cliente_id_b.decode('utf-8')] += 1
+        scan = RedisScan(self.conn, "pedido:*", ["cliente_id"])
+        for _, campos in scan:
+            if campos["cliente_id"]:
+                contagem[campos["cliente_id"].decode('utf-8')] += 1
+        scan.report()
         
         return [
             {"cliente_id": cid, "total_pedidos": total}
             for cid, total in contagem.most_common(10)
         ]
     
+def format_scan_comparison(scan: Dict[str, float], tabelas: Dict[str, float], indice: Optional[Dict[str, float]] = None) -> str:
+    """
+    Cassandra lado a lado: scan de pedidos_por_cliente x tabelas de consulta (e x índice do servidor,
+    se o 'cassandra-index' rodou), só nas operações que mudaram. Ganho = scan / tabelas.
+    """
+    ops = ["find_pedidos_por_status", "find_pedidos_por_data", "find_cliente_por_pedido", "delete_pedido"]
+    titulo = "Cassandra scan x tabelas de consulta" + (" x índice:" if indice else ":")
+    lines = [titulo,
+             f"   {'operação':<26} {'scan (s)':>10} {'tabelas (s)':>12}" + (f" {'índice (s)':>11}" if indice else "") + f" {'ganho':>8}"]
+    for op in ops:
+        if op not in scan or op not in tabelas:
+            continue
+        ganho = f"{scan[op] / tabelas[op]:.1f}x" if tabelas[op] else "-"
+        coluna_indice = ""
+        if indice:
+            coluna_indice = f" {indice[op]:>11.4f}" if op in indice else f" {'-':>11}"
+        lines.append(f"   {op:<26} {scan[op]:>10.4f} {tabelas[op]:>12.4f}{coluna_indice} {ganho:>8}")
+    return "\n".join(lines) + "\n"
+
+# nomes curtos usados pelo --backends (e pelo run_benchmark.py na raiz)
+BACKENDS = {
+    "postgres": PostgresDb,
+    "mongo": MongoDb,
+    "cassandra": CassandraDb,
+    "cassandra-scan": CassandraScanDb,
+    "cassandra-index": CassandraIndexDb,
+    "redis": RedisDb,
+}
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa as consultas do problema 1 nos 4 bancos")
+    parser.add_argument("--warmup", type=int, default=0, help="Rodadas de aquecimento descartadas antes da medição")
+    parser.add_argument("--iterations", type=int, default=1, help="Quantas vezes cada operação é medida (percentis/IC por operação)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS), help="Bancos a testar")
+    parser.add_argument("--results-dir", default="./results", help="Pasta onde os resultados são salvos")
+    parser.add_argument("--sample-resources", action="store_true", help="Amostra CPU/memória/IO dos containers e do processo python durante as consultas")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Intervalo (s) entre amostras do --sample-resources")
+    parser.add_argument("--capture-server", action="store_true", help="Rodada extra capturando plano/tracing/slowlog do servidor por operação (campo 'server' nos resultados)")
+    parser.add_argument("--profile", action="store_true", help="Profiler por amostragem: divide o tempo no cliente em io_wait/driver/decode/application e salva profile_<Banco>.folded (flamegraph)")
+    parser.add_argument("--profile-interval", type=float, default=0.001, help="Intervalo (s) entre amostras do --profile")
+    parser.add_argument("--run-id", default=None, help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}", help="Parâmetros extras da execução (JSON), guardados no histórico junto com os tempos")
+    parser.add_argument("--no-history", action="store_true", help="Não grava esta execução no history.sqlite")
+    parser.add_argument("--stream-metrics", action="store_true", help="Mede também os iter_* e, lista x iterador, o tempo até a primeira linha e o pico de memória (campo 'streaming')")
+    parser.add_argument("--stream-batch", type=int, default=DEFAULT_BATCH, help="Linhas por ida e volta nos iter_* (itersize/batch_size/fetch_size)")
+    args = parser.parse_args()
+
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), warmup=args.warmup, iterations=args.iterations)
+    if args.profile:
+        # switch interval do GIL reduzido: o compare do histórico não pode juntar com rodadas sem --profile
+        params.update(profile=True, profile_interval=args.profile_interval)
 
-    postgress = PostgresDb()
-    mongo = MongoDb()
-    cassandra = CassandraDb()
-    redis_db = RedisDb()
-    
     # Limpa o arquivo OUT.txt antes de começar
     import os
-    os.makedirs("./results", exist_ok=True)
-    with open("./results/OUT.txt", "w") as f:
+    os.makedirs(args.results_dir, exist_ok=True)
+    out_path = os.path.join(args.results_dir, "OUT.txt")
+    with open(out_path, "w") as f:
         f.write("")
 
-    for db in [postgress, mongo, cassandra, redis_db]:
+    # amostragem contínua de recursos, no mesmo relógio do 'timeline' de cada banco
+    sampler = ResourceSampler(interval=args.sample_interval).start() if args.sample_resources else None
+
+    timings_by_db = {}  # pro comparativo scan x tabelas de consulta do cassandra
+    for db in [BACKENDS[b]() for b in args.backends]:
         print(f"\n--- Testando {db.__class__.__name__} ---")
 
         db.connect()
+        db.stream_batch = args.stream_batch
 
+        profiler = None  # lido no finally, mesmo se o start() falhar
         try:
+            profiler = SamplingProfiler(interval=args.profile_interval).start() if args.profile else None
             results = db.run_all_queries(
                 cliente_id="9613",
                 product_data=ProductData(id="9999999.0", nome="Produto Teste", valor=99.99),
                 order_id="10143.0",
                 status="Pago",
                 data_inicio=datetime(2023, 1, 1),
-                data_fim=datetime(2023, 12, 31)
+                data_fim=datetime(2023, 12, 31),
+                warmup=args.warmup,
+                iterations=args.iterations,
+                capture_server=args.capture_server,
+                profiler=profiler,
+                stream_metrics=args.stream_metrics
             )
+            if profiler:
+                profiler.stop()
+                profiler.save_collapsed(os.path.join(args.results_dir, f"profile_{db.__class__.__name__}.folded"))
 
-            with open(f"./results/results_{db.__class__.__name__}.json", "w") as f:
+            with open(os.path.join(args.results_dir, f"results_{db.__class__.__name__}.json"), "w") as f:
                 json.dump(results, f, default=str, indent=4)
 
-            num_operations = 10
+            num_operations = len(results["timings"])  # 10, ou 12 com os iter_* do --stream-metrics
             throughput = num_operations / results['total_time']
             
-            with open("./results/OUT.txt", "a") as f:
+            with open(out_path, "a") as f:
                 f.write(f"{db.__class__.__name__}: {results['total_time']:.4f}s ({throughput:.2f} ops/sec)\n")
+                if "stats" in results:
+                    f.write(format_stats(results["stats"]))
+                if "server" in results:
+                    f.write(format_server(results["server"]))
+                if "profile" in results:
+                    f.write(format_profile(results["profile"]))
+                if "streaming" in results:
+                    f.write(format_streaming(results["streaming"]))
+            if not args.no_history:
+                history.record_results(run_id, "problema1", db.__class__.__name__, results, params)
+            timings_by_db[db.__class__.__name__] = results["timings"]
             print(f"fim. Tempo total: {results['total_time']:.4f}s. Throughput: {throughput:.2f} ops/sec")
         except Exception as e:
             print(f"erro --> {e}")
             traceback.print_exc()
         finally:
+            if profiler:
+                profiler.stop()
             db.close()
+
+    if "CassandraDb" in timings_by_db and "CassandraScanDb" in timings_by_db:
+        with open(out_path, "a") as f:
+            f.write(format_scan_comparison(timings_by_db["CassandraScanDb"], timings_by_db["CassandraDb"],
+                                           timings_by_db.get("CassandraIndexDb")))
+
+    if sampler:
+        sampler.stop()
+        sampler.save(os.path.join(args.results_dir, "resources.jsonl"))
+        print(f"amostras de recursos: {len(sampler.samples)} -> {os.path.join(args.results_dir, 'resources.jsonl')}")
@@ -3,12 +3,6 @@
 RESULTS_DIR="./results"
 mkdir -p "$RESULTS_DIR"
 
-ds() {
-    local seconds=$1
-    sleep "${seconds}s"
-    docker stats --no-stream > "$RESULTS_DIR/STATS_RUNNING_T${seconds}.txt" 2>&1
-}
-
 echo "Iniciando bancos de dados"
 bash ../start_databases.sh
 
@@ -24,8 +18,8 @@ echo "Populando dados"
 python3 populate_tables.py
 
 echo "Executando queries do problema1..."
-python3 queries.py & ds .1 & ds .3
-wait
+# amostragem contínua (CPU, memória, IO e rede por container) em $RESULTS_DIR/resources.jsonl
+python3 queries.py --sample-resources
 
 docker stats --no-stream > "$RESULTS_DIR/STATS_AFTER.txt" 2>&1
 
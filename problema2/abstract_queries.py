@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
-import time
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark.stats import run_trials
 
 class FoodProductData:
     def __init__(self, id: str, nome: str, marca: str, categoria: str, energia: float):
@@ -28,6 +32,14 @@ class AbstractFoodDb(ABC):
     def close(self):
         pass
 
+    @abstractmethod
+    def server_capture(self):
+        """
+        Context manager que captura a visão do servidor durante uma operação: plano, linhas
+        examinadas e tempo dentro do banco (ver benchmark.server_capture). Usado com capture_server=True.
+        """
+        pass
+
     @abstractmethod
     def read_produto(self, produto_id: str) -> Dict[str, Any]:
         """
@@ -112,55 +124,27 @@ class AbstractFoodDb(ABC):
         """
         pass
 
-    def run_all_queries(self, read_id: str, new_product: FoodProductData, batch_ids: list[str], filter_marca: str, filter_score: str, range_min: float, range_max: float, search_term: str):
+    def run_all_queries(self, read_id: str, new_product: FoodProductData, batch_ids: list[str], filter_marca: str, filter_score: str, range_min: float, range_max: float, search_term: str, warmup: int = 0, iterations: int = 1, capture_server: bool = False, profiler=None):
         """
         Método pra rodar todas as queries, coletar resultado e medir tempo.
-        """
-        timings = {}
-        results = {}
-        
-        start = time.perf_counter()
-        results["read_produto"] = self.read_produto(read_id)
-        timings["read_produto"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["create_produto"] = self.create_produto(new_product)
-        timings["create_produto"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["add_new_nutrient_vitamin_c"] = self.add_new_nutrient_vitamin_c(new_product.id, 15.0)
-        timings["add_new_nutrient_vitamin_c"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["get_batch_products"] = self.get_batch_products(batch_ids)
-        timings["get_batch_products"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_by_marca"] = self.find_by_marca(filter_marca)
-        timings["find_by_marca"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_by_energia_range"] = self.find_by_energia_range(range_min, range_max)
-        timings["find_by_energia_range"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["find_products_with_calcium"] = self.find_products_with_calcium()
-        timings["find_products_with_calcium"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["search_by_name"] = self.search_by_name(search_term)
-        timings["search_by_name"] = time.perf_counter() - start
-        
-        start = time.perf_counter()
-        results["aggregate_avg_carbs_by_category"] = self.aggregate_avg_carbs_by_category()
-        timings["aggregate_avg_carbs_by_category"] = time.perf_counter() - start
-
-        start = time.perf_counter()
-        results["delete_produto"] = self.delete_produto(new_product.id)
-        timings["delete_produto"] = time.perf_counter() - start
-
-        return {
-            "results": results,
-            "timings": timings,
-            "total_time": sum(timings.values())
-        }
\ No newline at end of file
+
+        'warmup' rodadas de aquecimento são descartadas e cada operação é medida 'iterations' vezes
+        (ver benchmark.stats.run_trials). Como o produto criado é deletado no fim de cada rodada,
+        o mesmo id pode ser reaproveitado.
+        """
+        def operations(trial):
+            return [
+                ("read_produto", lambda: self.read_produto(read_id)),
+                ("create_produto", lambda: self.create_produto(new_product)),
+                ("add_new_nutrient_vitamin_c", lambda: self.add_new_nutrient_vitamin_c(new_product.id, 15.0)),
+                ("get_batch_products", lambda: self.get_batch_products(batch_ids)),
+                ("find_by_marca", lambda: self.find_by_marca(filter_marca)),
+                ("find_by_energia_range", lambda: self.find_by_energia_range(range_min, range_max)),
+                ("find_products_with_calcium", lambda: self.find_products_with_calcium()),
+                ("search_by_name", lambda: self.search_by_name(search_term)),
+                ("aggregate_avg_carbs_by_category", lambda: self.aggregate_avg_carbs_by_category()),
+                ("delete_produto", lambda: self.delete_produto(new_product.id)),
+            ]
+
+        return run_trials(operations, warmup=warmup, iterations=iterations,
+                          capture=self.server_capture if capture_server else None, profiler=profiler)
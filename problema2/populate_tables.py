@@ -8,12 +8,27 @@ import sys
 import os
 import json
 import argparse
+from functools import partial
 from tqdm import tqdm
 from datetime import datetime
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark import history
+from benchmark.ingest import to_records, to_documents, iter_documents, column_lists, isoformat
+from benchmark.pg_copy import load_rows, LOADERS
+from benchmark.cassandra_writer import CassandraWriter, DEFAULT_WINDOW
+from benchmark.redis_writer import RedisWriter, DEFAULT_MAX_COMMANDS
+from benchmark.mongo_writer import MongoBulkWriter, DEFAULT_CHUNK, DEFAULT_WORKERS
+from benchmark.parallel_load import run_loaders
+from benchmark.ingest_telemetry import TELEMETRY
+from benchmark.source_cache import cached_frames
+
 DATA_DIR = './data'
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
 FILENAME = 'en.openfoodfacts.org.products.tsv' # nome do dataset
+BACKENDS = ['postgres', 'mongo', 'cassandra', 'redis']
+NUTRIENTES = ['energia', 'gordura', 'carboidratos', 'proteinas', 'fibras', 'sodio']
 
 def connect_postgres():
     print("conectando postgres...")
@@ -46,9 +61,10 @@ def clean_float(value):
     except:
         return None
 
-def load_source_data(limit_rows=None):
+def read_source_data(limit_rows=None):
     """
     Função pra carregar todos os CSVs, limpar  e retornar os arquivos prontos.
+    Os nutrientes ficam como float (NaN) aqui, que é o que vai pro cache em Parquet.
     """
     file_path = os.path.join(DATA_DIR, FILENAME)
     print(f"lendo de '{file_path}'")
@@ -87,79 +103,69 @@ def load_source_data(limit_rows=None):
     df = df.dropna(subset=['id']) 
     df['nome'] = df['nome'].fillna('Desconhecido')
     
-    df['categoria'] = df['categoria'].fillna('Outros').astype(str).apply(lambda x: x.split(',')[0].strip())
-    df['marca'] = df['marca'].fillna('Genérico').astype(str).apply(lambda x: x.split(',')[0].strip())
+    # primeiro valor da lista separada por vírgula, com os métodos .str (vetorizados) no lugar do apply
+    df['categoria'] = df['categoria'].fillna('Outros').astype(str).str.split(',', n=1).str[0].str.strip()
+    df['marca'] = df['marca'].fillna('Genérico').astype(str).str.split(',', n=1).str[0].str.strip()
     
     df['data_atualizacao'] = pd.to_datetime(df['data_atualizacao'], errors='coerce').fillna(datetime.now())
 
-    numeric_cols = ['energia', 'gordura', 'carboidratos', 'proteinas', 'fibras', 'sodio']
-    for col in numeric_cols:
+    for col in NUTRIENTES:
         df[col] = pd.to_numeric(df[col], errors='coerce')
 
+    return df
+
+def load_source_data(limit_rows=None, use_cache=True):
+    """
+    O DataFrame limpo do read_source_data, vindo do cache em Parquet quando o TSV, o --limit-rows
+    e o código de limpeza são os mesmos da última leitura. NaN vira None só depois do cache.
+    """
+    (df,) = cached_frames(
+        "problema2", [os.path.join(DATA_DIR, FILENAME)], {"limit_rows": limit_rows},
+        [read_source_data], lambda: (read_source_data(limit_rows),), CACHE_DIR, enabled=use_cache)
+
     df = df.astype(object).where(pd.notnull(df), None)
 
     print(f"dados prontos -> {len(df)} produtos.")
     return df
 
-def load_into_postgres(cursor, df):
+def load_into_postgres(cursor, df, loader="copy"):
     """
     Insiro dados no postgres. Faço load em massa pois banco trabalha com isso
     Muitos campos serão NULL.
     """
     print("\ncarregando dados postgres...")
     
-    pg_data = []
-    for _, row in df.iterrows():
-        pg_data.append((
-            row['id'], row['nome'], row['marca'], row['categoria'],
-            row['energia'], row['gordura'], row['carboidratos'], 
-            row['proteinas'], row['fibras'], row['sodio'], 
-            row['data_atualizacao']
-        ))
-    
-    query = """
-    INSERT INTO produto 
-    (id, nome, marca, categoria, energia, gordura, carboidratos, proteinas, fibras, sodio, data_atualizacao) 
-    VALUES %s ON CONFLICT (id) DO NOTHING
-    """
-    psycopg2.extras.execute_values(cursor, query, pg_data)
-    print(f"postgres-> {len(pg_data)} produtos carregados.")
-    cursor.connection.commit()
+    cols = ['id', 'nome', 'marca', 'categoria'] + NUTRIENTES + ['data_atualizacao']
+    with TELEMETRY.phase("postgres", "produto", "transform", rows=len(df)):
+        rows = to_records(df, cols)
+    load_rows(cursor, "produto", cols, rows, conflict="(id) DO NOTHING", method=loader)
+    with TELEMETRY.phase("postgres", "produto", "commit"):
+        cursor.connection.commit()
 
-def load_into_mongo(db, df):
+def load_into_mongo(db, df, workers=DEFAULT_WORKERS, chunk=DEFAULT_CHUNK):
     """
     insiro dados no mongo. Simples pois tem esquema flexível.
     Apenas não insiro campos nulos.
+    Os documentos são gerados aos poucos e vão em lotes de bulk_write paralelos (MongoBulkWriter).
     """
     print("carregando dados mongo...")
     
-    docs = []
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Mongo Prep"):
-        doc = {
-            "_id": row['id'],
-            "nome": row['nome'],
-            "marca": row['marca'],
-            "categoria": row['categoria'],
-            "data_atualizacao": row['data_atualizacao'],
-            "nutrientes": {}
-        }
-        
-        # Só adiciona nutrientes se eles existirem (não insere null)
-        nutrientes = ['energia', 'gordura', 'carboidratos', 'proteinas', 'fibras', 'sodio']
-        for nutri in nutrientes:
-            if row[nutri] is not None:
-                doc['nutrientes'][nutri] = row[nutri]
-        
-        docs.append(doc)
+    # Só adiciona nutrientes se eles existirem (não insere null)
+    docs = iter_documents(
+        df,
+        {"_id": 'id', "nome": 'nome', "marca": 'marca', "categoria": 'categoria', "data_atualizacao": 'data_atualizacao'},
+        nested={"nutrientes": {n: n for n in NUTRIENTES}},
+    )
 
-    if docs:
-        db["produtos"].delete_many({})
-        db["produtos"].insert_many(docs)
-        print(f"mongo-> {len(docs)} produtos carregados.")
+    db["produtos"].delete_many({})
+    with MongoBulkWriter(db["produtos"], chunk=chunk, workers=workers, label="produtos") as writer:
+        for doc in docs:
+            writer.insert(doc)
 
-def load_into_cassandra(session, df):
+def load_into_cassandra(session, df, window=DEFAULT_WINDOW):
     """
     Insiro dados no cassandra. Uso Map para nutrientes pois fica bem fácil de trabalhar.
+    As escritas são assíncronas, com no máximo 'window' em voo.
     """
     print("carregando dados cassandra...")
     
@@ -168,95 +174,124 @@ def load_into_cassandra(session, df):
         VALUES (?, ?, ?, ?, ?, ?)
     """)
     
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Cassandra Load"):
-        nutri_map = {}
-        nutrientes = ['energia', 'gordura', 'carboidratos', 'proteinas', 'fibras', 'sodio']
-        for nutri in nutrientes:
-            if row[nutri] is not None:
-                nutri_map[nutri] = float(row[nutri])
-        
-        session.execute(insert_stmt, (
-            row['id'], row['nome'], row['marca'], row['categoria'],
-            nutri_map, row['data_atualizacao']
-        ))
+    docs = to_documents(df, {}, nested={"nutrientes": {n: n for n in NUTRIENTES}})
+    rows = zip(to_records(df, ['id', 'nome', 'marca', 'categoria', 'data_atualizacao']), docs)
+    with CassandraWriter(session, window=window, label="produtos") as writer:
+        for (produto_id, nome, marca, categoria, data), doc in tqdm(rows, total=len(docs), desc="Cassandra Load"):
+            nutri_map = {k: float(v) for k, v in doc["nutrientes"].items()}
+            writer.write(insert_stmt, (produto_id, nome, marca, categoria, nutri_map, data))
 
-def load_into_redis(conn, df):
+def load_into_redis(conn, df, connections=1, chunk=DEFAULT_MAX_COMMANDS):
     """
     Insiro dados no redis. Crio índices invertidos (SETS) para marca e categoria.
     Sem isso fica dificil fazer algumas consultas.
+    Os comandos vão em pipelines de 'chunk' comandos (RedisWriter), não num pipeline só pro TSV inteiro.
     """
     print("carregando dados redis...")
     
-    pipe = conn.pipeline()
-    
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Redis Load"):
-        key = f"item:{row['id']}"
+    pipe = RedisWriter(conn, max_commands=chunk, connections=connections, label="produtos")
+
+    ids, nomes, marcas, categorias = column_lists(df, ['id', 'nome', 'marca', 'categoria'])
+    datas = isoformat(df['data_atualizacao'])
+    nutri_docs = to_documents(df, {}, nested={"nutrientes": {n: n for n in NUTRIENTES}})
+    rows = zip(ids, nomes, marcas, categorias, datas, nutri_docs)
+
+    for produto_id, nome, marca, categoria, data, doc in tqdm(rows, total=len(ids), desc="Redis Load"):
         hash_data = {
-            "nome": row['nome'],
-            "marca": row['marca'],
-            "categoria": row['categoria'],
-            "data_atualizacao": row['data_atualizacao'].isoformat()
+            "nome": nome,
+            "marca": marca,
+            "categoria": categoria,
+            "data_atualizacao": data
         }
-        nutrientes = ['energia', 'gordura', 'carboidratos', 'proteinas', 'fibras', 'sodio']
-        for nutri in nutrientes:
-            if row[nutri] is not None:
-                hash_data[nutri] = str(row[nutri])
+        for nutri, valor in doc["nutrientes"].items():
+            hash_data[nutri] = str(valor)
                 
-        pipe.hmset(key, hash_data)
+        pipe.hmset(f"item:{produto_id}", hash_data)
         
-        marca_idx = f"idx:marca:{row['marca'].lower()}"
-        cat_idx = f"idx:categoria:{row['categoria'].lower()}"
+        pipe.sadd(f"idx:marca:{marca.lower()}", produto_id)
+        pipe.sadd(f"idx:categoria:{categoria.lower()}", produto_id)
         
-        pipe.sadd(marca_idx, row['id'])
-        pipe.sadd(cat_idx, row['id'])
-        
-        if row['energia'] is not None:
-            pipe.zadd("idx:energia", {row['id']: row['energia']})
+        energia = doc["nutrientes"].get('energia')
+        if energia is not None:
+            pipe.zadd("idx:energia", {produto_id: energia})
             
-    pipe.execute()
+    pipe.close()
     print("redis-> dados e índices criados.")
 
+def run_postgres(args, df):
+    pg_conn = connect_postgres()
+    try:
+        load_into_postgres(pg_conn.cursor(), df, loader=args.pg_loader)
+    finally:
+        pg_conn.close()
+
+def run_mongo(args, df):
+    mongo_client = connect_mongo()
+    try:
+        load_into_mongo(mongo_client["trabalho_bd"], df, workers=args.mongo_workers, chunk=args.mongo_chunk)
+    finally:
+        mongo_client.close()
+
+def run_cassandra(args, df):
+    cassandra_cluster, cassandra_session = connect_cassandra()
+    try:
+        load_into_cassandra(cassandra_session, df, window=args.cassandra_window)
+    finally:
+        cassandra_cluster.shutdown()
+
+def run_redis(args, df):
+    redis_conn = connect_redis()
+    try:
+        load_into_redis(redis_conn, df, connections=args.redis_connections, chunk=args.redis_chunk)
+    finally:
+        redis_conn.close()
+
+LOAD_FUNCS = {'postgres': run_postgres, 'mongo': run_mongo, 'cassandra': run_cassandra, 'redis': run_redis}
+
 def main(args):
     file_path = os.path.join(DATA_DIR, FILENAME)
     if not os.path.exists(file_path):
         print(f"erro -> Arquivo '{file_path}' não encontrado.")
         raise Exception()
-        
-    pg_conn = None
-    mongo_client = None
-    cassandra_cluster = None
-    redis_conn = None
+
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), limit_rows=args.limit_rows, pg_loader=args.pg_loader, parallel=args.parallel)
 
     try:
-        pg_conn = connect_postgres()
-        mongo_client = connect_mongo()
-        mongo_db = mongo_client["trabalho_bd"]
-        cassandra_cluster, cassandra_session = connect_cassandra()
-        redis_conn = connect_redis()
+        with TELEMETRY.phase("source", FILENAME, "parse") as m:
+            df = load_source_data(limit_rows=args.limit_rows, use_cache=not args.no_cache)
+            m["rows"] = len(df)
         
-        df = load_source_data(limit_rows=args.limit_rows)
-        
-        load_into_postgres(pg_conn.cursor(), df)
-        load_into_mongo(mongo_db, df)
-        load_into_cassandra(cassandra_session, df)
-        load_into_redis(redis_conn, df)
+        # cada banco abre e fecha a própria conexão (em processos separados com --parallel)
+        run_loaders({name: partial(LOAD_FUNCS[name], args, df) for name in BACKENDS if name in args.backends},
+                    parallel=args.parallel)
+
+        print("\ntelemetria da carga:")
+        print(TELEMETRY.summary())
+        if not args.no_history:
+            history.record_ingest(run_id, "problema2", TELEMETRY.records(), params)
         
     except Exception as e:
         print(f"Erro: {e}")
         import traceback
         traceback.print_exc()
-            
-    finally:
-        print("fechando conexoes")
-        if pg_conn: pg_conn.close()
-        if mongo_client: mongo_client.close()
-        if cassandra_cluster: cassandra_cluster.shutdown()
-        if redis_conn: redis_conn.close()
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Carrega dados do Open Food Facts em 4 bancos")
     parser.add_argument("--limit-rows", type=int, help="Limita o número de linhas lidas (só para teste)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS, help="Bancos que serão populados")
+    parser.add_argument("--pg-loader", choices=LOADERS, default="copy", help="Carga do postgres: COPY via staging (copy) ou execute_values (values)")
+    parser.add_argument("--cassandra-window", type=int, default=DEFAULT_WINDOW, help="Máximo de escritas assíncronas em voo no cassandra")
+    parser.add_argument("--redis-chunk", type=int, default=DEFAULT_MAX_COMMANDS, help="Comandos por pipeline do redis")
+    parser.add_argument("--redis-connections", type=int, default=1, help="Pipelines do redis mandados em paralelo (conexões)")
+    parser.add_argument("--mongo-chunk", type=int, default=DEFAULT_CHUNK, help="Documentos por bulk_write no mongo")
+    parser.add_argument("--mongo-workers", type=int, default=DEFAULT_WORKERS, help="Threads mandando lotes pro mongo em paralelo")
+    parser.add_argument("--parallel", action="store_true", help="Carrega os bancos ao mesmo tempo, um processo por banco")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora o cache em Parquet dos dados limpos (data/.cache) e lê o TSV")
+    parser.add_argument("--run-id", default=None, help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}", help="Parâmetros extras da execução (JSON), guardados no histórico junto com a telemetria da carga")
+    parser.add_argument("--no-history", action="store_true", help="Não grava a telemetria da carga no history.sqlite")
     args = parser.parse_args()
     
     main(args)
\ No newline at end of file
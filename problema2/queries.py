@@ -9,8 +9,17 @@ from datetime import datetime
 from typing import List, Dict, Any
 from collections import Counter
 import traceback
+import argparse
 
 from abstract_queries import AbstractFoodDb, FoodProductData
+from benchmark.stats import format_stats
+from benchmark.sampler import ResourceSampler
+from benchmark import history
+from benchmark.profiler import SamplingProfiler, format_profile
+from benchmark.cassandra_scan import scan, scan_filter
+from benchmark.cassandra_index import detect_all, select_eq
+from benchmark.redis_scan import RedisScan
+from benchmark.server_capture import PostgresCapture, MongoCapture, CassandraCapture, RedisCapture, format_server
 
 def _decode_redis_hash(s: Dict[bytes, bytes]) -> Dict[str, Any]:
     return {k.decode('utf-8'): v.decode('utf-8') for k, v in s.items()}
@@ -30,6 +39,9 @@ class PostgresDb(AbstractFoodDb):
             self.conn.close()
             print("postgres desconectado")
 
+    def server_capture(self):
+        return PostgresCapture(self.conn)
+
     def read_produto(self, produto_id: str) -> Dict[str, Any]:
         with self.conn.cursor() as cursor:
             cursor.execute("SELECT * FROM produto WHERE id = %s", (produto_id,))
@@ -108,6 +120,9 @@ class MongoDb(AbstractFoodDb):
             self.client.close()
             print("mongo desconectado")
 
+    def server_capture(self):
+        return MongoCapture(self.db)
+
     def read_produto(self, produto_id: str) -> Dict[str, Any]:
         return self.db.produtos.find_one({"_id": produto_id})
 
@@ -161,6 +176,8 @@ class CassandraDb(AbstractFoodDb):
         try:
             self.conn = Cluster(['localhost'], port=9042)
             self.session = self.conn.connect('trabalho_bd')
+            # índice do servidor (sai/2i/view) criado pelo prepare_tables.py --cassandra-index, se tiver
+            self.indices = detect_all(self.session, "produtos", ["marca"])
             print("cassandra conectado")
         except Exception as e:
             print(f"erro ao conectar ao Cassandra: {e}")
@@ -170,6 +187,9 @@ class CassandraDb(AbstractFoodDb):
             self.conn.shutdown()
             print("cassandra desconectado")
 
+    def server_capture(self):
+        return CassandraCapture(self)
+
     def read_produto(self, produto_id: str) -> Dict[str, Any]:
         row = self.session.execute("SELECT * FROM produtos WHERE produto_id = %s", (produto_id,)).one()
         return {
@@ -205,57 +225,49 @@ class CassandraDb(AbstractFoodDb):
 
     def find_by_marca(self, marca: str) -> List[Dict[str, Any]]:
         # limitaçaõ do cassandra. não tem como fazer filtro direto sem criar um index secundário
-        # então trago os dados e resolvo no python
-        rows = self.session.execute("SELECT * FROM produtos")
-        res = []
-        for r in rows:
-            if r.marca == marca:
-                res.append(r._asdict())
-                if len(res) >= 100: break
-        return res
+        # com índice (--cassandra-index no prepare) vai direto; sem, trago os dados e resolvo no python
+        # (scan em faixas de token paralelas, benchmark/cassandra_scan.py)
+        rows = select_eq(self.session, self.indices["marca"], "produtos", "marca", marca, limit=100)
+        if rows is None:
+            rows = scan_filter(self.session, "produtos", "produto_id", lambda r: r.marca == marca, limit=100)
+        return [r._asdict() for r in rows]
 
     def find_by_energia_range(self, min_val: float, max_val: float) -> List[Dict[str, Any]]:
         # mesma coisa acima
-        rows = self.session.execute("SELECT * FROM produtos")
-        res = []
-        for r in rows:
-            if r.nutrientes and 'energia' in r.nutrientes:
-                if min_val <= r.nutrientes['energia'] <= max_val:
-                    res.append((r._asdict()))
-                    if len(res) >= 100: break
-        return res
+        rows = scan_filter(self.session, "produtos", "produto_id",
+                           lambda r: bool(r.nutrientes) and 'energia' in r.nutrientes and min_val <= r.nutrientes['energia'] <= max_val,
+                           limit=100)
+        return [r._asdict() for r in rows]
 
     def find_products_with_calcium(self) -> List[Dict[str, Any]]:
         # mesma coisa acima
-        rows = self.session.execute("SELECT * FROM produtos")
-        res = []
-        for r in rows:
-            if r.nutrientes and 'calcio' in r.nutrientes:
-                res.append((r._asdict()))
-                if len(res) >= 100: break
-        return res
+        rows = scan_filter(self.session, "produtos", "produto_id", lambda r: bool(r.nutrientes) and 'calcio' in r.nutrientes, limit=100)
+        return [r._asdict() for r in rows]
 
     def search_by_name(self, partial_name: str) -> List[Dict[str, Any]]:
         # mesma coisa acima
-        rows = self.session.execute("SELECT * FROM produtos")
-        res = []
-        for r in rows:
-            if r.nome and partial_name in r.nome:
-                res.append((r._asdict()))
-                if len(res) >= 100: break
-        return res
+        rows = scan_filter(self.session, "produtos", "produto_id", lambda r: bool(r.nome) and partial_name in r.nome, limit=100)
+        return [r._asdict() for r in rows]
 
     def aggregate_avg_carbs_by_category(self) -> List[Dict[str, Any]]:
-        # mesma coisa acima
-        rows = self.session.execute("SELECT categoria, nutrientes FROM produtos")
+        # mesma coisa acima: cada faixa de token soma por categoria e no fim junto as somas
+        # (índice em categoria não ajuda: a média por categoria lê todas as linhas de qualquer jeito)
+        def somar(rows):
+            sums, counts = {}, {}
+            for r in rows:
+                cat = r.categoria
+                if r.nutrientes and 'carboidratos' in r.nutrientes:
+                    val = r.nutrientes['carboidratos']
+                    sums[cat] = sums.get(cat, 0) + val
+                    counts[cat] = counts.get(cat, 0) + 1
+            return sums, counts
+
         sums = {}
         counts = {}
-        for r in rows:
-            cat = r.categoria
-            if r.nutrientes and 'carboidratos' in r.nutrientes:
-                val = r.nutrientes['carboidratos']
+        for parcial_sums, parcial_counts in scan(self.session, "produtos", "produto_id", somar, columns="categoria, nutrientes"):
+            for cat, val in parcial_sums.items():
                 sums[cat] = sums.get(cat, 0) + val
-                counts[cat] = counts.get(cat, 0) + 1
+                counts[cat] = counts.get(cat, 0) + parcial_counts[cat]
         
         return sorted([{"cat": k, "avg": v/counts[k]} for k, v in sums.items()], key=lambda x: x['avg'], reverse=True)[:5]
 
@@ -276,6 +288,9 @@ class RedisDb(AbstractFoodDb):
             self.conn.close()
             print("redis desconectado")
 
+    def server_capture(self):
+        return RedisCapture(self.conn)
+
     def read_produto(self, produto_id: str) -> Dict[str, Any]:
         return _decode_redis_hash(self.conn.hgetall(f"item:{produto_id}"))
 
@@ -323,31 +338,24 @@ class RedisDb(AbstractFoodDb):
 
     def find_products_with_calcium(self) -> List[Dict[str, Any]]:
         # operação complicada pro redis, precisei trazer pro python
-        res = []
-        for key in self.conn.scan_iter("item:*"):
-            if self.conn.hexists(key, "calcio"): # Usando sodio
-                res.append(_decode_redis_hash(self.conn.hgetall(key)))
-                if len(res) >= 100: break
-        return res
+        # SCAN em lotes grandes + HMGET do campo em pipeline (benchmark/redis_scan.py), para nos 100 primeiros
+        scan = RedisScan(self.conn, "item:*", ["calcio"])
+        return scan.filter(lambda f: f["calcio"] is not None, limit=100, full=True)
 
     def search_by_name(self, partial_name: str) -> List[Dict[str, Any]]:
         # mesmo caso acima
-        res = []
-        for key in self.conn.scan_iter("item:*"):
-            nome = self.conn.hget(key, "nome")
-            if nome and partial_name.encode() in nome:
-                res.append(_decode_redis_hash(self.conn.hgetall(key)))
-                if len(res) >= 100: break
-        return res
+        termo = partial_name.encode()
+        scan = RedisScan(self.conn, "item:*", ["nome"])
+        return scan.filter(lambda f: bool(f["nome"]) and termo in f["nome"], limit=100, full=True)
 
     def aggregate_avg_carbs_by_category(self) -> List[Dict[str, Any]]:
         # mesma coisa acima
         sums = {}
         counts = {}
-        for key in self.conn.scan_iter("item:*"):
-            data = self.conn.hmget(key, ["categoria", "carboidratos"])
-            cat = data[0]
-            carb = data[1]
+        scan = RedisScan(self.conn, "item:*", ["categoria", "carboidratos"])
+        for _, data in scan:
+            cat = data["categoria"]
+            carb = data["carboidratos"]
             if cat and carb:
                 c_str = cat.decode('utf-8')
                 try:
@@ -355,30 +363,60 @@ class RedisDb(AbstractFoodDb):
                     sums[c_str] = sums.get(c_str, 0) + val
                     counts[c_str] = counts.get(c_str, 0) + 1
                 except: pass
+        scan.report()
         
         return sorted([{"cat": k, "avg": v/counts[k]} for k, v in sums.items()], key=lambda x: x['avg'], reverse=True)[:5]
 
 
-if __name__ == "__main__":
-    
-    pg = PostgresDb()
-    mongo = MongoDb()
-    cass = CassandraDb()
-    red = RedisDb()
+# nomes curtos usados pelo --backends (e pelo run_benchmark.py na raiz)
+BACKENDS = {
+    "postgres": PostgresDb,
+    "mongo": MongoDb,
+    "cassandra": CassandraDb,
+    "redis": RedisDb,
+}
 
-    if not os.path.exists("./results"): os.makedirs("./results")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa as consultas do problema 2 nos 4 bancos")
+    parser.add_argument("--warmup", type=int, default=0, help="Rodadas de aquecimento descartadas antes da medição")
+    parser.add_argument("--iterations", type=int, default=1, help="Quantas vezes cada operação é medida (percentis/IC por operação)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS), help="Bancos a testar")
+    parser.add_argument("--results-dir", default="./results", help="Pasta onde os resultados são salvos")
+    parser.add_argument("--sample-resources", action="store_true", help="Amostra CPU/memória/IO dos containers e do processo python durante as consultas")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Intervalo (s) entre amostras do --sample-resources")
+    parser.add_argument("--capture-server", action="store_true", help="Rodada extra capturando plano/tracing/slowlog do servidor por operação (campo 'server' nos resultados)")
+    parser.add_argument("--profile", action="store_true", help="Profiler por amostragem: divide o tempo no cliente em io_wait/driver/decode/application e salva profile_<Banco>.folded (flamegraph)")
+    parser.add_argument("--profile-interval", type=float, default=0.001, help="Intervalo (s) entre amostras do --profile")
+    parser.add_argument("--run-id", default=None, help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}", help="Parâmetros extras da execução (JSON), guardados no histórico junto com os tempos")
+    parser.add_argument("--no-history", action="store_true", help="Não grava esta execução no history.sqlite")
+    args = parser.parse_args()
+
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), warmup=args.warmup, iterations=args.iterations)
+    if args.profile:
+        # switch interval do GIL reduzido: o compare do histórico não pode juntar com rodadas sem --profile
+        params.update(profile=True, profile_interval=args.profile_interval)
+
+    if not os.path.exists(args.results_dir): os.makedirs(args.results_dir)
+    out_path = os.path.join(args.results_dir, "OUT.txt")
     
-    with open("./results/OUT.txt", "w") as f:
+    with open(out_path, "w") as f:
         f.write("")
 
-    for db in [pg, mongo, cass, red]:
+    # amostragem contínua de recursos, no mesmo relógio do 'timeline' de cada banco
+    sampler = ResourceSampler(interval=args.sample_interval).start() if args.sample_resources else None
+
+    for db in [BACKENDS[b]() for b in args.backends]:
         
         db.connect()
         name = db.__class__.__name__
         
         print(f"\n--- Testando {name} ---")
         
+        profiler = None  # lido no finally, mesmo se o start() falhar
         try:
+            profiler = SamplingProfiler(interval=args.profile_interval).start() if args.profile else None
             results = db.run_all_queries(
                 read_id="3017620422003",
                 new_product=FoodProductData("9999999991", "Produto Benchmark 2", "MarcaX", "Snacks", 500.0),
@@ -387,20 +425,42 @@ if __name__ == "__main__":
                 filter_score="e",
                 range_min=0,
                 range_max=200,
-                search_term="Choco"
+                search_term="Choco",
+                warmup=args.warmup,
+                iterations=args.iterations,
+                capture_server=args.capture_server,
+                profiler=profiler
             )
+            if profiler:
+                profiler.stop()
+                profiler.save_collapsed(os.path.join(args.results_dir, f"profile_{name}.folded"))
             
-            with open(f"./results/results_{name}.json", "w") as f:
+            with open(os.path.join(args.results_dir, f"results_{name}.json"), "w") as f:
                 json.dump(results, f, indent=4, default=str)
             
             num_operations = 10
             throughput = num_operations / results['total_time']
             
-            with open("./results/OUT.txt", "a") as f:
+            with open(out_path, "a") as f:
                 f.write(f"{name}: {results['total_time']:.4f}s ({throughput:.2f} ops/sec)\n")
+                if "stats" in results:
+                    f.write(format_stats(results["stats"]))
+                if "server" in results:
+                    f.write(format_server(results["server"]))
+                if "profile" in results:
+                    f.write(format_profile(results["profile"]))
+            if not args.no_history:
+                history.record_results(run_id, "problema2", name, results, params)
             print(f"fim. Tempo total: {results['total_time']:.4f}s. Throughput: {throughput:.2f} ops/sec")
         except Exception as e:
             print(f"erro --> {e}")
             traceback.print_exc()
         finally:
-            db.close()
\ No newline at end of file
+            if profiler:
+                profiler.stop()
+            db.close()
+
+    if sampler:
+        sampler.stop()
+        sampler.save(os.path.join(args.results_dir, "resources.jsonl"))
+        print(f"amostras de recursos: {len(sampler.samples)} -> {os.path.join(args.results_dir, 'resources.jsonl')}")
@@ -3,6 +3,11 @@ from typing import List, Dict, Any
 import time
 import uuid
 import datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark.stats import run_trials
 
 class SocialUserData:
     def __init__(self, user_id: str, handle: str, title: str, bio: str):
@@ -27,6 +32,14 @@ class AbstractSocialDb(ABC):
     @abstractmethod
     def close(self): pass
 
+    @abstractmethod
+    def server_capture(self):
+        """
+        Context manager que captura a visão do servidor durante uma operação: plano, linhas
+        examinadas e tempo dentro do banco (ver benchmark.server_capture). Usado com capture_server=True.
+        """
+        pass
+
     # --- Operações Simples ---
 
     @abstractmethod
@@ -83,65 +96,41 @@ class AbstractSocialDb(ABC):
         """10. Adicionar campo 'verified: true' para usuários com > 10.000 seguidores."""
         pass
 
-    def run_all_queries(self, test_user: SocialUserData, target_user_id: str, hashtag_term: str):
+    def run_all_queries(self, test_user: SocialUserData, target_user_id: str, hashtag_term: str, warmup: int = 0, iterations: int = 1, capture_server: bool = False, profiler=None):
         """
         Executa a bateria de testes e mede o tempo.
+
+        'warmup' rodadas de aquecimento são descartadas e cada operação é medida 'iterations' vezes
+        (ver benchmark.stats.run_trials). O post criado na op5 é o que a op4 apaga na mesma rodada.
         """
-        timings = {}
-        results = {}
-        
-        # 1. Create User
-        start = time.perf_counter()
-        self.op1_create_user(test_user)
-        timings["op1_create_user"] = time.perf_counter() - start
-
-        # 2. Read User
-        start = time.perf_counter()
-        results["op2_read_user"] = self.op2_read_user(test_user.user_id)
-        timings["op2_read_user"] = time.perf_counter() - start
-
-        # 3. Update Stats
-        start = time.perf_counter()
-        self.op3_update_user_stats(test_user.user_id)
-        timings["op3_update_user_stats"] = time.perf_counter() - start
-
-        # 5. Create Post (Transaction) 
-        start = time.perf_counter()
-        new_post_id = self.op5_create_post_update_stats(test_user.user_id, f"Post de teste com {hashtag_term}")
-        timings["op5_create_post_update_stats"] = time.perf_counter() - start
-
-        # 4. Delete Activity
-        start = time.perf_counter()
-        self.op4_delete_activity(new_post_id, test_user.user_id)
-        timings["op4_delete_activity"] = time.perf_counter() - start
-
-        # 6. Get Feed (Usando um usuário alvo que já tenha dados carregados)
-        start = time.perf_counter()
-        results["op6_get_feed"] = self.op6_get_feed(target_user_id)
-        timings["op6_get_feed"] = time.perf_counter() - start
-
-        # 7. Get Likes
-        start = time.perf_counter()
-        results["op7_get_user_likes"] = self.op7_get_user_likes(target_user_id)
-        timings["op7_get_user_likes"] = time.perf_counter() - start
-
-        # 8. Search Hashtag
-        start = time.perf_counter()
-        results["op8_search_hashtag"] = self.op8_search_hashtag(hashtag_term)
-        timings["op8_search_hashtag"] = time.perf_counter() - start
-
-        # 9. Aggregate
-        start = time.perf_counter()
-        results["op9_aggregate_type_count"] = self.op9_aggregate_type_count(target_user_id)
-        timings["op9_aggregate_type_count"] = time.perf_counter() - start
-
-        # 10. Schema Evolution
-        start = time.perf_counter()
-        results["op10_modified_docs"] = self.op10_schema_evolution()
-        timings["op10_schema_evolution"] = time.perf_counter() - start
-
-        return {
-            "results": results,
-            "timings": timings,
-            "total_time": sum(timings.values())
-        }
\ No newline at end of file
+        def operations(trial):
+            estado = {}
+
+            def create_post():
+                estado["post_id"] = self.op5_create_post_update_stats(test_user.user_id, f"Post de teste com {hashtag_term}")
+
+            return [
+                # 1. Create User
+                ("op1_create_user", lambda: self.op1_create_user(test_user), None),
+                # 2. Read User
+                ("op2_read_user", lambda: self.op2_read_user(test_user.user_id)),
+                # 3. Update Stats
+                ("op3_update_user_stats", lambda: self.op3_update_user_stats(test_user.user_id), None),
+                # 5. Create Post (Transaction)
+                ("op5_create_post_update_stats", create_post, None),
+                # 4. Delete Activity
+                ("op4_delete_activity", lambda: self.op4_delete_activity(estado["post_id"], test_user.user_id), None),
+                # 6. Get Feed (Usando um usuário alvo que já tenha dados carregados)
+                ("op6_get_feed", lambda: self.op6_get_feed(target_user_id)),
+                # 7. Get Likes
+                ("op7_get_user_likes", lambda: self.op7_get_user_likes(target_user_id)),
+                # 8. Search Hashtag
+                ("op8_search_hashtag", lambda: self.op8_search_hashtag(hashtag_term)),
+                # 9. Aggregate
+                ("op9_aggregate_type_count", lambda: self.op9_aggregate_type_count(target_user_id)),
+                # 10. Schema Evolution
+                ("op10_schema_evolution", lambda: self.op10_schema_evolution(), "op10_modified_docs"),
+            ]
+
+        return run_trials(operations, warmup=warmup, iterations=iterations,
+                          capture=self.server_capture if capture_server else None, profiler=profiler)
@@ -8,13 +8,33 @@ import os
 import json
 import glob
 import time
+import argparse
 import ijson 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark import history
+from benchmark.pg_copy import load_rows, LOADERS
+from benchmark.cassandra_writer import CassandraWriter, DEFAULT_WINDOW
+from benchmark.redis_writer import RedisWriter, DEFAULT_MAX_COMMANDS
+from benchmark.mongo_writer import MongoBulkWriter, DEFAULT_CHUNK, DEFAULT_WORKERS
+from benchmark.checkpoint import Checkpoint
+from benchmark.ingest_telemetry import TELEMETRY
 
 # --- Configurações ---
 DATA_DIR = './data'
 DB_NAME = 'trabalho_bd'
 BATCH_SIZE = 100000  
 MAX_ACTIVITIES_PER_FILE = 1_500_000
+BACKENDS = ['postgres', 'mongo', 'cassandra', 'redis']
+PG_LOADER = 'copy'  # trocado pelo --pg-loader
+CASSANDRA_WINDOW = DEFAULT_WINDOW  # trocado pelo --cassandra-window
+MONGO_CHUNK = DEFAULT_CHUNK  # trocado pelo --mongo-chunk
+MONGO_WORKERS = DEFAULT_WORKERS  # trocado pelo --mongo-workers
+PARALLEL = False  # trocado pelo --parallel
+LOAD_SECONDS = {}  # tempo gasto em cada banco, somando todos os lotes
+CHECKPOINT_FILE = os.path.join(DATA_DIR, '.ingest_checkpoint.json')
 
 # --- Conexões ---
 
@@ -46,16 +66,13 @@ def insert_batch_postgres(conn, users_batch, activities_batch):
         users_batch = [u for u in users_batch if u.get('user_id') is not None]
 
         if users_batch:
-            user_tuples = [
-                (u['user_id'], u['handle'], u['title'], u['bio'], u['created_at'], u['posts_count']) 
-                for u in users_batch
-            ]
-            q_user = """
-            INSERT INTO users (user_id, handle, title, bio, created_at, posts_count) 
-            VALUES %s 
-            ON CONFLICT (user_id) DO NOTHING
-            """
-            psycopg2.extras.execute_values(cursor, q_user, user_tuples)
+            with TELEMETRY.phase("postgres", "users", "transform", rows=len(users_batch)):
+                user_tuples = [
+                    (u['user_id'], u['handle'], u['title'], u['bio'], u['created_at'], u['posts_count']) 
+                    for u in users_batch
+                ]
+            load_rows(cursor, "users", ["user_id", "handle", "title", "bio", "created_at", "posts_count"],
+                      user_tuples, conflict="(user_id) DO NOTHING", method=PG_LOADER)
 
     # Inserir Atividades
     if activities_batch:
@@ -65,68 +82,76 @@ def insert_batch_postgres(conn, users_batch, activities_batch):
         ]
 
         if activities_batch:
-            act_tuples = [
-                (a['activity_id'], a['user_id'], a['ts'], a['type'], a['payload'])
-                for a in activities_batch
-            ]
-            q_act = """
-            INSERT INTO activities (activity_id, user_id, ts, type, payload)
-            VALUES %s ON CONFLICT (activity_id) DO NOTHING
-            """
-            psycopg2.extras.execute_values(cursor, q_act, act_tuples)
+            with TELEMETRY.phase("postgres", "activities", "transform", rows=len(activities_batch)):
+                act_tuples = [
+                    (a['activity_id'], a['user_id'], a['ts'], a['type'], a['payload'])
+                    for a in activities_batch
+                ]
+            load_rows(cursor, "activities", ["activity_id", "user_id", "ts", "type", "payload"],
+                      act_tuples, conflict="(activity_id) DO NOTHING", method=PG_LOADER)
     
-    conn.commit()
+    with TELEMETRY.phase("postgres", "users/activities", "commit"):
+        conn.commit()
 
 def insert_batch_mongo(db, users_batch, activities_batch):
+    # lotes de bulk_write(ordered=False) em paralelo; duplicados são contados em vez de derrubar a carga
+    errors = 0
     if users_batch:
         # Adapta estrutura para MongoDB
-        docs = []
-        # Usuários
-        for u in users_batch:
-            docs.append({
-                "_id": u['user_id'],
-                "handle": u['handle'],
-                "title": u['title'],
-                "profile": { "bio": u['bio'] },
-                "createdAt": u['created_at'],
-                "stats": json.loads(u['stats_json'])
-            })
-        try: db.users.insert_many(docs, ordered=False)
-        except: pass
+        with MongoBulkWriter(db.users, chunk=MONGO_CHUNK, workers=MONGO_WORKERS, label="users") as writer:
+            for u in users_batch:
+                writer.insert({
+                    "_id": u['user_id'],
+                    "handle": u['handle'],
+                    "title": u['title'],
+                    "profile": { "bio": u['bio'] },
+                    "createdAt": u['created_at'],
+                    "stats": json.loads(u['stats_json'])
+                })
+        errors += writer.errors
 
     # Atividades
     if activities_batch:
-        docs = []
-        for a in activities_batch:
-            docs.append({
-                "_id": a['activity_id'],
-                "userId": a['user_id'],
-                "ts": a['ts'],
-                "type": a['type'],
-                "payload": json.loads(a['payload'])
-            })
-        try: db.activities.insert_many(docs, ordered=False)
-        except: pass
+        with MongoBulkWriter(db.activities, chunk=MONGO_CHUNK, workers=MONGO_WORKERS, label="activities") as writer:
+            for a in activities_batch:
+                writer.insert({
+                    "_id": a['activity_id'],
+                    "userId": a['user_id'],
+                    "ts": a['ts'],
+                    "type": a['type'],
+                    "payload": json.loads(a['payload'])
+                })
+        errors += writer.errors
+
+    # duplicado é esperado numa retomada; outro erro não pode avançar o checkpoint
+    if errors:
+        raise RuntimeError(f"mongo: {errors} escritas falharam no lote")
 
 def insert_batch_cassandra(session, prepared_stmts, users_batch, activities_batch):
     stmt_user, stmt_act = prepared_stmts
     
-    # Usuários
-    for u in users_batch:
-        session.execute(stmt_user, (
-            str(u['user_id']), str(u['handle']), str(u['title']), 
-            str(u['bio']), int(u['created_at']) if u['created_at'] else 0, 
-            int(u['posts_count'])
-        ))
+    # escritas assíncronas com janela; o with espera o lote inteiro antes de seguir
+    with CassandraWriter(session, window=CASSANDRA_WINDOW, label="users/activities") as writer:
+        # Usuários
+        for u in users_batch:
+            writer.write(stmt_user, (
+                str(u['user_id']), str(u['handle']), str(u['title']), 
+                str(u['bio']), int(u['created_at']) if u['created_at'] else 0, 
+                int(u['posts_count'])
+            ))
 
-    # Atividades
-    for a in activities_batch:
-        session.execute(stmt_act, (
-            str(a['activity_id']), str(a['user_id']), int(a['ts']), 
-            str(a['type']), str(a['payload'])
-        ))
+        # Atividades
+        for a in activities_batch:
+            writer.write(stmt_act, (
+                str(a['activity_id']), str(a['user_id']), int(a['ts']), 
+                str(a['type']), str(a['payload'])
+            ))
+
+    # lote com escrita perdida (mesmo depois dos retries) não pode avançar o checkpoint
+    if writer.errors:
+        raise RuntimeError(f"cassandra: {writer.errors} escritas falharam no lote")
 
-def insert_batch_redis(pipe, users_batch, activities_batch):
+def insert_batch_redis(pipe, users_batch, activities_batch, replay=False):
     # Usuários
     for u in users_batch:
         key = f"user:{u['user_id']}"
@@ -151,9 +176,51 @@ def insert_batch_redis(pipe, users_batch, activities_batch):
             "payload": str(a['payload'])
         }
         pipe.hset(key, mapping=mapping)
+        if replay:
+            # lote reenviado depois de --resume: o LPUSH não é idempotente, tira o id antes
+            pipe.lrem(f"timeline:{a['user_id']}", 0, a['activity_id'])
         pipe.lpush(f"timeline:{a['user_id']}", a['activity_id'])
     
-    pipe.execute()
+    pipe.flush()
+
+def flush_batch(db_conns, users_batch, activities_batch, replay=False):
+    """
+    Manda o lote para todos os bancos selecionados (os que não foram selecionados ficam como None).
+    'replay' (checkpoint.replaying) marca o lote que pode já ter sido gravado em parte antes da retomada.
+    Com --parallel os bancos recebem o mesmo lote ao mesmo tempo, uma thread por banco
+    (a leitura dos JSON é em streaming, então não dá pra separar em processos sem ler tudo de novo).
+    Devolve o tempo de parede do lote (o process_* desconta isso do tempo de leitura).
+    """
+    start = time.perf_counter()
+    pg_conn, mongo_db, cass_sess, cass_stmts, redis_pipe = db_conns
+
+    tasks = {}
+    if pg_conn is not None:
+        tasks['postgres'] = partial(insert_batch_postgres, pg_conn, users_batch, activities_batch)
+    if mongo_db is not None:
+        tasks['mongo'] = partial(insert_batch_mongo, mongo_db, users_batch, activities_batch)
+    if cass_sess is not None:
+        tasks['cassandra'] = partial(insert_batch_cassandra, cass_sess, cass_stmts, users_batch, activities_batch)
+    if redis_pipe is not None:
+        tasks['redis'] = partial(insert_batch_redis, redis_pipe, users_batch, activities_batch, replay)
+
+    if PARALLEL and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+            futures = [pool.submit(timed_insert, name, fn) for name, fn in tasks.items()]
+            for future in futures:
+                future.result()
+    else:
+        for name, fn in tasks.items():
+            timed_insert(name, fn)
+    return time.perf_counter() - start
+
+def timed_insert(name, fn):
+    """Roda a inserção de um banco e soma o tempo em LOAD_SECONDS."""
+    start = time.perf_counter()
+    try:
+        fn()
+    finally:
+        LOAD_SECONDS[name] = LOAD_SECONDS.get(name, 0.0) + time.perf_counter() - start
 
 def count_posts_first_pass(post_files):
     """
@@ -163,21 +230,25 @@ def count_posts_first_pass(post_files):
     print(">> Contando posts por usuário...")
     user_counts = {}
     
-    for fpath in post_files:
-        print(f"   Lendo {os.path.basename(fpath)}...")
-        with open(fpath, 'rb') as f:
-            # ijson.items lê objeto por objeto sem carregar a lista toda
-            # 'item' significa cada elemento do array raiz
-            for item in ijson.items(f, 'item'):
-                uid = item.get('creatorId')
-                if uid:
-                    user_counts[uid] = user_counts.get(uid, 0) + 1
+    with TELEMETRY.phase("source", "contagem de posts", "parse") as m:
+        for fpath in post_files:
+            print(f"   Lendo {os.path.basename(fpath)}...")
+            with open(fpath, 'rb') as f:
+                # ijson.items lê objeto por objeto sem carregar a lista toda
+                # 'item' significa cada elemento do array raiz
+                for item in ijson.items(f, 'item'):
+                    m["rows"] += 1
+                    uid = item.get('creatorId')
+                    if uid:
+                        user_counts[uid] = user_counts.get(uid, 0) + 1
     return user_counts
 
-def process_users_stream(users_file, user_counts, db_conns):
+def process_users_stream(users_file, user_counts, db_conns, checkpoint):
     """
     Passo 2: Lê arquivo de usuários em stream, prepara lotes e insere.
     Retorna o conjunto de user_ids válidos inseridos.
+    Depois de cada lote grava no checkpoint quantos itens do arquivo já foram consumidos; numa
+    retomada esses itens só entram no conjunto de válidos, sem ir de novo pros bancos.
     """
     print(">> Processando Usuários em Batches...")
     
@@ -185,20 +256,30 @@ def process_users_stream(users_file, user_counts, db_conns):
         print("Arquivo de usuários não encontrado.")
         return set()
 
+    state = checkpoint.stage('users') or {}
+    skip = state.get('offset', 0)
+    if state.get('done'):
+        print("   (já carregados, só relendo os ids)")
+
     batch = []
-    total_processed = 0
+    total_processed = state.get('total_processed', 0)
     valid_user_ids = set()  # <- guardamos todos os users válidos
-    
-    pg_conn, mongo_db, cass_sess, cass_stmts, redis_pipe = db_conns
+    offset = 0
+    start = time.perf_counter()
+    flushed = 0.0  # tempo dentro do flush_batch, descontado da leitura
 
     with open(users_file, 'rb') as f:
-        for item in ijson.items(f, 'item'):
+        for offset, item in enumerate(ijson.items(f, 'item'), start=1):
             uid = item.get('id')
 
             # se não tiver id, pula o registro
             if not uid:
                 continue
 
+            valid_user_ids.add(uid)  # <- marca user como existente
+            if offset <= skip:
+                continue  # já gravado antes da queda
+
             count = user_counts.get(uid, 0)
             
             user_dict = {
@@ -211,49 +292,60 @@ def process_users_stream(users_file, user_counts, db_conns):
                 'stats_json': json.dumps({'followers': 0, 'following': 0, 'posts': count})
             }
             batch.append(user_dict)
-            valid_user_ids.add(uid)  # <- marca user como existente
             
             if len(batch) >= BATCH_SIZE:
-                insert_batch_postgres(pg_conn, batch, [])
-                insert_batch_mongo(mongo_db, batch, [])
-                insert_batch_cassandra(cass_sess, cass_stmts, batch, [])
-                insert_batch_redis(redis_pipe, batch, [])
+                flushed += flush_batch(db_conns, batch, [], checkpoint.replaying)
                 
                 total_processed += len(batch)
+                checkpoint.update('users', file=users_file, offset=offset, total_processed=total_processed)
                 print(f"   Usuários processados: {total_processed}...", end='\r')
                 batch = []
 
     # Processa restante
     if batch:
-        insert_batch_postgres(pg_conn, batch, [])
-        insert_batch_mongo(mongo_db, batch, [])
-        insert_batch_cassandra(cass_sess, cass_stmts, batch, [])
-        insert_batch_redis(redis_pipe, batch, [])
-        print(f"   Usuários finalizados: {total_processed + len(batch)}")
+        flushed += flush_batch(db_conns, batch, [], checkpoint.replaying)
+        total_processed += len(batch)
+    TELEMETRY.record("source", "users", "parse", time.perf_counter() - start - flushed, rows=offset)
+    if not state.get('done'):
+        checkpoint.update('users', file=users_file, offset=offset, total_processed=total_processed, done=True)
+        print(f"   Usuários finalizados: {total_processed}")
 
     return valid_user_ids
 
-def process_activities_stream(files, activity_type, db_conns, valid_user_ids, max_records=None):
+def process_activities_stream(files, activity_type, db_conns, valid_user_ids, checkpoint, max_records=None):
     """
     Passo 3: Lê arquivos de atividades em stream, prepara lotes e insere.
     Só insere activities cujo user_id exista em valid_user_ids.
     Se max_records for informado, para de ler após atingir esse número de registros lidos.
+    O checkpoint guarda (arquivo, itens consumidos no arquivo, contadores) a cada lote gravado.
     """
     print(f">> Processando {activity_type} em Batches...")
+
+    state = checkpoint.stage(activity_type) or {}
+    if state.get('done'):
+        print(f"   {activity_type}s já carregados (checkpoint), pulando")
+        return
     
-    pg_conn, mongo_db, cass_sess, cass_stmts, redis_pipe = db_conns
     batch = []
-    total_processed = 0
-    total_read = 0  # quantos registros foram LIDOS do JSON
+    total_processed = state.get('total_processed', 0)
+    total_read = state.get('total_read', 0)  # quantos registros foram LIDOS do JSON
+    read_before = total_read
+    start = time.perf_counter()
+    flushed = 0.0  # tempo dentro do flush_batch, descontado da leitura
     stop = False    # flag para parar os dois loops (arquivo e item)
 
-    for fpath in files:
+    for file_index, fpath in enumerate(files):
         if stop:
             break
+        if file_index < state.get('file_index', 0):
+            continue  # arquivo inteiro já gravado
+        skip = state.get('offset', 0) if file_index == state.get('file_index', 0) else 0
 
         print(f"   Lendo {os.path.basename(fpath)}...")
         with open(fpath, 'rb') as f:
-            for item in ijson.items(f, 'item'):
+            for offset, item in enumerate(ijson.items(f, 'item'), start=1):
+                if offset <= skip:
+                    continue  # já contado em total_read e gravado antes da queda
                 total_read += 1
 
                 # Se atingiu o limite de registros lidos, para.
@@ -337,26 +429,35 @@ def process_activities_stream(files, activity_type, db_conns, valid_user_ids, ma
                 batch.append(act)
 
                 if len(batch) >= BATCH_SIZE:
-                    insert_batch_postgres(pg_conn, [], batch)
-                    insert_batch_mongo(mongo_db, [], batch)
-                    insert_batch_cassandra(cass_sess, cass_stmts, [], batch)
-                    insert_batch_redis(redis_pipe, [], batch)
+                    flushed += flush_batch(db_conns, [], batch, checkpoint.replaying)
                     
                     total_processed += len(batch)
+                    checkpoint.update(activity_type, file=fpath, file_index=file_index, offset=offset,
+                                      total_read=total_read, total_processed=total_processed)
                     print(f"   {activity_type}s processados: {total_processed} (lidos: {total_read})...", end='\r')
                     batch = []
 
     # Flush final dos registros que ficaram no batch
     if batch:
-        insert_batch_postgres(pg_conn, [], batch)
-        insert_batch_mongo(mongo_db, [], batch)
-        insert_batch_cassandra(cass_sess, cass_stmts, [], batch)
-        insert_batch_redis(redis_pipe, [], batch)
+        flushed += flush_batch(db_conns, [], batch, checkpoint.replaying)
+        total_processed += len(batch)
+    TELEMETRY.record("source", activity_type, "parse", time.perf_counter() - start - flushed, rows=total_read - read_before)
+    checkpoint.update(activity_type, total_read=total_read, total_processed=total_processed, done=True)
 
     print(f"\n   {activity_type}s - total lidos: {total_read}, total inseridos: {total_processed}")
 
-def main():
+def main(args):
+    global PG_LOADER, CASSANDRA_WINDOW, MONGO_CHUNK, MONGO_WORKERS, PARALLEL
+    PG_LOADER = args.pg_loader
+    CASSANDRA_WINDOW = args.cassandra_window
+    MONGO_CHUNK = args.mongo_chunk
+    MONGO_WORKERS = args.mongo_workers
+    PARALLEL = args.parallel
     start_global = time.time()
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), max_activities=args.max_activities, pg_loader=PG_LOADER,
+                  parallel=PARALLEL, resume=args.resume)
+    completed = False
     
     # 1. Identificar arquivos
     users_file = os.path.join(DATA_DIR, 'koo_users.json')
@@ -367,32 +468,50 @@ def main():
 
     # 2. Conectar Bancos
     print("Conectando aos bancos...")
+    pg_conn = mongo_client = mongo_db = None
+    cass_cluster = cass_sess = None
+    redis_conn = redis_pipe = None
+    c_stmt_user = c_stmt_act = None
     try:
-        pg_conn = connect_postgres()
-        mongo_client = connect_mongo()
-        mongo_db = mongo_client[DB_NAME]
+        if 'postgres' in args.backends:
+            pg_conn = connect_postgres()
+        if 'mongo' in args.backends:
+            mongo_client = connect_mongo()
+            mongo_db = mongo_client[DB_NAME]
         
-        cass_cluster, cass_sess = connect_cassandra()
-        # tatements do Cassandra 
-        c_stmt_user = cass_sess.prepare("INSERT INTO users (user_id, handle, title, bio, created_at, posts_count) VALUES (?, ?, ?, ?, ?, ?)")
-        c_stmt_act = cass_sess.prepare("INSERT INTO activities (activity_id, user_id, ts, type, payload) VALUES (?, ?, ?, ?, ?)")
+        if 'cassandra' in args.backends:
+            cass_cluster, cass_sess = connect_cassandra()
+            # tatements do Cassandra 
+            c_stmt_user = cass_sess.prepare("INSERT INTO users (user_id, handle, title, bio, created_at, posts_count) VALUES (?, ?, ?, ?, ?, ?)")
+            c_stmt_act = cass_sess.prepare("INSERT INTO activities (activity_id, user_id, ts, type, payload) VALUES (?, ?, ?, ?, ?)")
         
-        redis_conn = connect_redis()
-        redis_pipe = redis_conn.pipeline()
+        if 'redis' in args.backends:
+            redis_conn = connect_redis()
+            redis_pipe = RedisWriter(redis_conn, max_commands=args.redis_chunk,
+                                     connections=args.redis_connections, label="users/activities")
 
         db_conns = (pg_conn, mongo_db, cass_sess, (c_stmt_user, c_stmt_act), redis_pipe)
+
+        checkpoint = Checkpoint(CHECKPOINT_FILE, {
+            'max_activities': args.max_activities,
+            'files': [users_file] + post_files + like_files + comment_files + share_files,
+        }, args.backends, resume=args.resume)
         
         # Passo 1: Contar posts (rápido, só leitura)
         user_counts = count_posts_first_pass(post_files)
         
         # Passo 2: Processar Usuários (retorna ids válidos)
-        valid_user_ids = process_users_stream(users_file, user_counts, db_conns)
+        valid_user_ids = process_users_stream(users_file, user_counts, db_conns, checkpoint)
         
         # Passo 3: Processar Atividades (apenas para users válidos)
-        if post_files:    process_activities_stream(post_files, 'POST', db_conns, valid_user_ids, MAX_ACTIVITIES_PER_FILE)
-        if like_files:    process_activities_stream(like_files, 'LIKE', db_conns, valid_user_ids, MAX_ACTIVITIES_PER_FILE)
-        if comment_files: process_activities_stream(comment_files, 'COMMENT', db_conns, valid_user_ids, MAX_ACTIVITIES_PER_FILE)
-        if share_files:   process_activities_stream(share_files, 'SHARE', db_conns, valid_user_ids, MAX_ACTIVITIES_PER_FILE)
+        if post_files:    process_activities_stream(post_files, 'POST', db_conns, valid_user_ids, checkpoint, args.max_activities)
+        if like_files:    process_activities_stream(like_files, 'LIKE', db_conns, valid_user_ids, checkpoint, args.max_activities)
+        if comment_files: process_activities_stream(comment_files, 'COMMENT', db_conns, valid_user_ids, checkpoint, args.max_activities)
+        if share_files:   process_activities_stream(share_files, 'SHARE', db_conns, valid_user_ids, checkpoint, args.max_activities)
+
+        # tudo gravado: a próxima carga (depois do prepare_tables) começa do zero
+        checkpoint.clear()
+        completed = True
 
     except Exception as e:
         print(f"\nERRO FATAL: {e}")
@@ -406,10 +525,51 @@ def main():
         except: pass
         try: cass_cluster.shutdown()
         except: pass
+        try: redis_pipe.close()
+        except: pass
         try: redis_conn.close()
         except: pass
         
-        print(f"Tempo Total Global: {time.time() - start_global:.2f}s")
+        for name, secs in LOAD_SECONDS.items():
+            print(f"   {name:<10} {secs:8.2f}s")
+            written = sum(r["rows"] for r in TELEMETRY.records() if r["backend"] == name and r["phase"] == "write")
+            TELEMETRY.record(name, "(todas)", "total", secs, rows=written)
+        print(f"Tempo Total Global: {time.time() - start_global:.2f}s (soma dos bancos: {sum(LOAD_SECONDS.values()):.2f}s)")
+
+        print("\ntelemetria da carga:")
+        print(TELEMETRY.summary())
+        # carga que caiu no meio não entra no histórico (não dá pra comparar com uma completa)
+        if completed and not args.no_history:
+            history.record_ingest(run_id, "problema3", TELEMETRY.records(), params)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Carrega o dataset do Koo nos 4 bancos")
+    parser.add_argument("--max-activities", type=int, default=MAX_ACTIVITIES_PER_FILE,
+                        help="Máximo de registros lidos por tipo de atividade")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS,
+                        help="Bancos que serão populados")
+    parser.add_argument("--pg-loader", choices=LOADERS, default=PG_LOADER,
+                        help="Carga do postgres: COPY via staging (copy) ou execute_values (values)")
+    parser.add_argument("--cassandra-window", type=int, default=CASSANDRA_WINDOW,
+                        help="Máximo de escritas assíncronas em voo no cassandra")
+    parser.add_argument("--redis-chunk", type=int, default=DEFAULT_MAX_COMMANDS,
+                        help="Comandos por pipeline do redis")
+    parser.add_argument("--redis-connections", type=int, default=1,
+                        help="Pipelines do redis mandados em paralelo (conexões)")
+    parser.add_argument("--mongo-chunk", type=int, default=MONGO_CHUNK,
+                        help="Documentos por bulk_write no mongo")
+    parser.add_argument("--mongo-workers", type=int, default=MONGO_WORKERS,
+                        help="Threads mandando lotes pro mongo em paralelo")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Manda cada lote pros bancos ao mesmo tempo (uma thread por banco)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continua do checkpoint (data/.ingest_checkpoint.json) de uma carga interrompida")
+    parser.add_argument("--run-id", default=None,
+                        help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}",
+                        help="Parâmetros extras da execução (JSON), guardados no histórico junto com a telemetria da carga")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Não grava a telemetria da carga no history.sqlite")
+    args = parser.parse_args()
+
+    main(args)
\ No newline at end of file
@@ -3,6 +3,7 @@ import psycopg2.extras
 from pymongo import MongoClient
 from cassandra.cluster import Cluster
 from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent_with_args
 import redis
 import json
 import os
@@ -11,8 +12,17 @@ import uuid
 from typing import List, Dict, Any
 import traceback
 from datetime import datetime
+import argparse
 
 from abstract_queries import AbstractSocialDb, SocialUserData
+from benchmark.stats import format_stats
+from benchmark.sampler import ResourceSampler
+from benchmark import history
+from benchmark.profiler import SamplingProfiler, format_profile
+from benchmark.cassandra_scan import scan_filter
+from benchmark.cassandra_index import detect_all, select_range
+from benchmark.redis_scan import RedisScan
+from benchmark.server_capture import PostgresCapture, MongoCapture, CassandraCapture, RedisCapture, format_server
 
 # Helper para Redis
 def _decode_redis(d):
@@ -26,6 +36,9 @@ class PostgresDb(AbstractSocialDb):
     def close(self):
         if self.conn: self.conn.close()
 
+    def server_capture(self):
+        return PostgresCapture(self.conn)
+
     def op1_create_user(self, data: SocialUserData) -> str:
         with self.conn.cursor() as cursor:
             cursor.execute(
@@ -118,6 +131,9 @@ class MongoDb(AbstractSocialDb):
 
     def close(self): self.client.close()
 
+    def server_capture(self):
+        return MongoCapture(self.db)
+
     def op1_create_user(self, data: SocialUserData) -> str:
         doc = {
             "_id": data.user_id, "handle": data.handle, "title": data.title, 
@@ -186,10 +202,15 @@ class CassandraDb(AbstractSocialDb):
         self.session = self.cluster.connect('trabalho_bd')
         # Aumentar timeout para queries pesadas (scans)
         self.session.default_timeout = 60.0 
+        # índice do servidor em followers (prepare_tables.py --cassandra-index); só o SAI faz faixa
+        self.indices = detect_all(self.session, "users", ["followers"])
         print("Cassandra conectado")
 
     def close(self): self.cluster.shutdown()
 
+    def server_capture(self):
+        return CassandraCapture(self)
+
     def op1_create_user(self, data: SocialUserData) -> str:
         self.session.execute(
             "INSERT INTO users (user_id, handle, title, bio, created_at, posts_count) VALUES (%s, %s, %s, %s, %s, 0)",
@@ -284,16 +305,16 @@ class CassandraDb(AbstractSocialDb):
             pass
         
         # 2. Update com Scan + Update individual (bem lento)
-        count = 0
-        # Seleciona todos os usuarios. Em bases gigantes precisaria de paginação manual com tokens.
-        # Aqui assumi que cabe na memória para simplificar.
-        rows = self.session.execute("SELECT user_id, followers FROM users")
-        
-        for r in rows:
-            if r.followers and r.followers > 10000:
-                self.session.execute("UPDATE users SET verified = true WHERE user_id = %s", (r.user_id,))
-                count += 1
-        return count
+        # Com SAI em followers a faixa sai direto do índice; senão scan em faixas de token paralelas
+        # (benchmark/cassandra_scan.py), sem passar tudo pela memória. Os updates vão juntos com execute_concurrent
+        rows = select_range(self.session, self.indices["followers"], "users", "followers", lo=10000, lo_op=">",
+                            columns="user_id, followers")
+        if rows is None:
+            rows = scan_filter(self.session, "users", "user_id", lambda r: bool(r.followers) and r.followers > 10000,
+                               columns="user_id, followers")
+        stmt = self.session.prepare("UPDATE users SET verified = true WHERE user_id = ?")
+        execute_concurrent_with_args(self.session, stmt, [(r.user_id,) for r in rows], raise_on_first_error=True)
+        return len(rows)
 
 
 class RedisDb(AbstractSocialDb):
@@ -303,6 +324,9 @@ class RedisDb(AbstractSocialDb):
 
     def close(self): self.conn.close()
 
+    def server_capture(self):
+        return RedisCapture(self.conn)
+
     def op1_create_user(self, data: SocialUserData) -> str:
         key = f"user:{data.user_id}"
         mapping = {
@@ -358,21 +382,14 @@ class RedisDb(AbstractSocialDb):
 
     def op8_search_hashtag(self, hashtag: str) -> List[Dict[str, Any]]:
         # IMPLEMENTAÇÃO FORÇADA: SCAN em todas as activities
-        found = []
-        for key in self.conn.scan_iter(match="activity:*"):
-            val = self.conn.hmget(key, ["payload", "type"])
-            payload_raw, type_raw = val[0], val[1]
-            
-            if payload_raw and type_raw:
-                try:
-                    p_str = payload_raw.decode('utf-8')
-                    t_str = type_raw.decode('utf-8')
-                    if t_str in ['POST', 'COMMENT'] and hashtag in p_str:
-                        full_obj = _decode_redis(self.conn.hgetall(key))
-                        found.append(full_obj)
-                        if len(found) >= 20: break
-                except: continue
-        return found
+        # (SCAN em lotes grandes + HMGET em pipeline por lote, benchmark/redis_scan.py; para nos 20 primeiros)
+        termo = hashtag.encode('utf-8')
+
+        def casa(f):
+            return f["type"] in (b'POST', b'COMMENT') and bool(f["payload"]) and termo in f["payload"]
+
+        scan = RedisScan(self.conn, "activity:*", ["payload", "type"])
+        return scan.filter(casa, limit=20, full=True)
 
     def op9_aggregate_type_count(self, user_id: str) -> Dict[str, int]:
         ids = self.conn.lrange(f"timeline:{user_id}", 0, -1)
@@ -386,55 +403,92 @@ class RedisDb(AbstractSocialDb):
 
     def op10_schema_evolution(self) -> int:
         count = 0
-        # Varre todas as chaves que começam com "user:"
-        for key in self.conn.scan_iter(match="user:*"):
-            try:
-                # Tenta ler o campo 'followers' assumindo que a chave é um HASH
-                followers = self.conn.hget(key, "followers")
-                
-                if followers:
-                    if int(followers) > 10000:
-                        self.conn.hset(key, "verified", "true")
+        # Varre todas as chaves que começam com "user:" em lotes; o TYPE hash do SCAN já deixa de fora
+        # as strings user:handle:*, e os updates de cada lote vão num pipeline só
+        scan = RedisScan(self.conn, "user:*", ["followers"])
+        for batch in scan.batches_iter():
+            pipe = self.conn.pipeline(transaction=False)
+            for key, campos in batch:
+                try:
+                    if campos["followers"] and int(campos["followers"]) > 10000:
+                        pipe.hset(key, "verified", "true")
                         count += 1
-                        
-            except redis.exceptions.ResponseError:
-                continue
-            except ValueError:
-                pass
+                except ValueError:
+                    pass
+            pipe.execute()
+        scan.matched = count
+        scan.report()
                 
         return count
 
+# nomes curtos usados pelo --backends (e pelo run_benchmark.py na raiz)
+BACKENDS = {
+    "postgres": PostgresDb,
+    "mongo": MongoDb,
+    "cassandra": CassandraDb,
+    "redis": RedisDb,
+}
+
 if __name__ == "__main__":
-    pg = PostgresDb()
-    mongo = MongoDb()
-    cass = CassandraDb()
-    red = RedisDb()
+    parser = argparse.ArgumentParser(description="Executa as consultas do problema 3 nos 4 bancos")
+    parser.add_argument("--warmup", type=int, default=0, help="Rodadas de aquecimento descartadas antes da medição")
+    parser.add_argument("--iterations", type=int, default=1, help="Quantas vezes cada operação é medida (percentis/IC por operação)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS), help="Bancos a testar")
+    parser.add_argument("--results-dir", default="./results", help="Pasta onde os resultados são salvos")
+    parser.add_argument("--sample-resources", action="store_true", help="Amostra CPU/memória/IO dos containers e do processo python durante as consultas")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Intervalo (s) entre amostras do --sample-resources")
+    parser.add_argument("--capture-server", action="store_true", help="Rodada extra capturando plano/tracing/slowlog do servidor por operação (campo 'server' nos resultados)")
+    parser.add_argument("--profile", action="store_true", help="Profiler por amostragem: divide o tempo no cliente em io_wait/driver/decode/application e salva profile_<Banco>.folded (flamegraph)")
+    parser.add_argument("--profile-interval", type=float, default=0.001, help="Intervalo (s) entre amostras do --profile")
+    parser.add_argument("--run-id", default=None, help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}", help="Parâmetros extras da execução (JSON), guardados no histórico junto com os tempos")
+    parser.add_argument("--no-history", action="store_true", help="Não grava esta execução no history.sqlite")
+    args = parser.parse_args()
+
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), warmup=args.warmup, iterations=args.iterations)
+    if args.profile:
+        # switch interval do GIL reduzido: o compare do histórico não pode juntar com rodadas sem --profile
+        params.update(profile=True, profile_interval=args.profile_interval)
 
     # garante pasta de resultados
-    if not os.path.exists("./results"):
-        os.makedirs("./results")
+    if not os.path.exists(args.results_dir):
+        os.makedirs(args.results_dir)
+    out_path = os.path.join(args.results_dir, "OUT.txt")
 
     # limpa arquivo de saída agregada
-    with open("./results/OUT.txt", "w") as f:
+    with open(out_path, "w") as f:
         f.write("")
 
     test_user = SocialUserData("user_teste_123", "tester", "Testers", "Bio Teste")
     TARGET_USER_ID = "905f0b0a-1e3e-4fd3-823d-2f3fe5eaeefe"
     HASHTAG_TERM = "#Brasil"
 
+    # amostragem contínua de recursos, no mesmo relógio do 'timeline' de cada banco
+    sampler = ResourceSampler(interval=args.sample_interval).start() if args.sample_resources else None
+
     # lista de Dbs a serem testados
-    for db in [pg, mongo, cass, red]:
+    for db in [BACKENDS[b]() for b in args.backends]:
         db.connect()
         name = db.__class__.__name__
 
         print(f"\n--- Testando {name} ---")
 
+        profiler = None  # lido no finally, mesmo se o start() falhar
         try:
+            profiler = SamplingProfiler(interval=args.profile_interval).start() if args.profile else None
             result = db.run_all_queries(
                 test_user=test_user,
                 target_user_id=TARGET_USER_ID,
-                hashtag_term=HASHTAG_TERM
+                hashtag_term=HASHTAG_TERM,
+                warmup=args.warmup,
+                iterations=args.iterations,
+                capture_server=args.capture_server,
+                profiler=profiler
             )
+            if profiler:
+                profiler.stop()
+                profiler.save_collapsed(os.path.join(args.results_dir, f"profile_{name}.folded"))
 
             timings = result.get("timings", {})
             total_time = result.get("total_time", sum(timings.values()))
@@ -443,8 +497,18 @@ if __name__ == "__main__":
             timings_only = dict(timings)
             timings_only["total_time"] = total_time
 
+            # Com várias iterações também guarda os percentis/IC por operação
+            if "stats" in result:
+                timings_only["stats"] = result["stats"]
+            if sampler:
+                timings_only["timeline"] = result["timeline"]
+            if "server" in result:
+                timings_only["server"] = result["server"]
+            if "profile" in result:
+                timings_only["profile"] = result["profile"]
+
             # Salva apenas os tempos por banco em JSON
-            with open(f"./results/timings_{name}.json", "w") as f:
+            with open(os.path.join(args.results_dir, f"timings_{name}.json"), "w") as f:
                 json.dump(timings_only, f, indent=4, default=str)
 
             # Cálculo simples de throughput: 10 operações (op1..op10)
@@ -452,15 +516,30 @@ if __name__ == "__main__":
             throughput = num_operations / total_time if total_time > 0 else 0.0
 
             # Escreve linha resumida no OUT.txt
-            with open("./results/OUT.txt", "a") as f:
+            with open(out_path, "a") as f:
                 f.write(f"{name}: {total_time:.4f}s ({throughput:.2f} ops/sec)\n")
-
+                if "stats" in result:
+                    f.write(format_stats(result["stats"]))
+                if "server" in result:
+                    f.write(format_server(result["server"]))
+                if "profile" in result:
+                    f.write(format_profile(result["profile"]))
+
+            if not args.no_history:
+                history.record_results(run_id, "problema3", name, result, params)
             print(f"fim. Tempo total: {total_time:.4f}s. Throughput: {throughput:.2f} ops/sec")
 
         except Exception as e:
             print(f"erro --> {e}")
             traceback.print_exc()
         finally:
+            if profiler:
+                profiler.stop()
             db.close()
 
-            
\ No newline at end of file
+            
+
+    if sampler:
+        sampler.stop()
+        sampler.save(os.path.join(args.results_dir, "resources.jsonl"))
+        print(f"amostras de recursos: {len(sampler.samples)} -> {os.path.join(args.results_dir, 'resources.jsonl')}")
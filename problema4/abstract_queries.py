@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import time
+import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark.streaming import DEFAULT_BATCH
+
 class SensorData:
     def __init__(self, sensor_id: str, timestamp: datetime, temperature: float, humidity: float):
         self.sensor_id = sensor_id
@@ -17,6 +22,8 @@ class AbstractIoTDb(ABC):
     
     def __init__(self):
         self.conn = None
+        # rows per round trip in the iter_* methods (itersize / batch_size / fetch_size)
+        self.stream_batch = DEFAULT_BATCH
 
     @abstractmethod
     def connect(self):
@@ -61,6 +68,19 @@ class AbstractIoTDb(ABC):
         """
         pass
 
+    def iter_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, Any]]:
+        """
+        Lazy get_readings_by_range: rows are fetched 'stream_batch' at a time (see benchmark/streaming.py).
+        Defaults to an iterator over the list for databases without server-side cursors.
+        """
+        return iter(self.get_readings_by_range(sensor_id, start_time, end_time))
+
+    def iter_all_readings(self, sensor_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lazy get_all_readings, same batching as iter_readings_by_range.
+        """
+        return iter(self.get_all_readings(sensor_id))
+
     def run_all_queries(self, sensor_id: str, start_time: datetime, end_time: datetime):
         """
         Run all queries and measure time.
@@ -93,4 +113,72 @@ class AbstractIoTDb(ABC):
             "results": results,
             "timings": timings,
             "total_time": sum(timings.values())
-        }
\ No newline at end of file
+        }
+
+class AbstractAsyncIoTDb(ABC):
+    """
+    asyncio version of AbstractIoTDb: same queries, but every call is a coroutine so a single
+    process can keep thousands of requests in flight (see async_queries.py).
+    """
+
+    def __init__(self, pool_size: int = 10):
+        self.conn = None
+        self.pool_size = pool_size
+
+    @abstractmethod
+    async def connect(self):
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def insert_reading(self, data: SensorData) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_latest_reading(self, sensor_id: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def get_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def get_all_readings(self, sensor_id: str) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def get_average_temperature(self, sensor_id: str, start_time: datetime, end_time: datetime) -> float:
+        pass
+
+    async def run_all_queries(self, sensor_id: str, start_time: datetime, end_time: datetime):
+        """
+        Run all queries and measure time (same sequence as AbstractIoTDb.run_all_queries).
+        """
+        timings = {}
+        results = {}
+
+        new_data = SensorData(sensor_id, datetime.now(), 25.0, 60.0)
+        start = time.perf_counter()
+        results["insert_reading"] = await self.insert_reading(new_data)
+        timings["insert_reading"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results["get_latest_reading"] = await self.get_latest_reading(sensor_id)
+        timings["get_latest_reading"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results["get_readings_by_range"] = await self.get_readings_by_range(sensor_id, start_time, end_time)
+        timings["get_readings_by_range"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results["get_average_temperature"] = await self.get_average_temperature(sensor_id, start_time, end_time)
+        timings["get_average_temperature"] = time.perf_counter() - start
+
+        return {
+            "results": results,
+            "timings": timings,
+            "total_time": sum(timings.values())
+        }
@@ -4,15 +4,27 @@ import psycopg2
 import psycopg2.extras
 from pymongo import MongoClient
 from cassandra.cluster import Cluster
-from cassandra.query import BatchStatement
 import redis
 import sys
 import os
 import argparse
+import json
+from functools import partial
 from tqdm import tqdm
 from datetime import datetime, timedelta
 import random
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark import history
+from benchmark.pg_copy import load_rows, LOADERS
+from benchmark.cassandra_writer import CassandraWriter, DEFAULT_WINDOW
+from benchmark.redis_writer import RedisWriter, DEFAULT_MAX_COMMANDS
+from benchmark.mongo_writer import MongoBulkWriter, DEFAULT_CHUNK, DEFAULT_WORKERS
+from benchmark.parallel_load import run_loaders
+from benchmark.ingest_telemetry import TELEMETRY
+
+BACKENDS = ['postgres', 'mongo', 'cassandra', 'redis']
+
 def connect_postgres():
     print("conectando postgres...")
     return psycopg2.connect(host="localhost", port="5432", database="trabalho_bd", user="admin", password="admin")
@@ -56,46 +68,29 @@ def generate_data(num_sensors, entries_per_sensor):
     print(f"total de registros gerados: {len(data)}")
     return data
 
-def load_into_postgres(cursor, data):
+def load_into_postgres(cursor, data, loader="copy"):
     print("\ncarregando dados postgres...")
     
-    pg_data = []
-    for row in data:
-        pg_data.append((
-            row['sensor_id'], 
-            row['timestamp'], 
-            row['temperature'], 
-            row['humidity']
-        ))
+    # gerador: no COPY as linhas são formatadas conforme o buffer esvazia, sem montar outra lista
+    pg_data = ((row['sensor_id'], row['timestamp'], row['temperature'], row['humidity']) for row in data)
     
-    query = """
-    INSERT INTO sensors (sensor_id, timestamp, temperature, humidity) 
-    VALUES %s ON CONFLICT DO NOTHING
-    """
-    # batch size de 1000 para não estourar memória do driver
-    batch_size = 1000
-    for i in tqdm(range(0, len(pg_data), batch_size), desc="Postgres Load"):
-        batch = pg_data[i:i+batch_size]
-        psycopg2.extras.execute_values(cursor, query, batch)
+    load_rows(cursor, "sensors", ["sensor_id", "timestamp", "temperature", "humidity"],
+              pg_data, conflict="DO NOTHING", method=loader)
     
-    cursor.connection.commit()
+    with TELEMETRY.phase("postgres", "sensors", "commit"):
+        cursor.connection.commit()
     print("postgres-> dados carregados.")
 
-def load_into_mongo(db, data):
+def load_into_mongo(db, data, workers=DEFAULT_WORKERS, chunk=DEFAULT_CHUNK):
     print("carregando dados mongo...")
     
-    docs = []
-    for row in data:
-        docs.append(row)
-    
-    if docs:
-        batch_size = 5000
-        for i in tqdm(range(0, len(docs), batch_size), desc="Mongo Load"):
-            db["sensors"].insert_many(docs[i:i+batch_size])
+    with MongoBulkWriter(db["sensors"], chunk=chunk, workers=workers, label="sensors") as writer:
+        for row in tqdm(data, desc="Mongo Load"):
+            writer.insert(row)
             
     print("mongo-> dados carregados.")
 
-def load_into_cassandra(session, data):
+def load_into_cassandra(session, data, window=DEFAULT_WINDOW):
     print("Carregando dados no Cassandra...")
 
     insert_stmt = session.prepare("""
@@ -103,44 +98,29 @@ def load_into_cassandra(session, data):
         VALUES (?, ?, ?, ?)
     """)
     
-    batch_size = 500
-    batch = BatchStatement()
-    count = 0
-    
-    for row in tqdm(data, desc="Cassandra Load"):
-        batch.add(insert_stmt, (
-            row['sensor_id'], 
-            row['timestamp'], 
-            row['temperature'], 
-            row['humidity']
-        ))
-        
-        count += 1
-        
-        # Se atingir o tamanho do batch, execute e resete
-        if count >= batch_size:
-            session.execute(batch)
-            batch = BatchStatement()  # Reseta o batch
-            count = 0
-    
-    # Executar o último batch, caso haja dados restantes
-    if count > 0:
-        session.execute(batch)
+    # BatchStatement com vários sensores = várias partições num batch só, o que sobrecarrega o
+    # coordenador; escritas assíncronas por linha (até 'window' em voo) distribuem a carga
+    with CassandraWriter(session, window=window, label="sensors") as writer:
+        for row in tqdm(data, desc="Cassandra Load"):
+            writer.write(insert_stmt, (
+                row['sensor_id'], 
+                row['timestamp'], 
+                row['temperature'], 
+                row['humidity']
+            ))
 
     print("Cassandra -> Dados carregados.")
 
-def load_into_redis(conn, data):
+def load_into_redis(conn, data, connections=1, chunk=DEFAULT_MAX_COMMANDS):
     print("carregando dados redis...")
     
-    pipe = conn.pipeline()
-    count = 0
+    pipe = RedisWriter(conn, max_commands=chunk, connections=connections, label="sensors")
     
     for row in tqdm(data, desc="Redis Load"):
         key = f"sensor:{row['sensor_id']}"
         score = row['timestamp'].timestamp()
         # Armazenamos como JSON string no membro do Sorted Set
         # Formato compacto: "temp,hum" ou json
-        import json
         member = json.dumps({
             "t": row['temperature'],
             "h": row['humidity'],
@@ -151,54 +131,80 @@ def load_into_redis(conn, data):
         
         # Adiciona ao set de sensores para saber quais existem
         pipe.sadd("sensors:all", row['sensor_id'])
-        
-        count += 1
-        if count % 1000 == 0:
-            pipe.execute()
-            pipe = conn.pipeline()
             
-    pipe.execute()
+    pipe.close()
     print("redis-> dados carregados.")
 
+def run_postgres(args, data):
+    pg_conn = connect_postgres()
+    try:
+        load_into_postgres(pg_conn.cursor(), data, loader=args.pg_loader)
+    finally:
+        pg_conn.close()
+
+def run_mongo(args, data):
+    mongo_client = connect_mongo()
+    try:
+        load_into_mongo(mongo_client["trabalho_bd"], data, workers=args.mongo_workers, chunk=args.mongo_chunk)
+    finally:
+        mongo_client.close()
+
+def run_cassandra(args, data):
+    cassandra_cluster, cassandra_session = connect_cassandra()
+    try:
+        load_into_cassandra(cassandra_session, data, window=args.cassandra_window)
+    finally:
+        cassandra_cluster.shutdown()
+
+def run_redis(args, data):
+    redis_conn = connect_redis()
+    try:
+        load_into_redis(redis_conn, data, connections=args.redis_connections, chunk=args.redis_chunk)
+    finally:
+        redis_conn.close()
+
+LOAD_FUNCS = {'postgres': run_postgres, 'mongo': run_mongo, 'cassandra': run_cassandra, 'redis': run_redis}
+
 def main(args):
-    pg_conn = None
-    mongo_client = None
-    cassandra_cluster = None
-    redis_conn = None
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), sensors=args.sensors, entries=args.entries,
+                  pg_loader=args.pg_loader, parallel=args.parallel)
 
     try:
-        # Gerar dados
-        data = generate_data(args.sensors, args.entries)
+        # Gerar dados (aqui a "leitura da origem" é a geração)
+        with TELEMETRY.phase("source", "sensors (gerados)", "parse") as m:
+            data = generate_data(args.sensors, args.entries)
+            m["rows"] = len(data)
         
-        # Conectar e Inserir
-        pg_conn = connect_postgres()
-        load_into_postgres(pg_conn.cursor(), data)
-        
-        mongo_client = connect_mongo()
-        load_into_mongo(mongo_client["trabalho_bd"], data)
-        
-        cassandra_cluster, cassandra_session = connect_cassandra()
-        load_into_cassandra(cassandra_session, data)
-        
-        redis_conn = connect_redis()
-        load_into_redis(redis_conn, data)
+        # Conectar e Inserir (cada banco com a própria conexão; em processos separados com --parallel)
+        run_loaders({name: partial(LOAD_FUNCS[name], args, data) for name in BACKENDS if name in args.backends},
+                    parallel=args.parallel)
+
+        print("\ntelemetria da carga:")
+        print(TELEMETRY.summary())
+        if not args.no_history:
+            history.record_ingest(run_id, "problema4", TELEMETRY.records(), params)
         
     except Exception as e:
         print(f"Erro: {e}")
         import traceback
         traceback.print_exc()
-            
-    finally:
-        print("fechando conexoes")
-        if pg_conn: pg_conn.close()
-        if mongo_client: mongo_client.close()
-        if cassandra_cluster: cassandra_cluster.shutdown()
-        if redis_conn: redis_conn.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Popula dados de IoT")
     parser.add_argument("--sensors", type=int, default=10, help="Número de sensores")
     parser.add_argument("--entries", type=int, default=100, help="Entradas por sensor")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS, help="Bancos que serão populados")
+    parser.add_argument("--pg-loader", choices=LOADERS, default="copy", help="Carga do postgres: COPY via staging (copy) ou execute_values (values)")
+    parser.add_argument("--cassandra-window", type=int, default=DEFAULT_WINDOW, help="Máximo de escritas assíncronas em voo no cassandra")
+    parser.add_argument("--redis-chunk", type=int, default=DEFAULT_MAX_COMMANDS, help="Comandos por pipeline do redis")
+    parser.add_argument("--redis-connections", type=int, default=1, help="Pipelines do redis mandados em paralelo (conexões)")
+    parser.add_argument("--mongo-chunk", type=int, default=DEFAULT_CHUNK, help="Documentos por bulk_write no mongo")
+    parser.add_argument("--mongo-workers", type=int, default=DEFAULT_WORKERS, help="Threads mandando lotes pro mongo em paralelo")
+    parser.add_argument("--parallel", action="store_true", help="Carrega os bancos ao mesmo tempo, um processo por banco")
+    parser.add_argument("--run-id", default=None, help="Id da execução no histórico (padrão: data/hora)")
+    parser.add_argument("--params", default="{}", help="Parâmetros extras da execução (JSON), guardados no histórico junto com a telemetria da carga")
+    parser.add_argument("--no-history", action="store_true", help="Não grava a telemetria da carga no history.sqlite")
     args = parser.parse_args()
     
     main(args)
\ No newline at end of file
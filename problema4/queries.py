@@ -6,15 +6,23 @@ import redis
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import traceback
 import time
 import argparse
 import random
+import sys
+import threading
 import concurrent.futures
 
 from abstract_queries import AbstractIoTDb, SensorData
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark.stats import summarize
+from benchmark.sampler import ResourceSampler
+from benchmark import history
+from benchmark.streaming import pg_stream, cassandra_stream, measure_stream, format_streaming, DEFAULT_BATCH
+
 class PostgresDb(AbstractIoTDb):
     def connect(self):
         try:
@@ -66,6 +74,14 @@ class PostgresDb(AbstractIoTDb):
             )
             return cursor.fetchall()
 
+    def iter_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, Any]]:
+        # named (server-side) cursor: the result stays on the server and arrives stream_batch rows at a time
+        return pg_stream(self.conn, "SELECT * FROM sensors WHERE sensor_id = %s AND timestamp BETWEEN %s AND %s",
+                         (sensor_id, start_time, end_time), self.stream_batch)
+
+    def iter_all_readings(self, sensor_id: str) -> Iterator[Dict[str, Any]]:
+        return pg_stream(self.conn, "SELECT * FROM sensors WHERE sensor_id = %s", (sensor_id,), self.stream_batch)
+
     def get_average_temperature(self, sensor_id: str, start_time: datetime, end_time: datetime) -> float:
         with self.conn.cursor() as cursor:
             cursor.execute(
@@ -114,6 +130,16 @@ class MongoDb(AbstractIoTDb):
     def get_all_readings(self, sensor_id: str) -> List[Dict[str, Any]]:
         return list(self.db.sensors.find({"sensor_id": sensor_id}))
 
+    def iter_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, Any]]:
+        # the cursor is already lazy; batch_size sets how many documents each getMore brings
+        return iter(self.db.sensors.find({
+            "sensor_id": sensor_id,
+            "timestamp": {"$gte": start_time, "$lte": end_time}
+        }).batch_size(self.stream_batch))
+
+    def iter_all_readings(self, sensor_id: str) -> Iterator[Dict[str, Any]]:
+        return iter(self.db.sensors.find({"sensor_id": sensor_id}).batch_size(self.stream_batch))
+
     def get_average_temperature(self, sensor_id: str, start_time: datetime, end_time: datetime) -> float:
         pipeline = [
             {"$match": {
@@ -175,6 +201,16 @@ class CassandraDb(AbstractIoTDb):
         )
         return [r._asdict() for r in rows]
 
+    def iter_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, Any]]:
+        # fetch_size pages, the next one requested before the current one is handed out
+        rows = cassandra_stream(self.session, "SELECT * FROM sensors WHERE sensor_id = %s AND timestamp >= %s AND timestamp <= %s",
+                                (sensor_id, start_time, end_time), self.stream_batch)
+        return (r._asdict() for r in rows)
+
+    def iter_all_readings(self, sensor_id: str) -> Iterator[Dict[str, Any]]:
+        rows = cassandra_stream(self.session, "SELECT * FROM sensors WHERE sensor_id = %s", (sensor_id,), self.stream_batch)
+        return (r._asdict() for r in rows)
+
     def get_average_temperature(self, sensor_id: str, start_time: datetime, end_time: datetime) -> float:
         if not hasattr(self, 'session') or not self.session: return 0.0
         # Cassandra suporta AVG em partition key
@@ -229,6 +265,30 @@ class RedisDb(AbstractIoTDb):
         res = self.conn.zrange(key, 0, -1)
         return [json.loads(r) for r in res]
 
+    def iter_readings_by_range(self, sensor_id: str, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, Any]]:
+        # ZRANGEBYSCORE ... LIMIT offset count, stream_batch members per call
+        key = f"sensor:{sensor_id}"
+        offset = 0
+        while True:
+            res = self.conn.zrangebyscore(key, start_time.timestamp(), end_time.timestamp(), start=offset, num=self.stream_batch)
+            for r in res:
+                yield json.loads(r)
+            if len(res) < self.stream_batch:
+                return
+            offset += self.stream_batch
+
+    def iter_all_readings(self, sensor_id: str) -> Iterator[Dict[str, Any]]:
+        # index windows of stream_batch members instead of the whole sorted set in one reply
+        key = f"sensor:{sensor_id}"
+        offset = 0
+        while True:
+            res = self.conn.zrange(key, offset, offset + self.stream_batch - 1)
+            for r in res:
+                yield json.loads(r)
+            if len(res) < self.stream_batch:
+                return
+            offset += self.stream_batch
+
     def get_average_temperature(self, sensor_id: str, start_time: datetime, end_time: datetime) -> float:
         # Client side aggregation
         readings = self.get_readings_by_range(sensor_id, start_time, end_time)
@@ -236,48 +296,63 @@ class RedisDb(AbstractIoTDb):
         total = sum(r['t'] for r in readings)
         return total / len(readings)
 
-def worker_thread(db_class, sensor_id, operations_list, start_time, end_time):
+def pick_operation():
+    """
+    Draws one operation from the benchmark mix (20% each).
+    """
+    r = random.random()
+    if r < 0.2: return "insert"
+    elif r < 0.4: return "get_latest"
+    elif r < 0.6: return "get_range"
+    elif r < 0.8: return "get_avg"
+    else: return "get_all"
+
+def execute_operation(db, operation, sensor_id, start_time, end_time):
+    """
+    Runs a single operation of the mix against an already connected db.
+    """
+    if operation == "insert":
+        data = SensorData(sensor_id, datetime.now(), random.uniform(20, 30), random.uniform(40, 80))
+        db.insert_reading(data)
+    elif operation == "get_latest":
+        db.get_latest_reading(sensor_id)
+    elif operation == "get_range":
+        db.get_readings_by_range(sensor_id, start_time, end_time)
+    elif operation == "get_avg":
+        db.get_average_temperature(sensor_id, start_time, end_time)
+    elif operation == "get_all":
+        db.get_all_readings(sensor_id)
+
+def worker_thread(db_class, sensor_id, operations_list, start_time, end_time, ready=None):
     """
     Worker thread that maintains a single connection for multiple operations.
+    With 'ready' (a Barrier shared with run_parallel_benchmark) the jitter and the connect happen
+    before the timed window, the same rule as the async mode. Returns when its last op finished.
     """
     # Add jitter to prevent thundering herd on connect
     time.sleep(random.uniform(0.0, 1.0))
     
     db = db_class()
-    db.connect()
+    try:
+        db.connect()
+    finally:
+        if ready is not None:
+            ready.wait()
     try:
         for operation in operations_list:
             try:
-                if operation == "insert":
-                    data = SensorData(sensor_id, datetime.now(), random.uniform(20, 30), random.uniform(40, 80))
-                    db.insert_reading(data)
-                elif operation == "get_latest":
-                    db.get_latest_reading(sensor_id)
-                elif operation == "get_range":
-                    db.get_readings_by_range(sensor_id, start_time, end_time)
-                elif operation == "get_avg":
-                    db.get_average_temperature(sensor_id, start_time, end_time)
-                elif operation == "get_all":
-                    db.get_all_readings(sensor_id)
+                execute_operation(db, operation, sensor_id, start_time, end_time)
             except Exception as e:
                 print(f"Error in op {operation}: {e}")
+        return time.perf_counter()
     finally:
         db.close()
 
 def run_parallel_benchmark(db_class, concurrency, operations, num_sensors):
     print(f"\n--- Benchmarking {db_class.__name__} (Concurrency: {concurrency}, Ops: {operations}) ---")
     
-    start_global = time.perf_counter()
-    
     # Definir mix de operações
-    ops_list = []
-    for _ in range(operations):
-        r = random.random()
-        if r < 0.2: ops_list.append("insert")
-        elif r < 0.4: ops_list.append("get_latest")
-        elif r < 0.6: ops_list.append("get_range")
-        elif r < 0.8: ops_list.append("get_avg")
-        else: ops_list.append("get_all")
+    ops_list = [pick_operation() for _ in range(operations)]
         
     NOW = datetime.now()
     START_TIME = NOW - timedelta(minutes=30)
@@ -291,37 +366,301 @@ def run_parallel_benchmark(db_class, concurrency, operations, num_sensors):
         chunks[-2].extend(chunks[-1])
         chunks.pop()
     
+    # every thread connects first; the clock starts when all of them (and this one) reach the barrier
+    ready = threading.Barrier(len(chunks) + 1)
+
     with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
         futures = []
         for chunk in chunks:
             # Randomize sensor for each worker thread
             sensor_id = f"sensor_{random.randint(0, num_sensors - 1)}"
-            futures.append(executor.submit(worker_thread, db_class, sensor_id, chunk, START_TIME, NOW))
+            futures.append(executor.submit(worker_thread, db_class, sensor_id, chunk, START_TIME, NOW, ready))
         
+        ready.wait()
+        start_global = time.perf_counter()
         concurrent.futures.wait(futures)
         
-    total_time = time.perf_counter() - start_global
+    # last op of the slowest thread; the closes after it stay out of the window, like in async mode
+    end_global = max(f.result() for f in futures)
+    total_time = end_global - start_global
     throughput = operations / total_time
     print(f"Completed in {total_time:.4f}s. Throughput: {throughput:.2f} ops/sec")
-    return throughput
+    return {
+        "concurrency": concurrency,
+        "operations": operations,
+        "total_time": total_time,
+        "throughput": throughput,
+        # perf_counter timestamps, same clock as ResourceSampler samples
+        "start": start_global,
+        "end": end_global
+    }
+
+def run_stream_probe(db_class, num_sensors, batch):
+    """
+    Single connection, list vs iterator for the two large reads: rows, total time, time to
+    first row and client peak memory (benchmark/streaming.py).
+    """
+    print(f"\n--- Streaming {db_class.__name__} (batch: {batch}) ---")
+    NOW = datetime.now()
+    START_TIME = NOW - timedelta(minutes=30)
+    sensor_id = f"sensor_{random.randint(0, num_sensors - 1)}"
+
+    db = db_class()
+    db.connect()
+    db.stream_batch = batch
+    try:
+        probes = {
+            "get_readings_by_range": lambda: db.get_readings_by_range(sensor_id, START_TIME, NOW),
+            "iter_readings_by_range": lambda: db.iter_readings_by_range(sensor_id, START_TIME, NOW),
+            "get_all_readings": lambda: db.get_all_readings(sensor_id),
+            "iter_all_readings": lambda: db.iter_all_readings(sensor_id),
+        }
+        streaming = {name: measure_stream(fn) for name, fn in probes.items()}
+    finally:
+        db.close()
+    print(format_streaming(streaming), end="")
+    return streaming
+
+def arrival_schedule(rate, duration, arrival="poisson"):
+    """
+    Intended send offsets (seconds from start) for an open-loop run at 'rate' ops/s.
+    'poisson' draws exponential inter-arrival times, 'fixed' spaces them evenly.
+    """
+    offsets = []
+    t = 0.0
+    while t < duration:
+        offsets.append(t)
+        t += random.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+    return offsets
+
+def run_open_loop_benchmark(db_class, rate, duration, num_sensors, workers, arrival="poisson"):
+    """
+    Open-loop benchmark: operations are issued on a fixed schedule at 'rate' ops/s, whether or not
+    earlier ones have finished. Latency is measured from the intended send time, so time spent waiting
+    for a free worker (queueing) is counted instead of hidden (coordinated omission).
+    Each worker thread opens its own connection before the schedule starts, so connect time never
+    lands in a measured latency.
+    """
+    print(f"\n--- Open-loop {db_class.__name__} (Rate: {rate} ops/s, Duration: {duration}s, Arrival: {arrival}, Workers: {workers}) ---")
+
+    NOW = datetime.now()
+    START_TIME = NOW - timedelta(minutes=30)
+
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+
+    def get_db():
+        if not hasattr(local, "db"):
+            local.db = db_class()
+            local.db.connect()
+            with connections_lock:
+                connections.append(local.db)
+        return local.db
+
+    def timed_operation(intended, operation, sensor_id):
+        error = False
+        try:
+            execute_operation(get_db(), operation, sensor_id, START_TIME, NOW)
+        except Exception as e:
+            error = True
+            print(f"Error in op {operation}: {e}")
+        done = time.perf_counter()
+        return done - intended, done, error
+
+    schedule = arrival_schedule(rate, duration, arrival)
+    futures = []
+
+    # one warm-up task per worker; the barrier keeps each on its own thread until all of them are connected
+    barrier = threading.Barrier(workers)
+
+    def warm_up():
+        try:
+            get_db()
+        finally:
+            barrier.wait()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for warm in [executor.submit(warm_up) for _ in range(workers)]:
+            warm.result()
+
+        start_global = time.perf_counter()
+        for offset in schedule:
+            intended = start_global + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sensor_id = f"sensor_{random.randint(0, num_sensors - 1)}"
+            futures.append(executor.submit(timed_operation, intended, pick_operation(), sensor_id))
+
+        concurrent.futures.wait(futures)
+
+    for db in connections:
+        db.close()
+
+    outcomes = [f.result() for f in futures]
+    latencies = [lat for lat, _, err in outcomes if not err]
+    errors = sum(1 for _, _, err in outcomes if err)
+    elapsed = max((done for _, done, _ in outcomes), default=start_global) - start_global
+
+    point = {
+        "offered_rate": rate,
+        "achieved_rate": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "operations": len(schedule),
+        "errors": errors,
+        "latency": summarize(latencies),
+        # perf_counter timestamps, same clock as ResourceSampler samples
+        "start": start_global,
+        "end": start_global + elapsed,
+        # raw latencies, kept for the run history significance test (not written to the curve JSON)
+        "samples": latencies,
+    }
+    lat = point["latency"]
+    if lat["n"]:
+        print(f"Achieved {point['achieved_rate']:.2f} ops/sec | p50 {lat['p50'] * 1000:.2f}ms "
+              f"p95 {lat['p95'] * 1000:.2f}ms p99 {lat['p99'] * 1000:.2f}ms | errors: {errors}")
+    return point
+
+# short names used by --backends (and by run_benchmark.py at the repo root)
+BACKENDS = {
+    "postgres": PostgresDb,
+    "mongo": MongoDb,
+    "cassandra": CassandraDb,
+    "redis": RedisDb,
+}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Benchmark IoT Queries")
     parser.add_argument("--concurrency", type=int, default=1, help="Number of parallel threads")
     parser.add_argument("--operations", type=int, default=100, help="Total number of operations to perform")
     parser.add_argument("--sensors", type=int, default=10, help="Number of sensors available")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS), help="Databases to benchmark")
+    parser.add_argument("--results-dir", default=None, help="If set, also writes results_<Db>.json into this folder")
+    parser.add_argument("--mode", choices=["closed", "open", "async"], default="closed",
+                        help="closed: each thread waits for its previous op; open: ops are scheduled at fixed target rates; "
+                             "async: closed loop with --concurrency coroutines on asyncio drivers in a single thread")
+    parser.add_argument("--rates", type=float, nargs="+", default=[50, 100, 200, 400],
+                        help="Open-loop target rates (ops/sec) swept to build the latency-vs-load curve")
+    parser.add_argument("--duration", type=float, default=10.0, help="Open-loop seconds per rate")
+    parser.add_argument("--arrival", choices=["poisson", "fixed"], default="poisson", help="Open-loop inter-arrival distribution")
+    parser.add_argument("--workers", type=int, default=64, help="Open-loop worker threads (connections) per database")
+    parser.add_argument("--pool-size", type=int, default=None, help="Async mode: connections in each client pool (default: min(concurrency, 100))")
+    parser.add_argument("--sample-resources", action="store_true", help="Sample CPU/memory/IO of the containers and of this process while benchmarking")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between --sample-resources samples")
+    parser.add_argument("--run-id", default=None, help="Run id in the history store (default: date/time)")
+    parser.add_argument("--params", default="{}", help="Extra run parameters (JSON) stored in the history next to the timings")
+    parser.add_argument("--no-history", action="store_true", help="Do not append this run to history.sqlite")
+    parser.add_argument("--stream-metrics", action="store_true",
+                        help="Closed mode: after the workload, compare list and iterator reads (rows, time to first row, peak memory)")
+    parser.add_argument("--stream-batch", type=int, default=DEFAULT_BATCH,
+                        help="Rows per round trip in the iterator reads (itersize / batch_size / fetch_size)")
     args = parser.parse_args()
 
+    run_id = args.run_id or history.new_run_id()
+    params = dict(json.loads(args.params), concurrency=args.concurrency, sensors=args.sensors)
+
+    if args.results_dir:
+        os.makedirs(args.results_dir, exist_ok=True)
+
+    # continuous resource sampling, on the same clock as the start/end of each benchmark
+    sampler = ResourceSampler(interval=args.sample_interval).start() if args.sample_resources else None
+
+    def save_samples():
+        if not sampler:
+            return
+        sampler.stop()
+        samples_dir = args.results_dir or "./results"
+        os.makedirs(samples_dir, exist_ok=True)
+        sampler.save(os.path.join(samples_dir, f"resources_C{args.concurrency}.jsonl"))
+        print(f"Resource samples: {len(sampler.samples)} -> {samples_dir}")
+
+    if args.mode == "open":
+        curves = {}
+        for db_cls in [BACKENDS[b] for b in args.backends]:
+            try:
+                curves[db_cls.__name__] = [
+                    run_open_loop_benchmark(db_cls, rate, args.duration, args.sensors, args.workers, args.arrival)
+                    for rate in args.rates
+                ]
+                if not args.no_history:
+                    for point in curves[db_cls.__name__]:
+                        point_params = dict(params, mode="open", rate=point["offered_rate"], arrival=args.arrival,
+                                            duration=args.duration, workers=args.workers)
+                        history.record(run_id, "problema4", db_cls.__name__, "open_loop", point_params,
+                                       point["latency"].get("p50"), point["latency"], point["samples"])
+                if args.results_dir:
+                    with open(os.path.join(args.results_dir, f"latency_curve_{db_cls.__name__}.json"), "w") as f:
+                        json.dump([{k: v for k, v in p.items() if k != "samples"} for p in curves[db_cls.__name__]], f, indent=4)
+            except Exception as e:
+                print(f"Failed to benchmark {db_cls.__name__}: {e}")
+                traceback.print_exc()
+
+        print("\n--- Latency vs Offered Load ---")
+        for name, curve in curves.items():
+            print(name)
+            for point in curve:
+                lat = point["latency"]
+                if not lat["n"]:
+                    continue
+                print(f"  offered {point['offered_rate']:>8.1f} | achieved {point['achieved_rate']:>8.1f} ops/sec | "
+                      f"p50 {lat['p50'] * 1000:8.2f}ms p95 {lat['p95'] * 1000:8.2f}ms p99 {lat['p99'] * 1000:8.2f}ms | errors {point['errors']}")
+        save_samples()
+        sys.exit(0)
+
     results = {}
-    
-    for db_cls in [PostgresDb, MongoDb, CassandraDb, RedisDb]:
+
+    if args.mode == "async":
+        # imported only here so the thread-based modes keep working without asyncpg installed
+        from async_queries import ASYNC_BACKENDS, run_async_benchmark
+        db_classes = [ASYNC_BACKENDS[b] for b in args.backends]
+    else:
+        db_classes = [BACKENDS[b] for b in args.backends]
+
+    for db_cls in db_classes:
         try:
-            t = run_parallel_benchmark(db_cls, args.concurrency, args.operations, args.sensors)
-            results[db_cls.__name__] = t
+            if args.mode == "async":
+                ops_list = [pick_operation() for _ in range(args.operations)]
+                res = run_async_benchmark(db_cls, args.concurrency, ops_list, args.sensors, args.pool_size)
+            else:
+                res = run_parallel_benchmark(db_cls, args.concurrency, args.operations, args.sensors)
+            streaming = None
+            if args.stream_metrics:
+                if args.mode == "async":
+                    print("--stream-metrics only runs in closed mode, skipping")
+                else:
+                    streaming = run_stream_probe(db_cls, args.sensors, args.stream_batch)
+            results[db_cls.__name__] = res["throughput"]
+            if not args.no_history:
+                run_params = dict(params, mode=args.mode, operations=args.operations, pool_size=res.get("pool_size"))
+                history.record(run_id, "problema4", db_cls.__name__, "mixed_workload", run_params, res["total_time"])
+                if streaming:
+                    history.record_streaming(run_id, "problema4", db_cls.__name__, streaming,
+                                             dict(run_params, stream_batch=args.stream_batch))
+                if "latency" in res:
+                    history.record(run_id, "problema4", db_cls.__name__, "op_latency", run_params,
+                                   res["latency"].get("p50"), res["latency"], res["samples"])
+
+            if args.results_dir:
+                # same layout as the other problems: one "timings" entry for the whole op mix
+                with open(os.path.join(args.results_dir, f"results_{db_cls.__name__}.json"), "w") as f:
+                    json.dump({
+                        "timings": {"mixed_workload": res["total_time"]},
+                        "total_time": res["total_time"],
+                        "throughput": res["throughput"],
+                        "concurrency": res["concurrency"],
+                        "operations": res["operations"],
+                        "start": res["start"],
+                        "end": res["end"],
+                        "executor": "asyncio" if args.mode == "async" else "threads",
+                        **({"latency": res["latency"], "pool_size": res["pool_size"], "errors": res["errors"]} if "latency" in res else {}),
+                        **({"streaming": streaming} if streaming else {})
+                    }, f, indent=4)
         except Exception as e:
             print(f"Failed to benchmark {db_cls.__name__}: {e}")
             traceback.print_exc()
 
     print("\n--- Final Results (Ops/Sec) ---")
     for k, v in results.items():
-        print(f"{k}: {v:.2f}")
\ No newline at end of file
+        print(f"{k}: {v:.2f}")
+
+    save_samples()
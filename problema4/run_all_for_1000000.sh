@@ -16,16 +16,6 @@ else
     exit 1
 fi
 
-# funcao para esperar por x segundos e invocar docker stats
-# ou seja, coleta metricas durante o uso
-# argumentos : segundos, concorrencia
-function ws() {
-    local seconds=$1
-    local concurrency=$2
-    sleep "${seconds}s"
-    docker stats --no-stream > "./results/STATS_RUNNING_E${registros}_C${concurrency}_T${seconds}.txt" 2>&1
-}
-
 # rodar
 echo "rodando tudo para ${registros} registros"
 
@@ -44,14 +34,15 @@ echo "inserindo ${registros} registros"
 python populate_tables.py --sensors ${sensores} --entries ${entradas}
 
 echo "executando consultas"
+# metricas dos containers sao amostradas continuamente pelo proprio queries.py (resources_C*.jsonl)
 
 echo "concurrency 1"
-python queries.py --concurrency 1 --operations ${operacoes} --sensors ${sensores} > ./results/OUT_E${registros}_C1.txt & ws 5 1 & ws 10 1 & ws 15 1
+python queries.py --concurrency 1 --operations ${operacoes} --sensors ${sensores} --sample-resources --results-dir ./results/E${registros}_C1 > ./results/OUT_E${registros}_C1.txt
 
 echo "concurrency 4"
-python queries.py --concurrency 4 --operations ${operacoes} --sensors ${sensores} > ./results/OUT_E${registros}_C4.txt & ws 5 4 & ws 10 4 & ws 15 4
+python queries.py --concurrency 4 --operations ${operacoes} --sensors ${sensores} --sample-resources --results-dir ./results/E${registros}_C4 > ./results/OUT_E${registros}_C4.txt
 
 echo "concurrency 8"
-python queries.py --concurrency 8 --operations ${operacoes} --sensors ${sensores} > ./results/OUT_E${registros}_C8.txt & ws 5 8 & ws 10 8 & ws 15 8
+python queries.py --concurrency 8 --operations ${operacoes} --sensors ${sensores} --sample-resources --results-dir ./results/E${registros}_C8 > ./results/OUT_E${registros}_C8.txt
 
 docker stats --no-stream > "./results/STATS_AFTER_E${registros}.txt" 2>&1
\ No newline at end of file
@@ -0,0 +1,381 @@
+"""
+CLI única do benchmark.
+
+Descobre os problemas (pastas problemaN com queries.py) e os bancos de cada um, e roda
+prepare_tables -> populate_tables -> queries para cada combinação da matriz:
+tamanho do dataset x índice x concorrência x subconjunto de bancos.
+
+Cada passo roda como subprocesso dentro da pasta do problema (do mesmo jeito que os
+scripts .sh faziam), então caminhos relativos como './data' continuam funcionando.
+
+Exemplo (grade completa do problema 4, que antes precisava de 4 scripts):
+    python3 run_benchmark.py run --problems 4 --sizes 1000 10000 100000 1000000 --concurrency 1 4 8
+
+Layout da saída (--output, padrão ./runs):
+    runs/<run_id>/manifest.json          parâmetros da matriz e status de cada passo
+    runs/<run_id>/results.jsonl          uma linha por (problema, banco, célula, operação)
+    runs/<run_id>/<problema>/<célula>/   logs dos passos e os JSON gerados pelo queries.py
+
+Os tempos também vão pro history.sqlite (benchmark/history.py) com o mesmo run_id;
+'history' lista as execuções e 'compare <baseline> <nova>' aponta regressões significativas.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmark import history
+from benchmark.index_profiles import PROFILES, DEFAULT_PROFILE
+from benchmark.cassandra_index import MODES as CASSANDRA_INDEX_MODES
+from benchmark.streaming import DEFAULT_BATCH
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover_problems(root=ROOT):
+    """
+    Procura as pastas problemaN e lê (via AST, sem importar os drivers) o queries.py de cada uma:
+    a interface abstrata implementada e o dicionário BACKENDS com os nomes curtos dos bancos.
+    """
+    problems = {}
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        queries_file = os.path.join(path, "queries.py")
+        if not name.startswith("problema") or not os.path.isfile(queries_file):
+            continue
+
+        with open(queries_file) as f:
+            tree = ast.parse(f.read())
+
+        interface = None
+        backends = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                bases = [b.id for b in node.bases if isinstance(b, ast.Name)]
+                for base in bases:
+                    if base.startswith("Abstract"):
+                        interface = base
+            elif isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "BACKENDS" for t in node.targets):
+                if isinstance(node.value, ast.Dict):
+                    for k, v in zip(node.value.keys, node.value.values):
+                        if isinstance(k, ast.Constant) and isinstance(v, ast.Name):
+                            backends[k.value] = v.id
+
+        problems[name] = {
+            "path": path,
+            "interface": interface,
+            "backends": backends,
+        }
+    return problems
+
+
+def _iot_shape(size):
+    """Mesma divisão sensores x entradas usada nos run_all_for_*.sh do problema 4."""
+    entries = 100 if size <= 10000 else 1000
+    return max(1, size // entries), entries
+
+
+def cell_params(size, profile, cassandra_index=None):
+    """Parâmetros da célula gravados no histórico (o modo do cassandra só quando foi pedido)."""
+    params = {"size": size, "index_profile": profile}
+    if cassandra_index is not None:
+        params["cassandra_index"] = cassandra_index
+    return params
+
+
+def populate_args(problem, size, backends, pg_loader="copy", parallel=False, run_id=None, profile=None, cassandra_index=None):
+    # variantes de consulta do mesmo banco ("cassandra-scan") usam a carga do banco base
+    loaded = list(dict.fromkeys(b.split("-")[0] for b in backends))
+    args = ["--backends", *loaded, "--pg-loader", pg_loader] + (["--parallel"] if parallel else [])
+    if run_id is not None:
+        # telemetria da carga vai pro histórico com o mesmo run_id e parâmetros da célula das queries
+        args += ["--run-id", run_id, "--params", json.dumps(cell_params(size, profile, cassandra_index))]
+    if size is None:
+        return args
+    if problem in ("problema1", "problema2"):
+        return args + ["--limit-rows", str(size)]
+    if problem == "problema3":
+        return args + ["--max-activities", str(size)]
+    if problem == "problema4":
+        sensors, entries = _iot_shape(size)
+        return args + ["--sensors", str(sensors), "--entries", str(entries)]
+    return args
+
+
+def queries_args(problem, size, concurrency, backends, results_dir, opts, run_id, profile):
+    # run_id e parâmetros da célula vão pro histórico (benchmark/history.py) junto com os tempos
+    params = json.dumps(cell_params(size, profile, opts.cassandra_index))
+    args = ["--backends", *backends, "--results-dir", results_dir, "--run-id", run_id, "--params", params]
+    if opts.sample_resources:
+        args += ["--sample-resources", "--sample-interval", str(opts.sample_interval)]
+    if opts.stream_metrics and problem in ("problema1", "problema4"):
+        # só esses dois têm iter_*
+        args += ["--stream-metrics", "--stream-batch", str(opts.stream_batch)]
+    if problem == "problema4":
+        sensors, _ = _iot_shape(size) if size else (10, 100)
+        operations = opts.operations or (1000 if not size or size <= 10000 else 10000)
+        if opts.iot_mode != "closed":
+            args += ["--mode", opts.iot_mode]
+        return args + ["--concurrency", str(concurrency), "--operations", str(operations), "--sensors", str(sensors)]
+    if opts.capture_server:
+        args.append("--capture-server")
+    if opts.profile:
+        args.append("--profile")
+    return args + ["--warmup", str(opts.warmup), "--iterations", str(opts.iterations)]
+
+
+def run_step(script, args, cwd, log_path):
+    """Roda um script do problema e salva stdout/stderr no log. Devolve (ok, segundos)."""
+    cmd = [sys.executable, script, *args]
+    print(f"   $ {' '.join(cmd)}")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        print(f"   erro --> {script} saiu com código {proc.returncode} (ver {log_path})")
+    return proc.returncode == 0, elapsed
+
+
+def collect_rows(cell_dir, base):
+    """
+    Lê os JSON gerados pelo queries.py de uma célula (results_<Db>.json nos problemas 1, 2 e 4,
+    timings_<Db>.json no 3) e devolve uma linha por operação.
+    """
+    rows = []
+    for fname in sorted(os.listdir(cell_dir)):
+        if not fname.endswith(".json"):
+            continue
+        if fname.startswith("results_"):
+            backend = fname[len("results_"):-len(".json")]
+        elif fname.startswith("timings_"):
+            backend = fname[len("timings_"):-len(".json")]
+        else:
+            continue
+
+        with open(os.path.join(cell_dir, fname)) as f:
+            data = json.load(f)
+
+        timings = data.get("timings")
+        if timings is None:
+            # formato do problema 3: tempos direto na raiz
+            timings = {k: v for k, v in data.items() if isinstance(v, (int, float)) and k != "total_time"}
+        stats = data.get("stats", {})
+
+        for op, seconds in timings.items():
+            row = dict(base, backend=backend, operation=op, seconds=seconds)
+            if op in stats:
+                row["stats"] = stats[op]
+            if "throughput" in data:
+                row["throughput"] = data["throughput"]
+            rows.append(row)
+    return rows
+
+
+def cmd_run(opts):
+    problems = discover_problems()
+    selected = [f"problema{p}" for p in opts.problems] if opts.problems else list(problems)
+
+    run_id = opts.run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.abspath(os.path.join(opts.output, run_id))
+    os.makedirs(run_dir, exist_ok=True)
+
+    manifest = {
+        "run_id": run_id,
+        "started_at": datetime.now().isoformat(),
+        "matrix": {
+            "problems": selected,
+            "sizes": opts.sizes,
+            "concurrency": opts.concurrency,
+            "backends": opts.backends,
+            "index_profiles": opts.index_profiles,
+            "cassandra_index": opts.cassandra_index,
+            "warmup": opts.warmup,
+            "iterations": opts.iterations,
+            "sample_resources": opts.sample_resources,
+            "capture_server": opts.capture_server,
+            "iot_mode": opts.iot_mode,
+            "pg_loader": opts.pg_loader,
+            "parallel_load": opts.parallel_load,
+            "profile": opts.profile,
+        },
+        "steps": [],
+    }
+
+    if opts.start_databases:
+        print("iniciando bancos de dados")
+        subprocess.run(["bash", os.path.join(ROOT, "start_databases.sh")], check=False)
+        print(f"aguardando {opts.startup_wait}s para os bancos iniciarem (cassandra demora)")
+        time.sleep(opts.startup_wait)
+
+    results_path = os.path.join(run_dir, "results.jsonl")
+    for problem in selected:
+        if problem not in problems:
+            print(f"erro --> {problem} não encontrado")
+            continue
+        info = problems[problem]
+        backends = [b for b in (opts.backends or info["backends"]) if b in info["backends"]]
+        if not backends:
+            print(f"{problem}: nenhum dos bancos pedidos existe aqui, pulando")
+            continue
+
+        # só o problema 4 tem execução concorrente; nos outros a concorrência é sempre 1
+        concurrency_axis = opts.concurrency if problem == "problema4" else [1]
+
+        for size in opts.sizes or [None]:
+            for profile in opts.index_profiles:
+                cell_base = f"E{size if size else 'full'}_I{profile}"
+                setup_dir = os.path.join(run_dir, problem, cell_base)
+                os.makedirs(setup_dir, exist_ok=True)
+                print(f"\n--- {problem} ({info['interface']}) | tamanho={size} | índice={profile} | bancos={backends} ---")
+
+                if not opts.skip_load:
+                    prepare_extra = ["--index-profile", profile]
+                    if opts.cassandra_index is not None:
+                        prepare_extra += ["--cassandra-index", opts.cassandra_index]
+                    ok, secs = run_step("prepare_tables.py", prepare_extra, info["path"], os.path.join(setup_dir, "prepare.log"))
+                    manifest["steps"].append({"problem": problem, "cell": cell_base, "step": "prepare", "ok": ok, "seconds": secs})
+                    if not ok:
+                        continue
+
+                    ok, secs = run_step("populate_tables.py", populate_args(problem, size, backends, opts.pg_loader, opts.parallel_load, run_id, profile, opts.cassandra_index), info["path"], os.path.join(setup_dir, "populate.log"))
+                    manifest["steps"].append({"problem": problem, "cell": cell_base, "step": "populate", "ok": ok, "seconds": secs})
+                    if not ok:
+                        continue
+
+                for concurrency in concurrency_axis:
+                    cell_dir = os.path.join(setup_dir, f"C{concurrency}")
+                    os.makedirs(cell_dir, exist_ok=True)
+                    ok, secs = run_step(
+                        "queries.py",
+                        queries_args(problem, size, concurrency, backends, cell_dir, opts, run_id, profile),
+                        info["path"],
+                        os.path.join(cell_dir, "queries.log"),
+                    )
+                    manifest["steps"].append({"problem": problem, "cell": f"{cell_base}_C{concurrency}", "step": "queries", "ok": ok, "seconds": secs})
+
+                    base = {
+                        "run_id": run_id,
+                        "problem": problem,
+                        "size": size,
+                        "concurrency": concurrency,
+                        "index_profile": profile,
+                        "cassandra_index": opts.cassandra_index,
+                    }
+                    rows = collect_rows(cell_dir, base)
+                    with open(results_path, "a") as f:
+                        for row in rows:
+                            f.write(json.dumps(row, default=str) + "\n")
+
+                # salva o manifesto a cada célula pra não perder tudo se a noite cair no meio
+                with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+                    json.dump(manifest, f, indent=4)
+
+    manifest["finished_at"] = datetime.now().isoformat()
+    with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+    print(f"\nfim! resultados em {run_dir}")
+    print(f"histórico: python3 run_benchmark.py compare <baseline> {run_id}")
+
+
+def cmd_list(opts):
+    for name, info in discover_problems().items():
+        print(f"{name}: {info['interface']} -> {', '.join(info['backends'])}")
+
+
+def cmd_history(opts):
+    for r in history.list_runs(opts.history):
+        rev = (r["git_rev"] or "?")[:10] + ("+" if r["git_dirty"] else "")
+        print(f"{r['run_id']:<28} {r['created_at'][:19]}  {rev:<12} {r['measurements']:>4} medições  {r['problems'] or ''}")
+
+
+def cmd_compare(opts):
+    rows = history.compare(opts.baseline, opts.candidate, alpha=opts.alpha, min_change=opts.min_change, path=opts.history)
+    if not rows:
+        print("nenhuma medição em comum entre as duas execuções")
+        return
+
+    def ms(v):
+        return f"{v * 1000:10.2f}" if v is not None else f"{'-':>10}"
+
+    print(f"{'problema':<10} {'banco':<14} {'operação':<22} {'p50 base':>10} {'p50 novo':>10} {'p95 base':>10} {'p95 novo':>10} {'mudança':>8} {'p':>7}  veredito")
+    for r in rows:
+        print(f"{r['problem']:<10} {r['backend']:<14} {r['operation']:<22} {ms(r['baseline_p50'])} {ms(r['candidate_p50'])} "
+              f"{ms(r['baseline_p95'])} {ms(r['candidate_p95'])} {r['change'] * 100:7.1f}% {r['p_value']:7.3f}  {r['verdict']}")
+        if opts.verbose:
+            print(f"{'':<10} params={r['params']}")
+
+    regressions = [r for r in rows if r["verdict"] == "regressao"]
+    print(f"\n{len(regressions)} regressões, {sum(r['verdict'] == 'melhora' for r in rows)} melhoras, "
+          f"{sum(r['verdict'] == 'n/a' for r in rows)} sem amostras suficientes (use --iterations > 1)")
+    if regressions and opts.fail_on_regression:
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SQL x NoSQL: roda todos os problemas sobre uma matriz de parâmetros")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_list = sub.add_parser("list", help="Lista os problemas e bancos encontrados")
+    p_list.set_defaults(func=cmd_list)
+
+    p_run = sub.add_parser("run", help="Roda prepare -> populate -> queries sobre a matriz")
+    p_run.add_argument("--problems", nargs="+", type=int, help="Números dos problemas (padrão: todos)")
+    p_run.add_argument("--sizes", nargs="+", type=int,
+                       help="Tamanhos do dataset: --limit-rows (1, 2), --max-activities (3), total de leituras (4). Padrão: dataset inteiro/padrão do script")
+    p_run.add_argument("--concurrency", nargs="+", type=int, default=[1], help="Níveis de concorrência (só problema 4)")
+    p_run.add_argument("--backends", nargs="+", help="Subconjunto de bancos (ex: postgres redis). Padrão: todos do problema")
+    p_run.add_argument("--index-profiles", nargs="+", choices=PROFILES, default=[DEFAULT_PROFILE],
+                       help="Perfis de índice do prepare_tables.py (Postgres/Mongo), gravados em cada resultado")
+    p_run.add_argument("--cassandra-index", choices=CASSANDRA_INDEX_MODES, default=None,
+                       help="Índices do Cassandra criados pelo prepare_tables.py (sai, mv, 2i, none). Padrão: o de cada problema")
+    p_run.add_argument("--warmup", type=int, default=0, help="Rodadas de aquecimento (problemas 1-3)")
+    p_run.add_argument("--iterations", type=int, default=1, help="Medições por operação (problemas 1-3)")
+    p_run.add_argument("--iot-mode", choices=["closed", "async"], default="closed",
+                       help="Problema 4: threads com drivers síncronos (closed) ou corrotinas asyncio (async)")
+    p_run.add_argument("--operations", type=int, default=None, help="Operações por execução no problema 4 (padrão: igual aos .sh)")
+    p_run.add_argument("--sample-resources", action="store_true",
+                       help="Amostra CPU/memória/IO dos containers durante as consultas (resources*.jsonl em cada célula)")
+    p_run.add_argument("--sample-interval", type=float, default=0.5, help="Intervalo (s) entre amostras")
+    p_run.add_argument("--capture-server", action="store_true",
+                       help="Captura plano/tracing/slowlog do servidor por operação numa rodada extra (problemas 1-3)")
+    p_run.add_argument("--stream-metrics", action="store_true",
+                       help="Lista x iterador (iter_*): tempo até a primeira linha e pico de memória (problemas 1 e 4)")
+    p_run.add_argument("--stream-batch", type=int, default=DEFAULT_BATCH, help="Linhas por ida e volta nos iter_*")
+    p_run.add_argument("--profile", action="store_true",
+                       help="Profiler por amostragem no cliente (profile_<Banco>.folded em cada célula, problemas 1-3)")
+    p_run.add_argument("--pg-loader", choices=["copy", "values"], default="copy",
+                       help="Carga do postgres nos populate_tables.py: COPY via staging ou execute_values")
+    p_run.add_argument("--parallel-load", action="store_true",
+                       help="populate_tables.py carrega os bancos ao mesmo tempo (--parallel)")
+    p_run.add_argument("--skip-load", action="store_true", help="Não roda prepare/populate (usa os dados já carregados)")
+    p_run.add_argument("--start-databases", action="store_true", help="Roda start_databases.sh antes de começar")
+    p_run.add_argument("--startup-wait", type=int, default=60, help="Segundos de espera após subir os bancos")
+    p_run.add_argument("--output", default=os.path.join(ROOT, "runs"), help="Pasta onde as execuções são salvas")
+    p_run.add_argument("--run-id", default=None, help="Nome da execução (padrão: data/hora)")
+    p_run.set_defaults(func=cmd_run)
+
+    p_hist = sub.add_parser("history", help="Lista as execuções guardadas no histórico")
+    p_hist.add_argument("--history", default=history.DEFAULT_PATH, help="Arquivo sqlite do histórico")
+    p_hist.set_defaults(func=cmd_history)
+
+    p_cmp = sub.add_parser("compare", help="Compara duas execuções do histórico e aponta regressões significativas")
+    p_cmp.add_argument("baseline", help="run_id de referência")
+    p_cmp.add_argument("candidate", help="run_id a comparar")
+    p_cmp.add_argument("--alpha", type=float, default=0.05, help="Nível de significância do teste de Mann-Whitney")
+    p_cmp.add_argument("--min-change", type=float, default=0.05, help="Mudança mínima da mediana (fração) pra contar como regressão/melhora")
+    p_cmp.add_argument("--fail-on-regression", action="store_true", help="Sai com código 1 se houver regressão (pra usar em CI)")
+    p_cmp.add_argument("--verbose", action="store_true", help="Mostra os parâmetros de cada medição")
+    p_cmp.add_argument("--history", default=history.DEFAULT_PATH, help="Arquivo sqlite do histórico")
+    p_cmp.set_defaults(func=cmd_compare)
+
+    opts = parser.parse_args(argv)
+    opts.func(opts)
+
+
+if __name__ == "__main__":
+    main()